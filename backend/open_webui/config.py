@@ -1060,6 +1060,30 @@ QUERY_GENERATION_PROMPT_TEMPLATE = PersistentConfig(
     os.environ.get("QUERY_GENERATION_PROMPT_TEMPLATE", ""),
 )
 
+# Queries generated for retrieval, keyed by task model and the prompt built from
+# the normalized recent messages
+ENABLE_RETRIEVAL_QUERY_CACHE = (
+    os.environ.get("ENABLE_RETRIEVAL_QUERY_CACHE", "True").lower() == "true"
+)
+RETRIEVAL_QUERY_CACHE_SIZE = int(os.environ.get("RETRIEVAL_QUERY_CACHE_SIZE", "1000"))
+RETRIEVAL_QUERY_CACHE_TTL = int(os.environ.get("RETRIEVAL_QUERY_CACHE_TTL", "3600"))
+
+# Rules under which the last user message is used as the retrieval query instead
+# of generating queries with the task model (0 / False disables a rule):
+# - messages of at most this many words
+RETRIEVAL_QUERY_SKIP_MAX_WORDS = int(
+    os.environ.get("RETRIEVAL_QUERY_SKIP_MAX_WORDS", "0")
+)
+# - the first user message, which has no history to resolve
+RETRIEVAL_QUERY_SKIP_FIRST_MESSAGE = (
+    os.environ.get("RETRIEVAL_QUERY_SKIP_FIRST_MESSAGE", "False").lower() == "true"
+)
+# - chats with no knowledge collection attached, only uploaded files or web
+#   search results
+RETRIEVAL_QUERY_SKIP_WITHOUT_KNOWLEDGE = (
+    os.environ.get("RETRIEVAL_QUERY_SKIP_WITHOUT_KNOWLEDGE", "False").lower() == "true"
+)
+
 DEFAULT_QUERY_GENERATION_PROMPT_TEMPLATE = """### Task:
 Analyze the chat history to determine the necessity of generating search queries, in the given language. By default, **prioritize generating 1-3 broad and relevant search queries** unless it is absolutely certain that no additional information is required. The aim is to retrieve comprehensive, updated, and valuable information even with minimal uncertainty. If no search is unequivocally needed, return an empty list.
 
@@ -1214,6 +1238,68 @@ if VECTOR_DB == "pgvector" and not PGVECTOR_DB_URL.startswith("postgres"):
 PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH = int(
     os.environ.get("PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH", "1536")
 )
+PGVECTOR_POOL_SIZE = int(os.environ.get("PGVECTOR_POOL_SIZE", "5"))
+PGVECTOR_POOL_MAX_OVERFLOW = int(os.environ.get("PGVECTOR_POOL_MAX_OVERFLOW", "10"))
+# Rows written per COPY and INSERT ... ON CONFLICT transaction
+PGVECTOR_WRITE_BATCH_SIZE = int(os.environ.get("PGVECTOR_WRITE_BATCH_SIZE", "1000"))
+# "global" keeps a single ivfflat index over all collections; "collection"
+# builds a partial index per collection once it has PGVECTOR_INDEX_MIN_ROWS rows
+# (smaller collections are scanned exactly)
+PGVECTOR_INDEX_MODE = os.environ.get("PGVECTOR_INDEX_MODE", "global").lower()
+PGVECTOR_INDEX_METHOD = os.environ.get("PGVECTOR_INDEX_METHOD", "hnsw").lower()
+PGVECTOR_INDEX_MIN_ROWS = int(os.environ.get("PGVECTOR_INDEX_MIN_ROWS", "1000"))
+PGVECTOR_HNSW_M = int(os.environ.get("PGVECTOR_HNSW_M", "16"))
+PGVECTOR_HNSW_EF_CONSTRUCTION = int(
+    os.environ.get("PGVECTOR_HNSW_EF_CONSTRUCTION", "64")
+)
+# Lower bound of hnsw.ef_search; queries asking for more results use a higher value
+PGVECTOR_HNSW_EF_SEARCH = int(os.environ.get("PGVECTOR_HNSW_EF_SEARCH", "40"))
+# ivfflat.probes per query; 0 probes the square root of the number of lists
+PGVECTOR_IVFFLAT_PROBES = int(os.environ.get("PGVECTOR_IVFFLAT_PROBES", "0"))
+
+# BM25 index used by hybrid search
+BM25_INDEX_DIR = os.environ.get("BM25_INDEX_DIR", f"{CACHE_DIR}/bm25")
+BM25_INDEX_MAX_SEGMENTS = int(os.environ.get("BM25_INDEX_MAX_SEGMENTS", "8"))
+
+# Threads used for reranking and local embedding during retrieval, so CPU-bound
+# model inference does not run on the event loop
+RAG_RERANKING_MAX_WORKERS = int(os.environ.get("RAG_RERANKING_MAX_WORKERS", "2"))
+
+# Cache of computed embeddings, keyed by engine, model and text
+ENABLE_EMBEDDING_CACHE = (
+    os.environ.get("ENABLE_EMBEDDING_CACHE", "True").lower() == "true"
+)
+EMBEDDING_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", f"{CACHE_DIR}/embeddings")
+EMBEDDING_CACHE_MEMORY_SIZE = int(
+    os.environ.get("EMBEDDING_CACHE_MEMORY_SIZE", "10000")
+)
+EMBEDDING_CACHE_DISK_MAX_MB = int(os.environ.get("EMBEDDING_CACHE_DISK_MAX_MB", "1024"))
+
+# Remote (Ollama/OpenAI) embedding requests: batches sent at once, retries on
+# 429/5xx and the estimated token budget of a single batch
+RAG_EMBEDDING_CONCURRENCY = int(os.environ.get("RAG_EMBEDDING_CONCURRENCY", "4"))
+RAG_EMBEDDING_MAX_RETRIES = int(os.environ.get("RAG_EMBEDDING_MAX_RETRIES", "3"))
+RAG_EMBEDDING_BATCH_MAX_TOKENS = int(
+    os.environ.get("RAG_EMBEDDING_BATCH_MAX_TOKENS", "100000")
+)
+RAG_EMBEDDING_TIMEOUT = int(os.environ.get("RAG_EMBEDDING_TIMEOUT", "300"))
+
+# Background processing of uploaded files
+INGESTION_WORKERS = int(os.environ.get("INGESTION_WORKERS", "4"))
+INGESTION_MAX_JOBS_PER_USER = int(os.environ.get("INGESTION_MAX_JOBS_PER_USER", "2"))
+INGESTION_JOB_MAX_ATTEMPTS = int(os.environ.get("INGESTION_JOB_MAX_ATTEMPTS", "3"))
+# Running jobs without a heartbeat for this long are requeued (e.g. after a restart)
+INGESTION_JOB_STALE_TIMEOUT = int(os.environ.get("INGESTION_JOB_STALE_TIMEOUT", "60"))
+# How long chat and knowledge requests wait for a file that is still being processed
+INGESTION_JOB_WAIT_TIMEOUT = int(os.environ.get("INGESTION_JOB_WAIT_TIMEOUT", "300"))
+
+# Documents are split, embedded and inserted in windows of this many chunks; at
+# most RAG_INGESTION_MAX_BUFFERED_WINDOWS windows wait between two stages, which
+# bounds how much of a document is held in memory at once
+RAG_INGESTION_WINDOW_SIZE = int(os.environ.get("RAG_INGESTION_WINDOW_SIZE", "256"))
+RAG_INGESTION_MAX_BUFFERED_WINDOWS = int(
+    os.environ.get("RAG_INGESTION_MAX_BUFFERED_WINDOWS", "2")
+)
 
 ####################################
 # Information Retrieval (RAG)
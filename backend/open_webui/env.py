@@ -321,6 +321,21 @@ ENABLE_REALTIME_CHAT_SAVE = (
     os.environ.get("ENABLE_REALTIME_CHAT_SAVE", "False").lower() == "true"
 )
 
+# Streamed message and status writes are coalesced and flushed at most this often
+CHAT_SAVE_FLUSH_INTERVAL = os.environ.get("CHAT_SAVE_FLUSH_INTERVAL", "1")
+
+try:
+    CHAT_SAVE_FLUSH_INTERVAL = float(CHAT_SAVE_FLUSH_INTERVAL)
+except Exception:
+    CHAT_SAVE_FLUSH_INTERVAL = 1.0
+
+CHAT_SAVE_FLUSH_MAX_EVENTS = os.environ.get("CHAT_SAVE_FLUSH_MAX_EVENTS", "200")
+
+try:
+    CHAT_SAVE_FLUSH_MAX_EVENTS = int(CHAT_SAVE_FLUSH_MAX_EVENTS)
+except Exception:
+    CHAT_SAVE_FLUSH_MAX_EVENTS = 200
+
 ####################################
 # REDIS
 ####################################
@@ -373,6 +388,13 @@ WEBSOCKET_MANAGER = os.environ.get("WEBSOCKET_MANAGER", "")
 
 WEBSOCKET_REDIS_URL = os.environ.get("WEBSOCKET_REDIS_URL", REDIS_URL)
 
+GROUP_MEMBERSHIP_CACHE_TTL = os.environ.get("GROUP_MEMBERSHIP_CACHE_TTL", "60")
+
+try:
+    GROUP_MEMBERSHIP_CACHE_TTL = float(GROUP_MEMBERSHIP_CACHE_TTL)
+except Exception:
+    GROUP_MEMBERSHIP_CACHE_TTL = 60.0
+
 AIOHTTP_CLIENT_TIMEOUT = os.environ.get("AIOHTTP_CLIENT_TIMEOUT", "")
 
 if AIOHTTP_CLIENT_TIMEOUT == "":
@@ -397,6 +419,146 @@ else:
     except Exception:
         AIOHTTP_CLIENT_TIMEOUT_OPENAI_MODEL_LIST = 5
 
+# Connection pools shared by all requests to the same upstream (Ollama, OpenAI, ...)
+AIOHTTP_CLIENT_POOL_LIMIT = os.environ.get("AIOHTTP_CLIENT_POOL_LIMIT", "100")
+
+try:
+    AIOHTTP_CLIENT_POOL_LIMIT = int(AIOHTTP_CLIENT_POOL_LIMIT)
+except Exception:
+    AIOHTTP_CLIENT_POOL_LIMIT = 100
+
+AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST = os.environ.get(
+    "AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST", "0"
+)
+
+try:
+    AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST = int(AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST)
+except Exception:
+    AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST = 0
+
+AIOHTTP_CLIENT_DNS_CACHE_TTL = os.environ.get("AIOHTTP_CLIENT_DNS_CACHE_TTL", "300")
+
+try:
+    AIOHTTP_CLIENT_DNS_CACHE_TTL = int(AIOHTTP_CLIENT_DNS_CACHE_TTL)
+except Exception:
+    AIOHTTP_CLIENT_DNS_CACHE_TTL = 300
+
+AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT = os.environ.get(
+    "AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT", "30"
+)
+
+try:
+    AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT = float(AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT)
+except Exception:
+    AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT = 30.0
+
+AIOHTTP_CLIENT_DRAIN_TIMEOUT = os.environ.get("AIOHTTP_CLIENT_DRAIN_TIMEOUT", "10")
+
+try:
+    AIOHTTP_CLIENT_DRAIN_TIMEOUT = float(AIOHTTP_CLIENT_DRAIN_TIMEOUT)
+except Exception:
+    AIOHTTP_CLIENT_DRAIN_TIMEOUT = 10.0
+
+# Timeout of each pipelines inlet/outlet filter request, a filter that times out
+# is skipped
+PIPELINE_FILTER_TIMEOUT = os.environ.get("PIPELINE_FILTER_TIMEOUT", "60")
+
+try:
+    PIPELINE_FILTER_TIMEOUT = float(PIPELINE_FILTER_TIMEOUT)
+except Exception:
+    PIPELINE_FILTER_TIMEOUT = 60.0
+
+# Resolve the pipelines filters of each model once per model list instead of
+# on every request
+ENABLE_PIPELINE_FILTER_CACHE = (
+    os.environ.get("ENABLE_PIPELINE_FILTER_CACHE", "True").lower() == "true"
+)
+
+####################################
+# LOAD BALANCING
+####################################
+
+OLLAMA_LOAD_BALANCING_STRATEGY = os.environ.get(
+    "OLLAMA_LOAD_BALANCING_STRATEGY", "least_outstanding"
+).lower()
+
+OLLAMA_PREFER_LOADED_MODELS = (
+    os.environ.get("OLLAMA_PREFER_LOADED_MODELS", "true").lower() == "true"
+)
+
+OLLAMA_LOADED_MODELS_TTL = os.environ.get("OLLAMA_LOADED_MODELS_TTL", "10")
+
+try:
+    OLLAMA_LOADED_MODELS_TTL = float(OLLAMA_LOADED_MODELS_TTL)
+except Exception:
+    OLLAMA_LOADED_MODELS_TTL = 10.0
+
+OPENAI_LOAD_BALANCING_STRATEGY = os.environ.get(
+    "OPENAI_LOAD_BALANCING_STRATEGY", "least_outstanding"
+).lower()
+
+OPENAI_API_MAX_RETRIES = os.environ.get("OPENAI_API_MAX_RETRIES", "2")
+
+try:
+    OPENAI_API_MAX_RETRIES = int(OPENAI_API_MAX_RETRIES)
+except Exception:
+    OPENAI_API_MAX_RETRIES = 2
+
+LOAD_BALANCER_EJECT_FAILURES = os.environ.get("LOAD_BALANCER_EJECT_FAILURES", "3")
+
+try:
+    LOAD_BALANCER_EJECT_FAILURES = int(LOAD_BALANCER_EJECT_FAILURES)
+except Exception:
+    LOAD_BALANCER_EJECT_FAILURES = 3
+
+LOAD_BALANCER_EJECT_DURATION = os.environ.get("LOAD_BALANCER_EJECT_DURATION", "30")
+
+try:
+    LOAD_BALANCER_EJECT_DURATION = float(LOAD_BALANCER_EJECT_DURATION)
+except Exception:
+    LOAD_BALANCER_EJECT_DURATION = 30.0
+
+####################################
+# DOCUMENT PARSING
+####################################
+
+# Document loaders run in worker processes, one pool per format group
+ENABLE_PARSING_PROCESS_POOL = (
+    os.environ.get("ENABLE_PARSING_PROCESS_POOL", "True").lower() == "true"
+)
+
+PARSING_POOL_WORKERS = os.environ.get("PARSING_POOL_WORKERS", "2")
+
+try:
+    PARSING_POOL_WORKERS = int(PARSING_POOL_WORKERS)
+except Exception:
+    PARSING_POOL_WORKERS = 2
+
+PARSING_TIMEOUT = os.environ.get("PARSING_TIMEOUT", "600")
+
+try:
+    PARSING_TIMEOUT = float(PARSING_TIMEOUT)
+except Exception:
+    PARSING_TIMEOUT = 600.0
+
+# Address space limit of each parsing worker, 0 to disable
+PARSING_WORKER_MEMORY_LIMIT_MB = os.environ.get(
+    "PARSING_WORKER_MEMORY_LIMIT_MB", "4096"
+)
+
+try:
+    PARSING_WORKER_MEMORY_LIMIT_MB = int(PARSING_WORKER_MEMORY_LIMIT_MB)
+except Exception:
+    PARSING_WORKER_MEMORY_LIMIT_MB = 4096
+
+# PDFs are split into page ranges of this size that are parsed in parallel
+PARSING_PDF_PAGES_PER_TASK = os.environ.get("PARSING_PDF_PAGES_PER_TASK", "16")
+
+try:
+    PARSING_PDF_PAGES_PER_TASK = max(int(PARSING_PDF_PAGES_PER_TASK), 1)
+except Exception:
+    PARSING_PDF_PAGES_PER_TASK = 16
+
 ####################################
 # OFFLINE_MODE
 ####################################
@@ -1,4 +1,5 @@
 import asyncio
+import hashlib
 import inspect
 import json
 import logging
@@ -49,6 +50,8 @@ from open_webui.socket.main import (
     app as socket_app,
     periodic_usage_pool_cleanup,
 )
+from open_webui.socket.buffer import CHAT_MESSAGE_BUFFER
+from open_webui.utils.http_client import UPSTREAM_CLIENTS
 from open_webui.routers import (
     audio,
     images,
@@ -77,13 +80,18 @@ from open_webui.routers import (
 
 from open_webui.routers.retrieval import (
     get_embedding_function,
+    get_async_embedding_function,
     get_ef,
     get_rf,
 )
+from open_webui.retrieval.embedding_client import EMBEDDING_CLIENT
+from open_webui.retrieval.ingestion import INGESTION_JOBS
+from open_webui.retrieval.loaders.pool import PARSING_POOL
 
 from open_webui.internal.db import Session
 
 from open_webui.models.functions import Functions
+from open_webui.models.groups import Groups
 from open_webui.models.models import Models
 from open_webui.models.users import UserModel, Users
 
@@ -281,6 +289,7 @@ from open_webui.env import (
 
 
 from open_webui.utils.models import (
+    MODEL_REGISTRY,
     get_all_models,
     get_all_base_models,
     check_model_access,
@@ -291,6 +300,7 @@ from open_webui.utils.chat import (
     chat_action as chat_action_handler,
 )
 from open_webui.utils.middleware import process_chat_payload, process_chat_response
+from open_webui.utils.plugin import PLUGIN_MODULES
 from open_webui.utils.access_control import has_access
 
 from open_webui.utils.auth import (
@@ -346,8 +356,21 @@ async def lifespan(app: FastAPI):
         reset_config()
 
     asyncio.create_task(periodic_usage_pool_cleanup())
+    CHAT_MESSAGE_BUFFER.start()
+    INGESTION_JOBS.start(app)
+    # Functions and tools are loaded in the background, requests that need one
+    # before it is ready load it themselves
+    asyncio.create_task(asyncio.to_thread(PLUGIN_MODULES.warm))
+
     yield
 
+    # Write out any buffered message updates before shutting down
+    await INGESTION_JOBS.stop()
+    await CHAT_MESSAGE_BUFFER.stop()
+    await UPSTREAM_CLIENTS.close()
+    await EMBEDDING_CLIENT.close()
+    PARSING_POOL.shutdown()
+
 
 app = FastAPI(
     docs_url="/docs" if ENV == "dev" else None,
@@ -450,8 +473,8 @@ app.state.config.LDAP_CIPHERS = LDAP_CIPHERS
 app.state.AUTH_TRUSTED_EMAIL_HEADER = WEBUI_AUTH_TRUSTED_EMAIL_HEADER
 app.state.AUTH_TRUSTED_NAME_HEADER = WEBUI_AUTH_TRUSTED_NAME_HEADER
 
-app.state.TOOLS = {}
-app.state.FUNCTIONS = {}
+app.state.TOOLS = PLUGIN_MODULES.tools
+app.state.FUNCTIONS = PLUGIN_MODULES.functions
 
 
 ########################################
@@ -524,6 +547,7 @@ app.state.config.RAG_WEB_SEARCH_RESULT_COUNT = RAG_WEB_SEARCH_RESULT_COUNT
 app.state.config.RAG_WEB_SEARCH_CONCURRENT_REQUESTS = RAG_WEB_SEARCH_CONCURRENT_REQUESTS
 
 app.state.EMBEDDING_FUNCTION = None
+app.state.ASYNC_EMBEDDING_FUNCTION = None
 app.state.ef = None
 app.state.rf = None
 
@@ -563,6 +587,23 @@ app.state.EMBEDDING_FUNCTION = get_embedding_function(
     app.state.config.RAG_EMBEDDING_BATCH_SIZE,
 )
 
+app.state.ASYNC_EMBEDDING_FUNCTION = get_async_embedding_function(
+    app.state.config.RAG_EMBEDDING_ENGINE,
+    app.state.config.RAG_EMBEDDING_MODEL,
+    app.state.ef,
+    (
+        app.state.config.RAG_OPENAI_API_BASE_URL
+        if app.state.config.RAG_EMBEDDING_ENGINE == "openai"
+        else app.state.config.RAG_OLLAMA_BASE_URL
+    ),
+    (
+        app.state.config.RAG_OPENAI_API_KEY
+        if app.state.config.RAG_EMBEDDING_ENGINE == "openai"
+        else app.state.config.RAG_OLLAMA_API_KEY
+    ),
+    app.state.config.RAG_EMBEDDING_BATCH_SIZE,
+)
+
 
 ########################################
 #
@@ -780,6 +821,13 @@ app.include_router(utils.router, prefix="/api/v1/utils", tags=["utils"])
 @app.get("/api/models")
 async def get_models(request: Request, user=Depends(get_verified_user)):
     def get_filtered_models(models, user):
+        # Resolve the user's groups and every model's access control once, instead
+        # of a model lookup and group query per model
+        user_group_ids = Groups.get_group_ids_by_member_id(user.id)
+        readable_model_ids = Models.get_model_ids_by_user_access(
+            user.id, type="read", user_group_ids=user_group_ids
+        )
+
         filtered_models = []
         for model in models:
             if model.get("arena"):
@@ -789,16 +837,13 @@ async def get_models(request: Request, user=Depends(get_verified_user)):
                     access_control=model.get("info", {})
                     .get("meta", {})
                     .get("access_control", {}),
+                    user_group_ids=user_group_ids,
                 ):
                     filtered_models.append(model)
                 continue
 
-            model_info = Models.get_model_by_id(model["id"])
-            if model_info:
-                if user.id == model_info.user_id or has_access(
-                    user.id, type="read", access_control=model_info.access_control
-                ):
-                    filtered_models.append(model)
+            if model["id"] in readable_model_ids:
+                filtered_models.append(model)
 
         return filtered_models
 
@@ -823,10 +868,21 @@ async def get_models(request: Request, user=Depends(get_verified_user)):
     if user.role == "user" and not BYPASS_MODEL_ACCESS_CONTROL:
         models = get_filtered_models(models, user)
 
+    model_ids = [model["id"] for model in models]
     log.debug(
-        f"/api/models returned filtered models accessible to the user: {json.dumps([model['id'] for model in models])}"
+        f"/api/models returned filtered models accessible to the user: {json.dumps(model_ids)}"
     )
-    return {"data": models}
+
+    if MODEL_REGISTRY.version is None:
+        return {"data": models}
+
+    # The response is fully determined by the registry version and which of its
+    # models (in which order) the user gets
+    etag = f'W/"{MODEL_REGISTRY.version}-{hashlib.sha256(json.dumps(model_ids).encode()).hexdigest()[:16]}"'
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return JSONResponse(content={"data": models}, headers={"ETag": etag})
 
 
 @app.get("/api/models/base")
@@ -935,6 +991,16 @@ async def list_tasks_endpoint(user=Depends(get_verified_user)):
     return {"tasks": list_tasks()}  # Use the function from tasks.py
 
 
+@app.get("/api/chat/buffer/stats")
+async def get_chat_buffer_stats(user=Depends(get_admin_user)):
+    return CHAT_MESSAGE_BUFFER.get_stats()
+
+
+@app.get("/api/upstream/pools")
+async def get_upstream_pool_stats(user=Depends(get_admin_user)):
+    return UPSTREAM_CLIENTS.get_stats()
+
+
 ##################################
 #
 # Config Endpoints
@@ -62,6 +62,15 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # Callers can pass their own connection (e.g. to a test database)
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
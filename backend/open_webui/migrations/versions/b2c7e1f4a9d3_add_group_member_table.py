@@ -0,0 +1,63 @@
+"""Add group_member table
+
+Revision ID: b2c7e1f4a9d3
+Revises: 9f0c9cd09105
+Create Date: 2025-01-22 12:00:00.000000
+
+"""
+
+import json
+import time
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "b2c7e1f4a9d3"
+down_revision = "9f0c9cd09105"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "group_member",
+        sa.Column("group_id", sa.Text(), nullable=False),
+        sa.Column("user_id", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("group_id", "user_id", name="pk_group_id_user_id"),
+    )
+    op.create_index("group_member_user_id_idx", "group_member", ["user_id"])
+
+    # Backfill memberships from the user_ids column of existing groups
+    connection = op.get_bind()
+
+    group_table = sa.table(
+        "group",
+        sa.column("id", sa.Text()),
+        sa.column("user_ids", sa.JSON()),
+    )
+    group_member_table = sa.table(
+        "group_member",
+        sa.column("group_id", sa.Text()),
+        sa.column("user_id", sa.Text()),
+        sa.column("created_at", sa.BigInteger()),
+    )
+
+    now = int(time.time())
+    rows = []
+    for group_id, user_ids in connection.execute(
+        sa.select(group_table.c.id, group_table.c.user_ids)
+    ).fetchall():
+        if isinstance(user_ids, str):
+            user_ids = json.loads(user_ids)
+
+        for user_id in set(user_ids or []):
+            rows.append({"group_id": group_id, "user_id": user_id, "created_at": now})
+
+    if rows:
+        op.bulk_insert(group_member_table, rows)
+
+
+def downgrade():
+    op.drop_index("group_member_user_id_idx", table_name="group_member")
+    op.drop_table("group_member")
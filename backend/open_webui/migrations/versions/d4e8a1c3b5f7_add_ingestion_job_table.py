@@ -0,0 +1,42 @@
+"""Add ingestion_job table
+
+Revision ID: d4e8a1c3b5f7
+Revises: b2c7e1f4a9d3
+Create Date: 2025-01-24 12:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "d4e8a1c3b5f7"
+down_revision = "b2c7e1f4a9d3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ingestion_job",
+        sa.Column("id", sa.Text(), nullable=False, primary_key=True),
+        sa.Column("user_id", sa.Text(), nullable=True),
+        sa.Column("file_id", sa.Text(), nullable=True),
+        sa.Column("status", sa.Text(), nullable=True),
+        sa.Column("progress", sa.Float(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("data", sa.JSON(), nullable=True),
+        sa.Column("run_after", sa.BigInteger(), nullable=True),
+        sa.Column("created_at", sa.BigInteger(), nullable=True),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+    )
+    op.create_index(
+        "ingestion_job_status_idx", "ingestion_job", ["status", "run_after"]
+    )
+    op.create_index("ingestion_job_file_id_idx", "ingestion_job", ["file_id"])
+
+
+def downgrade():
+    op.drop_index("ingestion_job_file_id_idx", table_name="ingestion_job")
+    op.drop_index("ingestion_job_status_idx", table_name="ingestion_job")
+    op.drop_table("ingestion_job")
@@ -0,0 +1,28 @@
+"""Add bm25_index table
+
+Revision ID: f2c8e5a1d7b3
+Revises: d4e8a1c3b5f7
+Create Date: 2025-01-31 12:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "f2c8e5a1d7b3"
+down_revision = "d4e8a1c3b5f7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "bm25_index",
+        sa.Column("collection_name", sa.Text(), nullable=False, primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=True),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table("bm25_index")
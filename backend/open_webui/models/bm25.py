@@ -0,0 +1,93 @@
+import logging
+import time
+
+from open_webui.internal.db import Base, get_db
+from open_webui.env import SRC_LOG_LEVELS
+from sqlalchemy import BigInteger, Column, Text
+from sqlalchemy.exc import IntegrityError
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+####################
+# BM25 Index DB Schema
+####################
+
+
+class BM25IndexVersion(Base):
+    __tablename__ = "bm25_index"
+
+    collection_name = Column(Text, primary_key=True)
+    # Bumped on every write to the collection; never reset, so a local index
+    # built at an older version is always detected as stale
+    version = Column(BigInteger)
+
+    updated_at = Column(BigInteger)
+
+
+class BM25IndexVersionTable:
+    """
+    Versions of the vector DB collections shared by every replica.
+
+    Each replica keeps its BM25 indexes on local disk and records the version they
+    were built at; an index whose version differs from the stored one is rebuilt
+    from the vector DB.
+    """
+
+    def get_version(self, collection_name: str) -> int:
+        with get_db() as db:
+            row = db.get(BM25IndexVersion, collection_name)
+            return row.version if row else 0
+
+    def bump_version(self, collection_name: str) -> int:
+        # Returns the new version; the previous one is always the new one - 1
+        for attempt in range(2):
+            try:
+                with get_db() as db:
+                    updated = (
+                        db.query(BM25IndexVersion)
+                        .filter_by(collection_name=collection_name)
+                        .update(
+                            {
+                                BM25IndexVersion.version: BM25IndexVersion.version + 1,
+                                BM25IndexVersion.updated_at: int(time.time()),
+                            },
+                            synchronize_session=False,
+                        )
+                    )
+                    if not updated:
+                        db.add(
+                            BM25IndexVersion(
+                                collection_name=collection_name,
+                                version=1,
+                                updated_at=int(time.time()),
+                            )
+                        )
+                    db.flush()
+
+                    # The row stays locked by the update until the commit
+                    version = (
+                        db.query(BM25IndexVersion.version)
+                        .filter_by(collection_name=collection_name)
+                        .scalar()
+                    )
+                    db.commit()
+                    return version
+            except IntegrityError:
+                # Another worker created the row first
+                if attempt == 1:
+                    raise
+
+    def bump_all_versions(self):
+        with get_db() as db:
+            db.query(BM25IndexVersion).update(
+                {
+                    BM25IndexVersion.version: BM25IndexVersion.version + 1,
+                    BM25IndexVersion.updated_at: int(time.time()),
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+
+
+BM25IndexVersions = BM25IndexVersionTable()
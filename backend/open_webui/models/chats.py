@@ -9,7 +9,9 @@ from open_webui.models.tags import TagModel, Tag, Tags
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON
+from sqlalchemy import PrimaryKeyConstraint
 from sqlalchemy import or_, func, select, and_, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql import exists
 
 ####################
@@ -36,6 +38,21 @@ class Chat(Base):
     folder_id = Column(Text, nullable=True)
 
 
+class ChatMessage(Base):
+    # Per-message writes that have not been folded into `Chat.chat` yet, so that
+    # streamed updates do not rewrite the whole chat JSON on every delta.
+    __tablename__ = "chat_message"
+
+    id = Column(String)
+    chat_id = Column(String)
+    message = Column(JSON)
+
+    created_at = Column(BigInteger)
+    updated_at = Column(BigInteger)  # timestamp in epoch nanoseconds
+
+    __table_args__ = (PrimaryKeyConstraint("chat_id", "id", name="pk_chat_id_id"),)
+
+
 class ChatModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -157,10 +174,17 @@ class ChatTable:
     def update_chat_by_id(self, id: str, chat: dict) -> Optional[ChatModel]:
         try:
             with get_db() as db:
+                updated_at = time.time_ns()
+
                 chat_item = db.get(Chat, id)
                 chat_item.chat = chat
                 chat_item.title = chat["title"] if "title" in chat else "New Chat"
                 chat_item.updated_at = int(time.time())
+
+                # The full chat supersedes any message written before it
+                db.query(ChatMessage).filter(
+                    ChatMessage.chat_id == id, ChatMessage.updated_at <= updated_at
+                ).delete()
                 db.commit()
                 db.refresh(chat_item)
 
@@ -215,6 +239,13 @@ class ChatTable:
     def get_message_by_id_and_message_id(
         self, id: str, message_id: str
     ) -> Optional[dict]:
+        with get_db() as db:
+            chat_message = (
+                db.query(ChatMessage).filter_by(chat_id=id, id=message_id).first()
+            )
+            if chat_message:
+                return chat_message.message
+
         chat = self.get_chat_by_id(id)
         if chat is None:
             return None
@@ -223,46 +254,109 @@ class ChatTable:
 
     def upsert_message_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, message: dict
-    ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
-            return None
-
-        chat = chat.chat
-        history = chat.get("history", {})
-
-        if message_id in history.get("messages", {}):
-            history["messages"][message_id] = {
-                **history["messages"][message_id],
-                **message,
-            }
-        else:
-            history["messages"][message_id] = message
+    ) -> Optional[dict]:
+        # Only the message row is written; `Chat.chat` is brought up to date by
+        # materialize_chat_messages_by_id (or the next full chat update).
+        try:
+            for attempt in range(2):
+                with get_db() as db:
+                    chat_message = (
+                        db.query(ChatMessage)
+                        .filter_by(chat_id=id, id=message_id)
+                        .first()
+                    )
 
-        history["currentId"] = message_id
+                    if chat_message:
+                        chat_message.message = {**chat_message.message, **message}
+                        chat_message.updated_at = time.time_ns()
+                    else:
+                        chat = db.get(Chat, id)
+                        if chat is None:
+                            return None
+
+                        existing = (
+                            (chat.chat or {})
+                            .get("history", {})
+                            .get("messages", {})
+                            .get(message_id, {})
+                        )
 
-        chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+                        chat_message = ChatMessage(
+                            id=message_id,
+                            chat_id=id,
+                            message={**existing, **message},
+                            created_at=int(time.time()),
+                            updated_at=time.time_ns(),
+                        )
+                        db.add(chat_message)
+
+                    try:
+                        db.commit()
+                        return chat_message.message
+                    except IntegrityError:
+                        # Another worker inserted the row first, the retry
+                        # updates it
+                        db.rollback()
+                        if attempt == 1:
+                            raise
+        except Exception:
+            return None
 
     def add_message_status_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, status: dict
-    ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
+    ) -> Optional[dict]:
+        message = self.get_message_by_id_and_message_id(id, message_id)
+        if not message:
             return None
 
-        chat = chat.chat
-        history = chat.get("history", {})
+        status_history = message.get("statusHistory", [])
+        return self.upsert_message_to_chat_by_id_and_message_id(
+            id, message_id, {"statusHistory": [*status_history, status]}
+        )
 
-        if message_id in history.get("messages", {}):
-            status_history = history["messages"][message_id].get("statusHistory", [])
-            status_history.append(status)
-            history["messages"][message_id]["statusHistory"] = status_history
+    def merge_chat_messages(self, chat: dict, chat_messages: list[ChatMessage]) -> dict:
+        history = {**chat.get("history", {})}
+        messages = {**history.get("messages", {})}
 
-        chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+        for chat_message in sorted(chat_messages, key=lambda m: m.updated_at):
+            messages[chat_message.id] = chat_message.message
+            history["currentId"] = chat_message.id
+
+        history["messages"] = messages
+        return {**chat, "history": history}
+
+    def materialize_chat_messages_by_id(self, id: str) -> Optional[ChatModel]:
+        try:
+            with get_db() as db:
+                chat_item = db.get(Chat, id)
+                if chat_item is None:
+                    return None
+
+                chat_messages = db.query(ChatMessage).filter_by(chat_id=id).all()
+                if chat_messages:
+                    chat_item.chat = self.merge_chat_messages(
+                        chat_item.chat, chat_messages
+                    )
+                    chat_item.updated_at = int(time.time())
+
+                    # Keep rows that were written again while we were merging
+                    for chat_message in chat_messages:
+                        db.query(ChatMessage).filter_by(
+                            chat_id=id,
+                            id=chat_message.id,
+                            updated_at=chat_message.updated_at,
+                        ).delete()
+
+                    db.commit()
+                    db.refresh(chat_item)
+
+                return ChatModel.model_validate(chat_item)
+        except Exception:
+            return None
 
     def insert_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
+        self.materialize_chat_messages_by_id(chat_id)
+
         with get_db() as db:
             # Get the existing chat to share
             chat = db.get(Chat, chat_id)
@@ -296,6 +390,8 @@ class ChatTable:
 
     def update_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
         try:
+            self.materialize_chat_messages_by_id(chat_id)
+
             with get_db() as db:
                 chat = db.get(Chat, chat_id)
                 shared_chat = (
@@ -462,10 +558,39 @@ class ChatTable:
         try:
             with get_db() as db:
                 chat = db.get(Chat, id)
-                return ChatModel.model_validate(chat)
+                return self._get_chat_model_with_messages(db, chat)
         except Exception:
             return None
 
+    def _get_chat_model_with_messages(self, db, chat: Chat) -> ChatModel:
+        chat_model = ChatModel.model_validate(chat)
+
+        chat_messages = db.query(ChatMessage).filter_by(chat_id=chat.id).all()
+        if chat_messages:
+            chat_model.chat = self.merge_chat_messages(chat_model.chat, chat_messages)
+        return chat_model
+
+    def _get_chat_models_with_messages(self, db, chats) -> list[ChatModel]:
+        # Overlays the message rows of all chats, queried in batches
+        chat_models = [ChatModel.model_validate(chat) for chat in chats]
+
+        chat_messages = {}
+        ids = [chat_model.id for chat_model in chat_models]
+        for i in range(0, len(ids), 500):
+            for chat_message in (
+                db.query(ChatMessage)
+                .filter(ChatMessage.chat_id.in_(ids[i : i + 500]))
+                .all()
+            ):
+                chat_messages.setdefault(chat_message.chat_id, []).append(chat_message)
+
+        for chat_model in chat_models:
+            if chat_model.id in chat_messages:
+                chat_model.chat = self.merge_chat_messages(
+                    chat_model.chat, chat_messages[chat_model.id]
+                )
+        return chat_models
+
     def get_chat_by_share_id(self, id: str) -> Optional[ChatModel]:
         try:
             with get_db() as db:
@@ -484,7 +609,7 @@ class ChatTable:
         try:
             with get_db() as db:
                 chat = db.query(Chat).filter_by(id=id, user_id=user_id).first()
-                return ChatModel.model_validate(chat)
+                return self._get_chat_model_with_messages(db, chat)
         except Exception:
             return None
 
@@ -495,7 +620,7 @@ class ChatTable:
                 # .limit(limit).offset(skip)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models_with_messages(db, all_chats)
 
     def get_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -504,7 +629,7 @@ class ChatTable:
                 .filter_by(user_id=user_id)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models_with_messages(db, all_chats)
 
     def get_pinned_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -513,7 +638,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, pinned=True, archived=False)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models_with_messages(db, all_chats)
 
     def get_archived_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -522,7 +647,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, archived=True)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models_with_messages(db, all_chats)
 
     def get_chats_by_user_id_and_search_text(
         self,
@@ -686,7 +811,7 @@ class ChatTable:
             query = query.order_by(Chat.updated_at.desc())
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models_with_messages(db, all_chats)
 
     def get_chats_by_folder_ids_and_user_id(
         self, folder_ids: list[str], user_id: str
@@ -701,7 +826,7 @@ class ChatTable:
             query = query.order_by(Chat.updated_at.desc())
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models_with_messages(db, all_chats)
 
     def update_chat_folder_id_by_id_and_user_id(
         self, id: str, user_id: str, folder_id: str
@@ -850,6 +975,7 @@ class ChatTable:
     def delete_chat_by_id(self, id: str) -> bool:
         try:
             with get_db() as db:
+                db.query(ChatMessage).filter_by(chat_id=id).delete()
                 db.query(Chat).filter_by(id=id).delete()
                 db.commit()
 
@@ -860,6 +986,7 @@ class ChatTable:
     def delete_chat_by_id_and_user_id(self, id: str, user_id: str) -> bool:
         try:
             with get_db() as db:
+                db.query(ChatMessage).filter_by(chat_id=id).delete()
                 db.query(Chat).filter_by(id=id, user_id=user_id).delete()
                 db.commit()
 
@@ -872,6 +999,11 @@ class ChatTable:
             with get_db() as db:
                 self.delete_shared_chats_by_user_id(user_id)
 
+                db.query(ChatMessage).filter(
+                    ChatMessage.chat_id.in_(
+                        select(Chat.id).filter_by(user_id=user_id).scalar_subquery()
+                    )
+                ).delete(synchronize_session=False)
                 db.query(Chat).filter_by(user_id=user_id).delete()
                 db.commit()
 
@@ -884,6 +1016,13 @@ class ChatTable:
     ) -> bool:
         try:
             with get_db() as db:
+                db.query(ChatMessage).filter(
+                    ChatMessage.chat_id.in_(
+                        select(Chat.id)
+                        .filter_by(user_id=user_id, folder_id=folder_id)
+                        .scalar_subquery()
+                    )
+                ).delete(synchronize_session=False)
                 db.query(Chat).filter_by(user_id=user_id, folder_id=folder_id).delete()
                 db.commit()
 
@@ -1,10 +1,11 @@
 import logging
+import threading
 import time
 from typing import Optional
 
 from open_webui.internal.db import Base, JSONField, get_db
 from open_webui.models.users import Users
-from open_webui.env import SRC_LOG_LEVELS
+from open_webui.env import SRC_LOG_LEVELS, WEBSOCKET_MANAGER, WEBSOCKET_REDIS_URL
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Boolean, Column, String, Text
 
@@ -80,7 +81,69 @@ class FunctionValves(BaseModel):
     valves: Optional[dict] = None
 
 
+####################
+# Version
+####################
+
+
+class FunctionsVersion:
+    """
+    Counter bumped on every change to a function, its valves or its state, so
+    caches built from the functions know when to rebuild.
+
+    When Redis is configured the change is published so the counter of every
+    worker is bumped as well.
+    """
+
+    CHANNEL = "open-webui:functions"
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url
+        self.value = 0
+        self.lock = threading.Lock()
+
+        self.redis = None
+        self.pubsub_thread = None
+
+    def start_listener(self):
+        if not self.redis_url or self.pubsub_thread is not None:
+            return
+
+        try:
+            import redis
+
+            self.redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.CHANNEL: lambda message: self.bump()})
+            self.pubsub_thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+        except Exception as e:
+            log.warning(f"Function change notifications via Redis disabled: {e}")
+            self.redis_url = None
+
+    def get(self) -> int:
+        self.start_listener()
+        return self.value
+
+    def bump(self):
+        with self.lock:
+            self.value += 1
+
+    def invalidate(self):
+        self.bump()
+
+        if self.redis is not None:
+            try:
+                self.redis.publish(self.CHANNEL, "invalidate")
+            except Exception as e:
+                log.warning(f"Failed to publish function change: {e}")
+
+
 class FunctionsTable:
+    def __init__(self):
+        self.version = FunctionsVersion(
+            redis_url=WEBSOCKET_REDIS_URL if WEBSOCKET_MANAGER == "redis" else None,
+        )
+
     def insert_new_function(
         self, user_id: str, type: str, form_data: FunctionForm
     ) -> Optional[FunctionModel]:
@@ -100,6 +163,7 @@ class FunctionsTable:
                 db.add(result)
                 db.commit()
                 db.refresh(result)
+                self.version.invalidate()
                 if result:
                     return FunctionModel.model_validate(result)
                 else:
@@ -183,6 +247,7 @@ class FunctionsTable:
                 function.updated_at = int(time.time())
                 db.commit()
                 db.refresh(function)
+                self.version.invalidate()
                 return self.get_function_by_id(id)
             except Exception:
                 return None
@@ -238,6 +303,7 @@ class FunctionsTable:
                     }
                 )
                 db.commit()
+                self.version.invalidate()
                 return self.get_function_by_id(id)
             except Exception:
                 return None
@@ -252,6 +318,7 @@ class FunctionsTable:
                     }
                 )
                 db.commit()
+                self.version.invalidate()
                 return True
             except Exception:
                 return None
@@ -261,6 +328,7 @@ class FunctionsTable:
             try:
                 db.query(Function).filter_by(id=id).delete()
                 db.commit()
+                self.version.invalidate()
 
                 return True
             except Exception:
@@ -1,17 +1,23 @@
 import json
 import logging
+import threading
 import time
 from typing import Optional
 import uuid
 
 from open_webui.internal.db import Base, get_db
-from open_webui.env import SRC_LOG_LEVELS
+from open_webui.env import (
+    GROUP_MEMBERSHIP_CACHE_TTL,
+    WEBSOCKET_MANAGER,
+    WEBSOCKET_REDIS_URL,
+    SRC_LOG_LEVELS,
+)
 
 from open_webui.models.files import FileMetadataResponse
 
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, JSON, func
+from sqlalchemy import BigInteger, Column, Index, PrimaryKeyConstraint, Text, JSON
 
 
 log = logging.getLogger(__name__)
@@ -41,6 +47,21 @@ class Group(Base):
     updated_at = Column(BigInteger)
 
 
+class GroupMember(Base):
+    __tablename__ = "group_member"
+
+    # Normalized copy of group.user_ids, kept in sync by GroupTable, so membership
+    # lookups by user are an index scan instead of matching the JSON as a string
+    group_id = Column(Text, nullable=False)
+    user_id = Column(Text, nullable=False)
+    created_at = Column(BigInteger)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("group_id", "user_id", name="pk_group_id_user_id"),
+        Index("group_member_user_id_idx", "user_id"),
+    )
+
+
 class GroupModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: str
@@ -88,7 +109,99 @@ class GroupUpdateForm(GroupForm):
     admin_ids: Optional[list[str]] = None
 
 
+####################
+# Membership Cache
+####################
+
+
+class GroupMembershipCache:
+    """
+    In-process cache of the groups each user belongs to, so a user's groups are
+    resolved once and reused by every access check until they expire or a group
+    changes.
+
+    Any group mutation clears the whole cache. When Redis is configured the
+    invalidation is published so every worker clears its cache as well.
+    """
+
+    CHANNEL = "open-webui:group_membership"
+
+    def __init__(self, ttl: float, redis_url: Optional[str] = None):
+        self.ttl = ttl
+        self.redis_url = redis_url
+
+        self.entries: dict[str, tuple[float, list["GroupModel"]]] = {}
+        self.lock = threading.Lock()
+        # Bumped on every invalidation, so a lookup that raced with a group update
+        # does not store stale results
+        self.generation = 0
+
+        self.redis = None
+        self.pubsub_thread = None
+
+    def start_listener(self):
+        if not self.redis_url or self.pubsub_thread is not None:
+            return
+
+        try:
+            import redis
+
+            self.redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.CHANNEL: lambda message: self.clear()})
+            self.pubsub_thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+        except Exception as e:
+            log.warning(f"Group membership cache invalidation via Redis disabled: {e}")
+            self.redis_url = None
+
+    def get(self, user_id: str) -> tuple[int, Optional[list["GroupModel"]]]:
+        self.start_listener()
+
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry and entry[0] > time.monotonic():
+                return self.generation, entry[1]
+            return self.generation, None
+
+    def set(self, user_id: str, groups: list["GroupModel"], generation: int):
+        if self.ttl <= 0:
+            return
+
+        with self.lock:
+            if generation == self.generation:
+                self.entries[user_id] = (time.monotonic() + self.ttl, groups)
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+            self.generation += 1
+
+    def invalidate(self):
+        self.clear()
+
+        if self.redis is not None:
+            try:
+                self.redis.publish(self.CHANNEL, "invalidate")
+            except Exception as e:
+                log.warning(f"Failed to publish group membership invalidation: {e}")
+
+
 class GroupTable:
+    def __init__(self):
+        self.membership_cache = GroupMembershipCache(
+            ttl=GROUP_MEMBERSHIP_CACHE_TTL,
+            redis_url=WEBSOCKET_REDIS_URL if WEBSOCKET_MANAGER == "redis" else None,
+        )
+
+    def set_group_members(self, db, id: str, user_ids: list[str]):
+        db.query(GroupMember).filter_by(group_id=id).delete()
+        db.add_all(
+            [
+                GroupMember(group_id=id, user_id=user_id, created_at=int(time.time()))
+                for user_id in set(user_ids)
+            ]
+        )
+
     def insert_new_group(
         self, user_id: str, form_data: GroupForm
     ) -> Optional[GroupModel]:
@@ -124,20 +237,26 @@ class GroupTable:
             ]
 
     def get_groups_by_member_id(self, user_id: str) -> list[GroupModel]:
+        generation, groups = self.membership_cache.get(user_id)
+        if groups is not None:
+            return groups
+
         with get_db() as db:
-            return [
+            groups = [
                 GroupModel.model_validate(group)
                 for group in db.query(Group)
-                .filter(
-                    func.json_array_length(Group.user_ids) > 0
-                )  # Ensure array exists
-                .filter(
-                    Group.user_ids.cast(String).like(f'%"{user_id}"%')
-                )  # String-based check
+                .join(GroupMember, GroupMember.group_id == Group.id)
+                .filter(GroupMember.user_id == user_id)
                 .order_by(Group.updated_at.desc())
                 .all()
             ]
 
+        self.membership_cache.set(user_id, groups, generation)
+        return groups
+
+    def get_group_ids_by_member_id(self, user_id: str) -> set[str]:
+        return {group.id for group in self.get_groups_by_member_id(user_id)}
+
     def get_group_by_id(self, id: str) -> Optional[GroupModel]:
         try:
             with get_db() as db:
@@ -164,8 +283,12 @@ class GroupTable:
                         "updated_at": int(time.time()),
                     }
                 )
+                if form_data.user_ids is not None:
+                    self.set_group_members(db, id, form_data.user_ids)
                 db.commit()
-                return self.get_group_by_id(id=id)
+
+            self.membership_cache.invalidate()
+            return self.get_group_by_id(id=id)
         except Exception as e:
             log.exception(e)
             return None
@@ -174,8 +297,11 @@ class GroupTable:
         try:
             with get_db() as db:
                 db.query(Group).filter_by(id=id).delete()
+                db.query(GroupMember).filter_by(group_id=id).delete()
                 db.commit()
-                return True
+
+            self.membership_cache.invalidate()
+            return True
         except Exception:
             return False
 
@@ -183,8 +309,10 @@ class GroupTable:
         with get_db() as db:
             try:
                 db.query(Group).delete()
+                db.query(GroupMember).delete()
                 db.commit()
 
+                self.membership_cache.invalidate()
                 return True
             except Exception:
                 return False
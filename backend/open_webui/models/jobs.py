@@ -0,0 +1,219 @@
+import logging
+import time
+import uuid
+from typing import Optional
+
+from open_webui.internal.db import Base, get_db
+from open_webui.env import SRC_LOG_LEVELS
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import BigInteger, Column, Float, Index, Integer, Text, JSON, func
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+####################
+# Ingestion Job DB Schema
+####################
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_job"
+
+    id = Column(Text, primary_key=True)
+    user_id = Column(Text)
+    file_id = Column(Text)
+
+    # pending, running, completed or failed
+    status = Column(Text)
+    progress = Column(Float, default=0.0)
+    attempts = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+
+    data = Column(JSON, nullable=True)
+
+    # Retries are not picked up before this time
+    run_after = Column(BigInteger, default=0)
+
+    created_at = Column(BigInteger)
+    updated_at = Column(BigInteger)
+
+    __table_args__ = (
+        Index("ingestion_job_status_idx", "status", "run_after"),
+        Index("ingestion_job_file_id_idx", "file_id"),
+    )
+
+
+class IngestionJobModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    user_id: str
+    file_id: str
+
+    status: str
+    progress: float = 0.0
+    attempts: int = 0
+    error: Optional[str] = None
+
+    data: Optional[dict] = None
+    run_after: int = 0
+
+    created_at: int  # timestamp in epoch
+    updated_at: int  # timestamp in epoch
+
+
+class IngestionJobTable:
+    def insert_new_job(
+        self, user_id: str, file_id: str, data: Optional[dict] = None
+    ) -> Optional[IngestionJobModel]:
+        with get_db() as db:
+            job = IngestionJobModel(
+                **{
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "file_id": file_id,
+                    "status": "pending",
+                    "data": data or {},
+                    "created_at": int(time.time()),
+                    "updated_at": int(time.time()),
+                }
+            )
+
+            try:
+                result = IngestionJob(**job.model_dump())
+                db.add(result)
+                db.commit()
+                db.refresh(result)
+                return IngestionJobModel.model_validate(result)
+            except Exception as e:
+                log.exception(e)
+                return None
+
+    def get_job_by_id(self, id: str) -> Optional[IngestionJobModel]:
+        with get_db() as db:
+            job = db.query(IngestionJob).filter_by(id=id).first()
+            return IngestionJobModel.model_validate(job) if job else None
+
+    def get_latest_job_by_file_id(self, file_id: str) -> Optional[IngestionJobModel]:
+        with get_db() as db:
+            job = (
+                db.query(IngestionJob)
+                .filter_by(file_id=file_id)
+                .order_by(IngestionJob.created_at.desc())
+                .first()
+            )
+            return IngestionJobModel.model_validate(job) if job else None
+
+    def get_unfinished_jobs_by_file_ids(
+        self, file_ids: list[str]
+    ) -> list[IngestionJobModel]:
+        if not file_ids:
+            return []
+
+        with get_db() as db:
+            return [
+                IngestionJobModel.model_validate(job)
+                for job in db.query(IngestionJob)
+                .filter(
+                    IngestionJob.file_id.in_(file_ids),
+                    IngestionJob.status.in_(["pending", "running"]),
+                )
+                .all()
+            ]
+
+    def get_pending_jobs(self, limit: int = 100) -> list[IngestionJobModel]:
+        with get_db() as db:
+            return [
+                IngestionJobModel.model_validate(job)
+                for job in db.query(IngestionJob)
+                .filter(
+                    IngestionJob.status == "pending",
+                    IngestionJob.run_after <= int(time.time()),
+                )
+                .order_by(IngestionJob.created_at)
+                .limit(limit)
+                .all()
+            ]
+
+    def get_running_job_counts(self) -> dict[str, int]:
+        with get_db() as db:
+            return dict(
+                db.query(IngestionJob.user_id, func.count(IngestionJob.id))
+                .filter_by(status="running")
+                .group_by(IngestionJob.user_id)
+                .all()
+            )
+
+    def claim_job(self, id: str) -> bool:
+        # Atomic pending -> running transition, so only one worker runs a job
+        with get_db() as db:
+            count = (
+                db.query(IngestionJob)
+                .filter_by(id=id, status="pending")
+                .update(
+                    {"status": "running", "updated_at": int(time.time())},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            return count == 1
+
+    def update_job_by_id(self, id: str, updated: dict) -> Optional[IngestionJobModel]:
+        with get_db() as db:
+            db.query(IngestionJob).filter_by(id=id).update(
+                {**updated, "updated_at": int(time.time())},
+                synchronize_session=False,
+            )
+            db.commit()
+            job = db.query(IngestionJob).filter_by(id=id).first()
+            return IngestionJobModel.model_validate(job) if job else None
+
+    def touch_jobs(self, ids: list[str]):
+        if not ids:
+            return
+
+        with get_db() as db:
+            db.query(IngestionJob).filter(IngestionJob.id.in_(ids)).update(
+                {"updated_at": int(time.time())}, synchronize_session=False
+            )
+            db.commit()
+
+    def reset_stale_jobs(self, stale_after: int, max_attempts: int) -> tuple[int, int]:
+        # Running jobs whose worker stopped sending heartbeats (e.g. a restart, or
+        # a file that crashed it) count as a failed attempt; they are requeued,
+        # or failed once they used up their attempts. Returns both counts.
+        now = int(time.time())
+        with get_db() as db:
+            stale = db.query(IngestionJob).filter(
+                IngestionJob.status == "running",
+                IngestionJob.updated_at < now - stale_after,
+            )
+
+            failed = stale.filter(IngestionJob.attempts + 1 >= max_attempts).update(
+                {
+                    "status": "failed",
+                    "attempts": IngestionJob.attempts + 1,
+                    "error": "Processing was interrupted too many times",
+                    "updated_at": now,
+                },
+                synchronize_session=False,
+            )
+            requeued = stale.update(
+                {
+                    "status": "pending",
+                    "attempts": IngestionJob.attempts + 1,
+                    "updated_at": now,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            return requeued, failed
+
+    def delete_jobs_by_file_id(self, file_id: str) -> bool:
+        with get_db() as db:
+            db.query(IngestionJob).filter_by(file_id=file_id).delete()
+            db.commit()
+            return True
+
+
+IngestionJobs = IngestionJobTable()
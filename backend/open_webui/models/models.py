@@ -6,6 +6,7 @@ from open_webui.internal.db import Base, JSONField, get_db
 from open_webui.env import SRC_LOG_LEVELS
 
 from open_webui.models.users import Users, UserResponse
+from open_webui.models.groups import Groups
 
 
 from pydantic import BaseModel, ConfigDict
@@ -206,6 +207,45 @@ class ModelsTable:
             or has_access(user_id, permission, model.access_control)
         ]
 
+    def get_model_access_index(
+        self, type: str = "read"
+    ) -> dict[str, Optional[tuple[set[str], set[str]]]]:
+        """
+        Map every model id to the user ids and group ids allowed `type` access, in
+        one query. None means the model has no access control (readable by all).
+        """
+        with get_db() as db:
+            rows = db.query(Model.id, Model.user_id, Model.access_control).all()
+
+        index = {}
+        for id, user_id, access_control in rows:
+            if access_control is None:
+                index[id] = None if type == "read" else ({user_id}, set())
+            else:
+                permission_access = access_control.get(type, {})
+                index[id] = (
+                    {user_id, *permission_access.get("user_ids", [])},
+                    set(permission_access.get("group_ids", [])),
+                )
+        return index
+
+    def get_model_ids_by_user_access(
+        self,
+        user_id: str,
+        type: str = "read",
+        user_group_ids: Optional[set[str]] = None,
+    ) -> set[str]:
+        if user_group_ids is None:
+            user_group_ids = Groups.get_group_ids_by_member_id(user_id)
+
+        return {
+            id
+            for id, access in self.get_model_access_index(type).items()
+            if access is None
+            or user_id in access[0]
+            or not access[1].isdisjoint(user_group_ids)
+        }
+
     def get_model_by_id(self, id: str) -> Optional[ModelModel]:
         try:
             with get_db() as db:
@@ -0,0 +1,619 @@
+import contextlib
+import functools
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Optional
+
+import numpy as np
+from filelock import FileLock
+
+from open_webui.config import BM25_INDEX_DIR, BM25_INDEX_MAX_SEGMENTS
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.models.bm25 import BM25IndexVersions
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+# BM25 parameters, same defaults as rank_bm25.BM25Okapi used by BM25Retriever
+K1 = 1.5
+B = 0.75
+
+# Compact a collection once this fraction of its documents has been deleted
+COMPACTION_DELETED_RATIO = 0.3
+
+# Number of similarly sized segments merged together
+MERGE_FACTOR = 4
+
+# Seconds a segment dropped from the manifest is kept for searches still using it
+SEGMENT_GRACE_PERIOD = 300
+
+
+def tokenize(text: str) -> list[str]:
+    # Mirrors the default preprocessing of langchain's BM25Retriever
+    return text.split()
+
+
+def match_filter(metadata: Optional[dict], filter: dict) -> bool:
+    metadata = metadata or {}
+    return all(metadata.get(key) == value for key, value in filter.items())
+
+
+class BM25Segment:
+    """
+    An immutable set of documents with its own postings lists.
+
+    Postings are stored as flat int32 arrays (doc index, term frequency) that are
+    memory-mapped on load; the term dictionary maps each term to its slice in those
+    arrays. Document text and metadata live in a JSON lines file and are only read
+    for the final top-k hits; ids and metadata are also stored on their own for
+    deletes and duplicate checks.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(os.path.join(path, "terms.json"), "r") as f:
+            self.terms: dict[str, list[int]] = json.load(f)
+
+        self.doc_ids = np.load(os.path.join(path, "postings_docs.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(path, "postings_tfs.npy"), mmap_mode="r")
+        self.lengths = np.load(os.path.join(path, "lengths.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+
+    @property
+    def count(self) -> int:
+        return len(self.lengths)
+
+    def df(self, term: str) -> int:
+        entry = self.terms.get(term)
+        return entry[1] if entry else 0
+
+    def postings(self, term: str):
+        entry = self.terms.get(term)
+        if not entry:
+            return None, None
+        start, length = entry
+        return self.doc_ids[start : start + length], self.tfs[start : start + length]
+
+    def read_doc(self, idx: int) -> dict:
+        with open(os.path.join(self.path, "docs.jsonl"), "rb") as f:
+            f.seek(int(self.offsets[idx]))
+            return json.loads(f.readline())
+
+    def iter_docs(self):
+        with open(os.path.join(self.path, "docs.jsonl"), "rb") as f:
+            for line in f:
+                yield json.loads(line)
+
+    @functools.cached_property
+    def ids(self) -> list[str]:
+        with open(os.path.join(self.path, "ids.json"), "r") as f:
+            return json.load(f)
+
+    @functools.cached_property
+    def metadatas(self) -> list[Any]:
+        with open(os.path.join(self.path, "metadatas.json"), "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def write(
+        path: str, ids: list[str], texts: list[str], metadatas: list[Any]
+    ) -> dict:
+        os.makedirs(path, exist_ok=True)
+
+        postings: dict[str, list[tuple[int, int]]] = {}
+        lengths = []
+        offsets = []
+
+        with open(os.path.join(path, "docs.jsonl"), "wb") as f:
+            for idx, (id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+                offsets.append(f.tell())
+                f.write(
+                    json.dumps(
+                        {"id": id, "text": text, "metadata": metadata},
+                        ensure_ascii=False,
+                        default=str,
+                    ).encode("utf-8")
+                    + b"\n"
+                )
+
+                tokens = tokenize(text)
+                lengths.append(len(tokens))
+                for term, tf in Counter(tokens).items():
+                    postings.setdefault(term, []).append((idx, tf))
+
+        terms = {}
+        doc_ids = []
+        tfs = []
+        for term, entries in postings.items():
+            terms[term] = [len(doc_ids), len(entries)]
+            for idx, tf in entries:
+                doc_ids.append(idx)
+                tfs.append(tf)
+
+        np.save(os.path.join(path, "postings_docs.npy"), np.array(doc_ids, np.int32))
+        np.save(os.path.join(path, "postings_tfs.npy"), np.array(tfs, np.int32))
+        np.save(os.path.join(path, "lengths.npy"), np.array(lengths, np.int32))
+        np.save(os.path.join(path, "offsets.npy"), np.array(offsets, np.int64))
+        with open(os.path.join(path, "terms.json"), "w") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        with open(os.path.join(path, "ids.json"), "w") as f:
+            json.dump(list(ids), f, ensure_ascii=False)
+        with open(os.path.join(path, "metadatas.json"), "w") as f:
+            json.dump(list(metadatas), f, ensure_ascii=False, default=str)
+
+        return {
+            "id": os.path.basename(path),
+            "count": len(lengths),
+            "total_length": int(sum(lengths)),
+            "deleted": [],
+        }
+
+
+class BM25Collection:
+    """
+    The on-disk BM25 index of a single vector DB collection.
+
+    New documents are written as a new segment, deletes are recorded as tombstones
+    in the manifest, and segments are merged once there are too many of them or too
+    many tombstones. Writers hold the collection's file lock, so workers sharing the
+    directory never overwrite each other's manifest. The manifest is replaced
+    atomically; searches use the manifest they loaded, and segments it no longer
+    references are only removed after SEGMENT_GRACE_PERIOD.
+    """
+
+    def __init__(self, path: str, collection_name: str):
+        self.path = path
+        self.collection_name = collection_name
+        self.manifest = None
+        self.manifest_mtime = None
+        self.segments: dict[str, BM25Segment] = {}
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.path, "manifest.json")
+
+    def lock(self) -> FileLock:
+        # Next to the index directory, which is removed when the index is dropped
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        return FileLock(f"{self.path}.lock")
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    @property
+    def version(self) -> Optional[int]:
+        # Collection version (see BM25IndexVersions) the index was built at
+        if not self.exists():
+            return None
+        manifest, _ = self.load()
+        return manifest.get("source_version")
+
+    def load(self, force: bool = False) -> tuple[dict, dict[str, BM25Segment]]:
+        mtime = os.stat(self.manifest_path).st_mtime_ns
+        if force or self.manifest is None or mtime != self.manifest_mtime:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+
+            segments = {
+                segment["id"]: self.segments.get(segment["id"])
+                or BM25Segment(os.path.join(self.path, segment["id"]))
+                for segment in manifest["segments"]
+            }
+            self.manifest, self.manifest_mtime, self.segments = (
+                manifest,
+                mtime,
+                segments,
+            )
+        return self.manifest, self.segments
+
+    def save(self, manifest: dict):
+        # Called with the lock held
+        os.makedirs(self.path, exist_ok=True)
+        manifest["version"] = manifest.get("version", 0) + 1
+
+        # Segments this manifest drops may still be read by searches that
+        # loaded the previous one, remove them once those are done
+        now = time.time()
+        referenced = {segment["id"] for segment in manifest["segments"]}
+        retired = [
+            *manifest.get("retired", []),
+            *[
+                {"id": segment_id, "retired_at": now}
+                for segment_id in self.segments
+                if segment_id not in referenced
+            ],
+        ]
+        manifest["retired"] = []
+        for segment in retired:
+            if now - segment["retired_at"] > SEGMENT_GRACE_PERIOD:
+                shutil.rmtree(
+                    os.path.join(self.path, segment["id"]), ignore_errors=True
+                )
+            else:
+                manifest["retired"].append(segment)
+
+        tmp_path = f"{self.manifest_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+        self.load(force=True)
+
+    def empty_manifest(self) -> dict:
+        return {"collection_name": self.collection_name, "segments": []}
+
+    def drop(self):
+        # Called with the lock held; searches still reading the index retry
+        self.manifest = None
+        self.segments = {}
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def add(
+        self,
+        ids: list[str],
+        texts: list[str],
+        metadatas: list[Any],
+        source_version: Optional[int] = None,
+    ):
+        # Called with the lock held
+        manifest = self.load(force=True)[0] if self.exists() else self.empty_manifest()
+
+        # Documents the index already has, e.g. picked up by a rebuild from the
+        # vector DB between their insert and this call, are not indexed twice
+        existing = self.get_ids()
+        docs = [
+            (id, text, metadata)
+            for id, text, metadata in zip(ids, texts, metadatas)
+            if id not in existing
+        ]
+        if not docs and self.exists():
+            if manifest.get("source_version") != source_version:
+                self.save({**manifest, "source_version": source_version})
+            return
+
+        segments = manifest["segments"]
+        if docs:
+            segment_id = f"seg-{uuid.uuid4().hex}"
+            segments = [
+                *segments,
+                BM25Segment.write(
+                    os.path.join(self.path, segment_id), *map(list, zip(*docs))
+                ),
+            ]
+
+        self.save({**manifest, "segments": segments, "source_version": source_version})
+        self.maybe_compact()
+
+    def get_ids(self) -> set[str]:
+        # Ids of the documents that are not deleted
+        if not self.exists():
+            return set()
+        manifest, segments = self.load()
+
+        ids = set()
+        for entry in manifest["segments"]:
+            deleted = set(entry["deleted"])
+            ids.update(
+                id
+                for idx, id in enumerate(segments[entry["id"]].ids)
+                if idx not in deleted
+            )
+        return ids
+
+    def delete(
+        self,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+        source_version: Optional[int] = None,
+    ):
+        # Called with the lock held
+        if not self.exists():
+            return
+        manifest, segments = self.load(force=True)
+
+        ids = set(ids or [])
+        entries = []
+        for entry in manifest["segments"]:
+            segment = segments[entry["id"]]
+            deleted = set(entry["deleted"])
+            total_length = entry["total_length"]
+
+            for idx, id in enumerate(segment.ids):
+                if idx in deleted:
+                    continue
+                if id in ids or (
+                    filter and match_filter(segment.metadatas[idx], filter)
+                ):
+                    deleted.add(idx)
+                    total_length -= int(segment.lengths[idx])
+
+            entries.append(
+                {**entry, "deleted": sorted(deleted), "total_length": total_length}
+            )
+
+        self.save({**manifest, "segments": entries, "source_version": source_version})
+        self.maybe_compact()
+
+    def maybe_compact(self):
+        segments = self.manifest["segments"]
+        count = sum(segment["count"] for segment in segments)
+        deleted = sum(len(segment["deleted"]) for segment in segments)
+
+        if count and deleted / count > COMPACTION_DELETED_RATIO:
+            self.compact()
+            return
+
+        # Tiered merging: segments of similar size (same power of MERGE_FACTOR)
+        # are merged once there are MERGE_FACTOR of them, so a document is
+        # rewritten O(log n) times however many small batches it was added in
+        while True:
+            segments = self.manifest["segments"]
+            tiers = {}
+            for segment in segments:
+                tier = int(math.log(max(segment["count"], 1), MERGE_FACTOR))
+                tiers.setdefault(tier, []).append(segment)
+
+            full = [tier for tier in sorted(tiers) if len(tiers[tier]) >= MERGE_FACTOR]
+            if full:
+                self.compact(tiers[full[0]])
+            elif len(segments) > BM25_INDEX_MAX_SEGMENTS:
+                smallest = sorted(segments, key=lambda segment: segment["count"])
+                self.compact(smallest[: len(segments) - BM25_INDEX_MAX_SEGMENTS + 1])
+            else:
+                break
+
+    def compact(self, entries: Optional[list[dict]] = None):
+        # Merges the given segments (all of them by default) into one
+        if entries is None:
+            entries = self.manifest["segments"]
+        merged = {entry["id"] for entry in entries}
+
+        ids, texts, metadatas = [], [], []
+        for entry in entries:
+            deleted = set(entry["deleted"])
+            for idx, doc in enumerate(self.segments[entry["id"]].iter_docs()):
+                if idx not in deleted:
+                    ids.append(doc["id"])
+                    texts.append(doc["text"])
+                    metadatas.append(doc["metadata"])
+
+        segments = [
+            entry for entry in self.manifest["segments"] if entry["id"] not in merged
+        ]
+        if ids:
+            segment_id = f"seg-{uuid.uuid4().hex}"
+            segments.append(
+                BM25Segment.write(
+                    os.path.join(self.path, segment_id), ids, texts, metadatas
+                )
+            )
+
+        log.debug(f"bm25: compacted {self.collection_name} into {len(ids)} documents")
+        self.save({**self.manifest, "segments": segments})
+
+    def search(self, query: str, k: int) -> list[dict]:
+        # Works on the loaded manifest and segments, which writers replace
+        # instead of modifying
+        manifest, segments = self.load()
+
+        entries = manifest["segments"]
+        n = sum(entry["count"] - len(entry["deleted"]) for entry in entries)
+        if n == 0:
+            return []
+        avgdl = max(sum(entry["total_length"] for entry in entries) / n, 1e-9)
+
+        idfs = {}
+        for term in set(tokenize(query)):
+            df = sum(segments[entry["id"]].df(term) for entry in entries)
+            if df:
+                idfs[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+        candidates = []
+        for entry in entries:
+            segment = segments[entry["id"]]
+            scores = np.zeros(segment.count, dtype=np.float32)
+            norm = K1 * (1 - B + B * np.asarray(segment.lengths, np.float32) / avgdl)
+
+            for term, idf in idfs.items():
+                doc_ids, tfs = segment.postings(term)
+                if doc_ids is None:
+                    continue
+                tfs = np.asarray(tfs, np.float32)
+                np.add.at(scores, doc_ids, idf * tfs * (K1 + 1) / (tfs + norm[doc_ids]))
+
+            if entry["deleted"]:
+                scores[entry["deleted"]] = 0
+
+            top = min(k, segment.count)
+            indices = np.argpartition(-scores, top - 1)[:top]
+            candidates.extend(
+                (float(scores[idx]), entry["id"], int(idx))
+                for idx in indices
+                if scores[idx] > 0
+            )
+
+        candidates.sort(key=lambda x: x[0], reverse=True)
+
+        results = []
+        for score, segment_id, idx in candidates[:k]:
+            doc = segments[segment_id].read_doc(idx)
+            results.append({**doc, "score": score})
+        return results
+
+
+class BM25Index:
+    """
+    Per-collection BM25 indexes persisted under BM25_INDEX_DIR.
+
+    The index is kept in sync by the code paths that write to the vector DB. Every
+    write bumps the collection's version in the database (BM25IndexVersions) and
+    local indexes record the version they were built at. A write is applied to the
+    local index if it was up to date. Otherwise an add (re)builds the index from
+    the vector DB contents, and a delete drops it so the next search rebuilds it.
+    Indexes are locked per collection, so building one does not hold up others.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.collections: dict[str, BM25Collection] = {}
+        self.locks: dict[str, threading.RLock] = {}
+        self.lock = threading.Lock()
+
+    def get_collection(self, collection_name: str) -> BM25Collection:
+        with self.lock:
+            if collection_name not in self.collections:
+                dir_name = hashlib.sha256(collection_name.encode()).hexdigest()
+                self.collections[collection_name] = BM25Collection(
+                    os.path.join(self.path, dir_name), collection_name
+                )
+                self.locks[collection_name] = threading.RLock()
+            return self.collections[collection_name]
+
+    @contextlib.contextmanager
+    def locked(self, collection_name: str):
+        # Threads of this process, then other processes sharing the directory
+        collection = self.get_collection(collection_name)
+        with self.locks[collection_name], collection.lock():
+            yield collection
+
+    def has_collection(self, collection_name: str) -> bool:
+        return self.get_collection(collection_name).exists()
+
+    def write(
+        self,
+        collection_name: str,
+        fn: Callable[[BM25Collection, int], None],
+        loader: Optional[Callable] = None,
+    ):
+        try:
+            with self.locked(collection_name) as collection:
+                version = BM25IndexVersions.bump_version(collection_name)
+                if collection.exists() and collection.version == version - 1:
+                    fn(collection, version)
+                elif loader is not None and self.rebuild(collection, loader, version):
+                    # The vector DB already holds what this write added, fn only
+                    # adds what is missing
+                    fn(collection, version)
+                else:
+                    # Rebuilt from the vector DB on the next search
+                    collection.drop()
+        except Exception as e:
+            log.exception(f"bm25: failed to update {collection_name}: {e}")
+            with self.locked(collection_name) as collection:
+                collection.drop()
+
+    def add(
+        self,
+        collection_name: str,
+        ids: list[str],
+        texts: list[str],
+        metadatas: list[Any],
+        loader: Optional[Callable] = None,
+    ):
+        if not ids:
+            return
+        self.write(
+            collection_name,
+            lambda collection, version: collection.add(
+                ids, texts, metadatas, source_version=version
+            ),
+            loader=loader,
+        )
+
+    def delete(
+        self,
+        collection_name: str,
+        ids: Optional[list[str]] = None,
+        filter: Optional[dict] = None,
+    ):
+        self.write(
+            collection_name,
+            lambda collection, version: collection.delete(
+                ids=ids, filter=filter, source_version=version
+            ),
+        )
+
+    def delete_collection(self, collection_name: str):
+        with self.locked(collection_name) as collection:
+            try:
+                BM25IndexVersions.bump_version(collection_name)
+            except Exception as e:
+                log.warning(f"bm25: failed to update version of {collection_name}: {e}")
+            collection.drop()
+
+    def reset(self):
+        try:
+            BM25IndexVersions.bump_all_versions()
+        except Exception as e:
+            log.warning(f"bm25: failed to update versions: {e}")
+
+        with self.lock:
+            self.collections = {}
+            self.locks = {}
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def rebuild(
+        self, collection: BM25Collection, loader: Callable, version: int
+    ) -> bool:
+        # Called with the collection locked
+        log.info(f"bm25: building index for {collection.collection_name}")
+        collection.drop()
+        result = loader(collection.collection_name)
+        if result is None:
+            return False
+        collection.add(
+            result.ids[0],
+            result.documents[0],
+            result.metadatas[0],
+            source_version=version,
+        )
+        return True
+
+    def build(self, collection_name: str, loader: Callable, version: int) -> bool:
+        with self.locked(collection_name) as collection:
+            # Built or written to at this version or later in the meantime
+            if collection.exists() and (collection.version or 0) >= version:
+                return True
+            return self.rebuild(collection, loader, version)
+
+    def search(
+        self,
+        collection_name: str,
+        query: str,
+        k: int,
+        loader: Optional[Callable] = None,
+    ) -> list[dict]:
+        collection = self.get_collection(collection_name)
+
+        try:
+            version = BM25IndexVersions.get_version(collection_name)
+        except Exception as e:
+            log.warning(f"bm25: failed to read version of {collection_name}: {e}")
+            version = collection.version
+
+        for attempt in range(2):
+            try:
+                if not collection.exists() or collection.version != version:
+                    if loader is None or not self.build(
+                        collection_name, loader, version
+                    ):
+                        return []
+                return collection.search(query, k)
+            except FileNotFoundError:
+                # The index was dropped or rebuilt while it was being read
+                if attempt == 1:
+                    raise
+        return []
+
+
+BM25_INDEX = BM25Index(BM25_INDEX_DIR)
@@ -0,0 +1,341 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Union
+
+import numpy as np
+
+from open_webui.config import (
+    ENABLE_EMBEDDING_CACHE,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_MEMORY_SIZE,
+    EMBEDDING_CACHE_DISK_MAX_MB,
+)
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+# Seconds between measurements of the disk store size, writes in between add
+# the size of their rows to the last measurement
+DISK_SIZE_INTERVAL = 60
+
+
+def get_text_key(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def get_namespace(engine: str, model: str) -> str:
+    return hashlib.sha256(f"{engine}\0{model}".encode()).hexdigest()[:16]
+
+
+class EmbeddingDiskStore:
+    """
+    SQLite table of float32 vectors keyed by (namespace, text hash).
+
+    Every worker process opens the same database, so concurrent writers are
+    serialized by SQLite's file locking and rows always hold their own vector.
+    WAL mode lets reads continue while another process writes. Each thread uses
+    its own connection, so threads never share a transaction.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections: list[sqlite3.Connection] = []
+
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS embedding "
+            "(namespace TEXT, key TEXT, vector BLOB, PRIMARY KEY (namespace, key))"
+        )
+        self.db.commit()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(
+                os.path.join(self.path, "embeddings.db"),
+                timeout=30,
+                check_same_thread=False,
+            )
+            with self.lock:
+                self.connections.append(db)
+            self.local.db = db
+        return db
+
+    @property
+    def size(self) -> int:
+        # Bytes in use; pages freed by deletes are reused before the file grows
+        page_count = self.db.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = self.db.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = self.db.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - freelist_count) * page_size
+
+    def get_many(self, namespace: str, keys: list[str]) -> dict[str, list[float]]:
+        vectors = {}
+        # Stay under SQLite's bound parameter limit
+        for i in range(0, len(keys), 500):
+            batch = keys[i : i + 500]
+            for key, vector in self.db.execute(
+                "SELECT key, vector FROM embedding "
+                f"WHERE namespace = ? AND key IN ({','.join('?' * len(batch))})",
+                [namespace, *batch],
+            ).fetchall():
+                vectors[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return vectors
+
+    def set_many(self, namespace: str, items: dict[str, list[float]]) -> int:
+        # Returns the approximate number of bytes written
+        rows = [
+            (namespace, key, np.asarray(vector, dtype=np.float32).tobytes())
+            for key, vector in items.items()
+        ]
+        self.db.executemany(
+            "INSERT OR REPLACE INTO embedding (namespace, key, vector) VALUES (?, ?, ?)",
+            rows,
+        )
+        self.db.commit()
+        return sum(len(namespace) + len(key) + len(vector) for _, key, vector in rows)
+
+    def delete(self, namespace: Optional[str] = None, keep: Optional[str] = None):
+        # Rows of `namespace` (all rows if None), except those of `keep`
+        query, params = "DELETE FROM embedding WHERE 1 = 1", []
+        if namespace is not None:
+            query, params = f"{query} AND namespace = ?", [*params, namespace]
+        if keep is not None:
+            query, params = f"{query} AND namespace != ?", [*params, keep]
+
+        self.db.execute(query, params)
+        self.db.commit()
+
+    def close(self):
+        with self.lock:
+            for db in self.connections:
+                db.close()
+            self.connections = []
+        self.local = threading.local()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embeddings, kept per (engine, model) namespace
+    (see get_namespace) so another engine or model never gets them.
+
+    Lookups go to an in-memory LRU first, then to the on-disk store. The lock
+    only guards the LRU and the stats; disk reads and writes run outside of it.
+    When the disk store is full, entries of other namespaces are dropped first,
+    then those of the namespace being written.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        memory_size: int,
+        disk_max_bytes: int,
+        enabled: bool = True,
+    ):
+        self.path = path
+        self.memory_size = memory_size
+        self.disk_max_bytes = disk_max_bytes
+        self.enabled = enabled
+
+        self.lock = threading.RLock()
+        self.memory: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+        self.disk: Optional[EmbeddingDiskStore] = None
+        self.disk_failed = False
+        self.disk_size: Optional[int] = None
+        self.disk_size_measured_at = 0.0
+
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bytes_saved": 0,
+        }
+
+    def get_disk(self) -> Optional[EmbeddingDiskStore]:
+        # Opened on first use
+        with self.lock:
+            if self.enabled and self.disk is None and not self.disk_failed:
+                try:
+                    self.disk = EmbeddingDiskStore(self.path)
+                except Exception as e:
+                    log.warning(f"Embedding disk cache disabled: {e}")
+                    self.disk_failed = True
+            return self.disk
+
+    def get_disk_size(self, disk: EmbeddingDiskStore, refresh: bool = False) -> int:
+        with self.lock:
+            if (
+                not refresh
+                and self.disk_size is not None
+                and time.monotonic() - self.disk_size_measured_at < DISK_SIZE_INTERVAL
+            ):
+                return self.disk_size
+
+        size = disk.size
+        with self.lock:
+            self.disk_size = size
+            self.disk_size_measured_at = time.monotonic()
+        return size
+
+    def clear(self):
+        with self.lock:
+            self.memory = OrderedDict()
+            self.disk_size = None
+            self.reset_stats()
+
+        disk = self.get_disk()
+        if disk is not None:
+            disk.delete()
+
+    def get_many(self, namespace: str, texts: list[str]) -> dict[str, list[float]]:
+        keys = {text: get_text_key(text) for text in texts}
+        found = {}
+
+        with self.lock:
+            for text, key in keys.items():
+                if (namespace, key) in self.memory:
+                    self.memory.move_to_end((namespace, key))
+                    found[text] = self.memory[(namespace, key)]
+            self.stats["memory_hits"] += len(found)
+
+        missing = [keys[text] for text in keys if text not in found]
+        disk = self.get_disk() if missing else None
+        vectors = {}
+        if disk is not None:
+            try:
+                vectors = disk.get_many(namespace, missing)
+            except Exception as e:
+                log.warning(f"Embedding disk cache read failed: {e}")
+
+        with self.lock:
+            disk_hits = 0
+            for text, key in keys.items():
+                if text not in found and key in vectors:
+                    found[text] = vectors[key]
+                    self.set_memory((namespace, key), vectors[key])
+                    disk_hits += 1
+            self.stats["disk_hits"] += disk_hits
+
+            self.stats["misses"] += len(keys) - len(found)
+            self.stats["bytes_saved"] += sum(
+                len(text.encode()) + 4 * len(found[text]) for text in found
+            )
+
+        return found
+
+    def set_memory(self, key: tuple[str, str], vector: list[float]):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def set_many(self, namespace: str, items: dict[str, list[float]]):
+        keyed_items = {get_text_key(text): vector for text, vector in items.items()}
+        with self.lock:
+            for key, vector in keyed_items.items():
+                self.set_memory((namespace, key), vector)
+
+        disk = self.get_disk()
+        if disk is None:
+            return
+
+        try:
+            if self.get_disk_size(disk) > self.disk_max_bytes:
+                log.info("Embedding disk cache is full, dropping other models")
+                disk.delete(keep=namespace)
+                if self.get_disk_size(disk, refresh=True) > self.disk_max_bytes:
+                    log.info("Embedding disk cache is full, clearing it")
+                    disk.delete(namespace)
+                    self.get_disk_size(disk, refresh=True)
+
+            written = disk.set_many(namespace, keyed_items)
+            with self.lock:
+                if self.disk_size is not None:
+                    self.disk_size += written
+        except Exception as e:
+            log.warning(f"Embedding disk cache write failed: {e}")
+
+    def prepare(self, namespace: str, query: Union[str, list[str]]):
+        texts = [query] if isinstance(query, str) else list(query)
+        found = self.get_many(namespace, texts)
+        missing = list(dict.fromkeys(text for text in texts if text not in found))
+        return texts, found, missing
+
+    def finish(self, namespace: str, query, texts, found, missing, embeddings):
+        if missing:
+            if embeddings is None or len(embeddings) != len(missing):
+                return None
+            computed = dict(zip(missing, embeddings))
+            self.set_many(namespace, computed)
+            found = {**found, **computed}
+
+        result = [found[text] for text in texts]
+        return result[0] if isinstance(query, str) else result
+
+    def embed(
+        self,
+        namespace: str,
+        query: Union[str, list[str]],
+        embedding_function: Callable[[list[str]], Optional[list[list[float]]]],
+    ):
+        if not self.enabled:
+            return embedding_function(query)
+
+        texts, found, missing = self.prepare(namespace, query)
+        embeddings = embedding_function(missing) if missing else None
+        return self.finish(namespace, query, texts, found, missing, embeddings)
+
+    async def aembed(
+        self,
+        namespace: str,
+        query: Union[str, list[str]],
+        embedding_function: Callable[[list[str]], Awaitable],
+    ):
+        if not self.enabled:
+            return await embedding_function(query)
+
+        # Cache lookups and writes may touch the disk store
+        texts, found, missing = await asyncio.to_thread(self.prepare, namespace, query)
+        embeddings = await embedding_function(missing) if missing else None
+        return await asyncio.to_thread(
+            self.finish, namespace, query, texts, found, missing, embeddings
+        )
+
+    def get_stats(self) -> dict:
+        disk = self.get_disk()
+        disk_bytes = disk.size if disk is not None else 0
+
+        with self.lock:
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                "enabled": self.enabled,
+                **self.stats,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+                "disk_bytes": disk_bytes,
+            }
+
+
+EMBEDDING_CACHE = EmbeddingCache(
+    EMBEDDING_CACHE_DIR,
+    memory_size=EMBEDDING_CACHE_MEMORY_SIZE,
+    disk_max_bytes=EMBEDDING_CACHE_DISK_MAX_MB * 1024 * 1024,
+    enabled=ENABLE_EMBEDDING_CACHE,
+)
@@ -0,0 +1,329 @@
+import asyncio
+import logging
+import random
+import threading
+from concurrent.futures import Future
+from typing import Optional, Union
+
+import aiohttp
+
+from open_webui.config import (
+    RAG_EMBEDDING_CONCURRENCY,
+    RAG_EMBEDDING_MAX_RETRIES,
+    RAG_EMBEDDING_BATCH_MAX_TOKENS,
+    RAG_EMBEDDING_TIMEOUT,
+)
+from open_webui.env import (
+    AIOHTTP_CLIENT_POOL_LIMIT,
+    AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST,
+    AIOHTTP_CLIENT_DNS_CACHE_TTL,
+    AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT,
+    AIOHTTP_CLIENT_DRAIN_TIMEOUT,
+    SRC_LOG_LEVELS,
+)
+from open_webui.utils.http_client import UpstreamClientRegistry
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+# Longest wait between retries, in seconds
+MAX_RETRY_DELAY = 30.0
+
+
+class EmbeddingError(Exception):
+    pass
+
+
+class EmbeddingHTTPError(EmbeddingError):
+    def __init__(self, status: int, detail: str, retry_after: Optional[str] = None):
+        super().__init__(f"Embedding request failed with status {status}: {detail}")
+        self.status = status
+        self.detail = detail
+
+        try:
+            self.retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            self.retry_after = None
+
+    @property
+    def retryable(self) -> bool:
+        return self.status == 429 or self.status >= 500
+
+    @property
+    def too_large(self) -> bool:
+        # Providers reject batches over their token limit with 413 or a 400
+        # mentioning the context length
+        detail = self.detail.lower()
+        return self.status == 413 or (
+            self.status == 400
+            and any(word in detail for word in ["token", "context", "too large"])
+        )
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token; avoids running a tokenizer per chunk
+    return len(text) // 4 + 1
+
+
+def get_batches(
+    texts: list[str], max_items: Optional[int], max_tokens: int
+) -> list[list[str]]:
+    batches = []
+    batch = []
+    batch_tokens = 0
+
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if batch and (
+            (max_items and len(batch) >= max_items)
+            or batch_tokens + tokens > max_tokens
+        ):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+
+        batch.append(text)
+        batch_tokens += tokens
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class EmbeddingClient:
+    """
+    Sends embedding batches to Ollama or OpenAI-compatible engines.
+
+    Requests run on a dedicated event loop thread with one pooled aiohttp session
+    per host, so synchronous callers (document ingestion runs in worker threads)
+    and async callers share connections and the same concurrency limit. Batches
+    are dispatched concurrently, retried with jittered exponential backoff on
+    429/5xx and connection errors, and split in half when the provider rejects
+    them as too large; the token budget for that model is then lowered so later
+    batches are sized to fit. Results keep the order of the input texts and any
+    failure raises EmbeddingError instead of returning None.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        max_retries: int,
+        max_batch_tokens: int,
+        timeout: Optional[float],
+    ):
+        self.concurrency = max(concurrency, 1)
+        self.max_retries = max(max_retries, 0)
+        self.max_batch_tokens = max_batch_tokens
+        self.timeout = timeout
+
+        self.clients = UpstreamClientRegistry(
+            limit=AIOHTTP_CLIENT_POOL_LIMIT,
+            limit_per_host=AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST,
+            dns_cache_ttl=AIOHTTP_CLIENT_DNS_CACHE_TTL,
+            keepalive_timeout=AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT,
+            drain_timeout=AIOHTTP_CLIENT_DRAIN_TIMEOUT,
+        )
+
+        self.lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+        # Token budgets learned from rejected batches, keyed by (url, model)
+        self.batch_token_limits: dict[tuple[str, str], int] = {}
+
+        self.stats = {
+            "requests": 0,
+            "texts": 0,
+            "retries": 0,
+            "splits": 0,
+            "errors": 0,
+        }
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.loop = asyncio.new_event_loop()
+                self.semaphore = asyncio.Semaphore(self.concurrency)
+                self.thread = threading.Thread(
+                    target=self.loop.run_forever, name="embedding-client", daemon=True
+                )
+                self.thread.start()
+            return self.loop
+
+    def submit(self, coro) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.get_loop())
+
+    def embed(
+        self,
+        engine: str,
+        model: str,
+        text: Union[str, list[str]],
+        url: str,
+        key: str = "",
+        batch_size: Optional[int] = None,
+    ):
+        return self.submit(
+            self.generate(engine, model, text, url, key, batch_size)
+        ).result()
+
+    async def aembed(
+        self,
+        engine: str,
+        model: str,
+        text: Union[str, list[str]],
+        url: str,
+        key: str = "",
+        batch_size: Optional[int] = None,
+    ):
+        return await asyncio.wrap_future(
+            self.submit(self.generate(engine, model, text, url, key, batch_size))
+        )
+
+    async def generate(self, engine, model, text, url, key, batch_size):
+        texts = [text] if isinstance(text, str) else list(text)
+        if not texts:
+            return []
+
+        max_tokens = self.batch_token_limits.get((url, model), self.max_batch_tokens)
+        tasks = [
+            asyncio.create_task(self.generate_batch(engine, model, batch, url, key))
+            for batch in get_batches(texts, batch_size, max_tokens)
+        ]
+
+        try:
+            results = await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            self.stats["errors"] += 1
+            raise
+
+        embeddings = [embedding for result in results for embedding in result]
+        return embeddings[0] if isinstance(text, str) else embeddings
+
+    async def generate_batch(
+        self, engine: str, model: str, texts: list[str], url: str, key: str
+    ) -> list[list[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.semaphore:
+                    return await self.request(engine, model, texts, url, key)
+            except EmbeddingHTTPError as e:
+                if e.too_large and len(texts) > 1:
+                    return await self.split_batch(engine, model, texts, url, key)
+                if not e.retryable or attempt == self.max_retries:
+                    raise
+                delay = e.retry_after
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries:
+                    raise EmbeddingError(f"Embedding request to {url} failed: {e}")
+                delay = None
+
+            if delay is None:
+                delay = min(0.5 * 2**attempt, MAX_RETRY_DELAY) * random.uniform(0.5, 1)
+            log.warning(
+                f"Embedding request to {url} failed, retrying in {delay:.1f}s "
+                f"({attempt + 1}/{self.max_retries})"
+            )
+            self.stats["retries"] += 1
+            await asyncio.sleep(min(delay, MAX_RETRY_DELAY))
+
+    async def split_batch(
+        self, engine: str, model: str, texts: list[str], url: str, key: str
+    ) -> list[list[float]]:
+        self.stats["splits"] += 1
+
+        middle = len(texts) // 2
+        tokens = sum(estimate_tokens(text) for text in texts[:middle])
+        limit = self.batch_token_limits.get((url, model), self.max_batch_tokens)
+        if tokens < limit:
+            log.info(f"Lowering embedding batch token budget for {model} to {tokens}")
+            self.batch_token_limits[(url, model)] = tokens
+
+        first, second = await asyncio.gather(
+            self.generate_batch(engine, model, texts[:middle], url, key),
+            self.generate_batch(engine, model, texts[middle:], url, key),
+        )
+        return first + second
+
+    async def request(
+        self, engine: str, model: str, texts: list[str], url: str, key: str
+    ) -> list[list[float]]:
+        if engine == "openai":
+            endpoint = f"{url}/embeddings"
+        elif engine == "ollama":
+            endpoint = f"{url}/api/embed"
+        else:
+            raise EmbeddingError(f"Unsupported embedding engine: {engine}")
+
+        self.stats["requests"] += 1
+        session = self.clients.get_session(url)
+        async with session.post(
+            endpoint,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {key}",
+            },
+            json={"input": texts, "model": model},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        ) as r:
+            if r.status >= 400:
+                raise EmbeddingHTTPError(
+                    r.status, await r.text(), r.headers.get("Retry-After")
+                )
+            data = await r.json(content_type=None)
+
+        if engine == "openai" and "data" in data:
+            embeddings = [
+                item["embedding"]
+                for item in sorted(data["data"], key=lambda item: item.get("index", 0))
+            ]
+        elif engine == "ollama" and "embeddings" in data:
+            embeddings = data["embeddings"]
+        else:
+            raise EmbeddingError(f"Unexpected embedding response from {url}")
+
+        if len(embeddings) != len(texts):
+            raise EmbeddingError(
+                f"Expected {len(texts)} embeddings from {url}, got {len(embeddings)}"
+            )
+
+        self.stats["texts"] += len(texts)
+        return embeddings
+
+    async def close(self):
+        with self.lock:
+            loop, thread = self.loop, self.thread
+            self.loop = self.thread = None
+
+        if loop is None:
+            return
+
+        try:
+            await asyncio.wrap_future(
+                asyncio.run_coroutine_threadsafe(self.clients.close(), loop)
+            )
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            await asyncio.to_thread(thread.join, 5)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "concurrency": self.concurrency,
+            "batch_token_limits": {
+                f"{url} {model}": tokens
+                for (url, model), tokens in self.batch_token_limits.items()
+            },
+            "pools": self.clients.get_stats(),
+        }
+
+
+EMBEDDING_CLIENT = EmbeddingClient(
+    concurrency=RAG_EMBEDDING_CONCURRENCY,
+    max_retries=RAG_EMBEDDING_MAX_RETRIES,
+    max_batch_tokens=RAG_EMBEDDING_BATCH_MAX_TOKENS,
+    timeout=RAG_EMBEDDING_TIMEOUT,
+)
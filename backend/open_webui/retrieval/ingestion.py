@@ -0,0 +1,325 @@
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+import aiohttp
+from fastapi import FastAPI, Request
+
+from open_webui.models.jobs import IngestionJobModel, IngestionJobs
+from open_webui.models.users import Users
+from open_webui.retrieval.embedding_client import EmbeddingError, EmbeddingHTTPError
+from open_webui.socket.main import get_event_emitter
+from open_webui.config import (
+    INGESTION_WORKERS,
+    INGESTION_MAX_JOBS_PER_USER,
+    INGESTION_JOB_MAX_ATTEMPTS,
+    INGESTION_JOB_STALE_TIMEOUT,
+)
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+# Progress callback of the job running in the current context, if any
+job_progress: ContextVar[Optional[Callable[[float, str], None]]] = ContextVar(
+    "job_progress", default=None
+)
+
+
+def report_progress(progress: float, description: str = ""):
+    # No-op unless called while processing an ingestion job
+    reporter = job_progress.get()
+    if reporter is not None:
+        reporter(progress, description)
+
+
+def is_transient_error(e: BaseException) -> bool:
+    # process_file wraps errors in HTTPException, so look down the whole chain
+    while e is not None:
+        if isinstance(e, EmbeddingHTTPError):
+            return e.retryable
+        if isinstance(
+            e,
+            (
+                EmbeddingError,
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                ConnectionError,
+                TimeoutError,
+            ),
+        ):
+            return True
+        e = e.__cause__ or e.__context__
+    return False
+
+
+class IngestionJobQueue:
+    """
+    Processes uploaded files in the background instead of inside the upload request.
+
+    Jobs are stored in the ingestion_job table, which is the queue: every worker
+    process polls it for pending jobs and claims one with an atomic status update.
+    Running jobs send a heartbeat on each poll; jobs whose heartbeat stops (the
+    process was restarted or died) are requeued after INGESTION_JOB_STALE_TIMEOUT,
+    which counts as an attempt, so a file that keeps crashing the worker fails.
+    At most `workers` jobs run per process and at most `max_jobs_per_user` per
+    user. Jobs that fail with a transient error (embedding or connection errors)
+    are retried with backoff up to `max_attempts` times. Status and progress are
+    sent to the owner's sessions through the socket event emitter.
+
+    Jobs run on their own thread pool, so long parses do not hold the default
+    executor that asyncio.to_thread and sync request handlers depend on.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_jobs_per_user: int,
+        max_attempts: int,
+        stale_after: int,
+        poll_interval: float = 5.0,
+    ):
+        self.workers = max(workers, 1)
+        self.max_jobs_per_user = max(max_jobs_per_user, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+
+        self.app: Optional[FastAPI] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.running: dict[str, asyncio.Task] = {}
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def started(self) -> bool:
+        return self.task is not None
+
+    def start(self, app: FastAPI):
+        if self.task is None:
+            self.app = app
+            self.loop = asyncio.get_running_loop()
+            self.wakeup = asyncio.Event()
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="ingestion"
+            )
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+        # Interrupted jobs are picked up again once their heartbeat goes stale
+        for task in list(self.running.values()):
+            task.cancel()
+        self.running = {}
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def submit(self, user_id: str, file_id: str, data: dict) -> IngestionJobModel:
+        job = IngestionJobs.insert_new_job(user_id, file_id, data)
+        if job is None:
+            raise Exception("Could not create ingestion job")
+
+        self.notify()
+        return job
+
+    def notify(self):
+        # May be called from request handlers running in worker threads
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    async def run(self):
+        try:
+            while True:
+                try:
+                    await asyncio.to_thread(
+                        IngestionJobs.touch_jobs, list(self.running)
+                    )
+                    requeued, failed = await asyncio.to_thread(
+                        IngestionJobs.reset_stale_jobs,
+                        self.stale_after,
+                        self.max_attempts,
+                    )
+                    if requeued:
+                        log.info(f"Requeued {requeued} interrupted ingestion jobs")
+                    if failed:
+                        log.warning(
+                            f"Failed {failed} ingestion jobs interrupted "
+                            f"{self.max_attempts} times"
+                        )
+
+                    await self.dispatch()
+                except Exception as e:
+                    log.exception(f"Error dispatching ingestion jobs: {e}")
+
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+        except asyncio.CancelledError:
+            pass
+
+    async def dispatch(self):
+        free = self.workers - len(self.running)
+        if free <= 0:
+            return
+
+        jobs = await asyncio.to_thread(IngestionJobs.get_pending_jobs)
+        if not jobs:
+            return
+
+        counts = await asyncio.to_thread(IngestionJobs.get_running_job_counts)
+        for job in jobs:
+            if free <= 0:
+                break
+            if counts.get(job.user_id, 0) >= self.max_jobs_per_user:
+                continue
+            if not await asyncio.to_thread(IngestionJobs.claim_job, job.id):
+                continue
+
+            counts[job.user_id] = counts.get(job.user_id, 0) + 1
+            free -= 1
+            self.running[job.id] = asyncio.create_task(self.run_job(job))
+
+    async def run_job(self, job: IngestionJobModel):
+        job_id = job.id
+        event_emitter = get_event_emitter(
+            {
+                "user_id": job.user_id,
+                "chat_id": None,
+                "message_id": None,
+                "session_id": None,
+            }
+        )
+
+        async def emit(job: IngestionJobModel, description: str = ""):
+            try:
+                await event_emitter(
+                    {
+                        "type": "file:job",
+                        "data": {
+                            "job_id": job.id,
+                            "file_id": job.file_id,
+                            "status": job.status,
+                            "progress": job.progress,
+                            "attempts": job.attempts,
+                            "error": job.error,
+                            "description": description,
+                        },
+                    }
+                )
+            except Exception as e:
+                log.debug(f"Error emitting ingestion job event: {e}")
+
+        def reporter(progress: float, description: str = ""):
+            # Called from the processing thread
+            updated = IngestionJobs.update_job_by_id(job_id, {"progress": progress})
+            if updated:
+                asyncio.run_coroutine_threadsafe(emit(updated, description), self.loop)
+
+        log.info(f"Processing file {job.file_id} (job {job_id})")
+        await emit(job, "processing")
+
+        try:
+            job_progress.set(reporter)
+            # Like asyncio.to_thread, the job runs with a copy of this context
+            await self.loop.run_in_executor(
+                self.executor, contextvars.copy_context().run, self.process, job
+            )
+
+            job = await asyncio.to_thread(
+                IngestionJobs.update_job_by_id,
+                job_id,
+                {"status": "completed", "progress": 1.0, "error": None},
+            )
+            if job:
+                await emit(job, "completed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            attempts = job.attempts + 1
+            error = str(e.detail) if hasattr(e, "detail") else str(e)
+
+            if attempts < self.max_attempts and is_transient_error(e):
+                delay = int(min(10 * 2 ** (attempts - 1), 300) * random.uniform(1, 1.5))
+                log.warning(
+                    f"Ingestion job {job_id} failed ({error}), retrying in {delay}s"
+                )
+                updated = {
+                    "status": "pending",
+                    "run_after": int(time.time()) + delay,
+                }
+            else:
+                log.error(f"Ingestion job {job_id} failed: {error}")
+                updated = {"status": "failed"}
+
+            job = await asyncio.to_thread(
+                IngestionJobs.update_job_by_id,
+                job_id,
+                {**updated, "attempts": attempts, "error": error},
+            )
+            if job:
+                await emit(job, job.status)
+        finally:
+            self.running.pop(job_id, None)
+            self.notify()
+
+    def process(self, job: IngestionJobModel):
+        from open_webui.routers.retrieval import process_file, ProcessFileForm
+
+        request = Request({"type": "http", "app": self.app})
+        process_file(
+            request,
+            ProcessFileForm(**{**(job.data or {}), "file_id": job.file_id}),
+            user=Users.get_user_by_id(job.user_id),
+        )
+
+    def get_unprocessed_file_ids(self, file_ids: list[str]) -> list[str]:
+        # Files whose latest job is unfinished or failed; files that were
+        # processed in the upload request have no job
+        unprocessed = []
+        for file_id in file_ids:
+            job = IngestionJobs.get_latest_job_by_file_id(file_id)
+            if job is not None and job.status != "completed":
+                unprocessed.append(file_id)
+        return unprocessed
+
+    async def await_files(self, file_ids: list[str], timeout: float) -> list[str]:
+        # Waits for the jobs of the files and returns the ids of the files that
+        # were not processed (still running after `timeout` or failed)
+        deadline = time.monotonic() + timeout
+        while await asyncio.to_thread(
+            IngestionJobs.get_unfinished_jobs_by_file_ids, file_ids
+        ):
+            if time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(0.5)
+        return await asyncio.to_thread(self.get_unprocessed_file_ids, file_ids)
+
+    def get_stats(self) -> dict:
+        return {
+            "started": self.started,
+            "workers": self.workers,
+            "running": list(self.running),
+            "max_jobs_per_user": self.max_jobs_per_user,
+        }
+
+
+INGESTION_JOBS = IngestionJobQueue(
+    workers=INGESTION_WORKERS,
+    max_jobs_per_user=INGESTION_MAX_JOBS_PER_USER,
+    max_attempts=INGESTION_JOB_MAX_ATTEMPTS,
+    stale_after=INGESTION_JOB_STALE_TIMEOUT,
+)
@@ -2,6 +2,7 @@ import requests
 import logging
 import ftfy
 import sys
+from typing import Iterator
 
 from langchain_community.document_loaders import (
     BSHTMLLoader,
@@ -18,8 +19,14 @@ from langchain_community.document_loaders import (
     UnstructuredXMLLoader,
     YoutubeLoader,
 )
+from langchain_community.document_loaders.parsers.pdf import PyPDFParser
 from langchain_core.documents import Document
-from open_webui.env import SRC_LOG_LEVELS, GLOBAL_LOG_LEVEL
+from open_webui.retrieval.loaders.pool import PARSING_POOL
+from open_webui.env import (
+    ENABLE_PARSING_PROCESS_POOL,
+    SRC_LOG_LEVELS,
+    GLOBAL_LOG_LEVEL,
+)
 
 logging.basicConfig(stream=sys.stdout, level=GLOBAL_LOG_LEVEL)
 log = logging.getLogger(__name__)
@@ -115,6 +122,13 @@ class TikaLoader:
             raise Exception(f"Error calling Tika: {r.reason}")
 
 
+def fix_documents(docs: list[Document]) -> list[Document]:
+    return [
+        Document(page_content=ftfy.fix_text(doc.page_content), metadata=doc.metadata)
+        for doc in docs
+    ]
+
+
 class Loader:
     def __init__(self, engine: str = "", **kwargs):
         self.engine = engine
@@ -123,15 +137,51 @@ class Loader:
     def load(
         self, filename: str, file_content_type: str, file_path: str
     ) -> list[Document]:
+        return list(self.lazy_load(filename, file_content_type, file_path))
+
+    def lazy_load(
+        self, filename: str, file_content_type: str, file_path: str
+    ) -> Iterator[Document]:
+        """
+        Yields documents as they are parsed. Local loaders run in the parsing
+        process pool, where large PDFs are parsed as page ranges in parallel and
+        yielded in page order as each range finishes.
+        """
         loader = self._get_loader(filename, file_content_type, file_path)
-        docs = loader.load()
 
-        return [
-            Document(
-                page_content=ftfy.fix_text(doc.page_content), metadata=doc.metadata
+        # Tika does the parsing on its own server
+        if ENABLE_PARSING_PROCESS_POOL and not isinstance(loader, TikaLoader):
+            yield from PARSING_POOL.parse(
+                self.engine, self.kwargs, filename, file_content_type, file_path
+            )
+        else:
+            yield from fix_documents(loader.load())
+
+    def load_documents(
+        self, filename: str, file_content_type: str, file_path: str
+    ) -> list[Document]:
+        # Runs the loader in the current process
+        loader = self._get_loader(filename, file_content_type, file_path)
+        return fix_documents(loader.load())
+
+    def load_pdf_pages(self, file_path: str, start: int, end: int) -> list[Document]:
+        # Same output as PyPDFLoader, for pages [start, end) only
+        import pypdf
+
+        parser = PyPDFParser(extract_images=self.kwargs.get("PDF_EXTRACT_IMAGES"))
+        reader = pypdf.PdfReader(file_path)
+
+        docs = []
+        for page_number in range(start, min(end, len(reader.pages))):
+            page = reader.pages[page_number]
+            docs.append(
+                Document(
+                    page_content=page.extract_text()
+                    + parser._extract_images_from_page(page),
+                    metadata={"source": file_path, "page": page_number},
+                )
             )
-            for doc in docs
-        ]
+        return fix_documents(docs)
 
     def _get_loader(self, filename: str, file_content_type: str, file_path: str):
         file_ext = filename.split(".")[-1].lower()
@@ -0,0 +1,248 @@
+import logging
+import multiprocessing
+import threading
+import time
+import weakref
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator
+
+from langchain_core.documents import Document
+from open_webui.env import (
+    PARSING_POOL_WORKERS,
+    PARSING_TIMEOUT,
+    PARSING_WORKER_MEMORY_LIMIT_MB,
+    PARSING_PDF_PAGES_PER_TASK,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+# Workers are recycled after this many tasks to return memory kept by parsers
+WORKER_MAX_TASKS = 50
+
+OFFICE_EXTENSIONS = ["docx", "xls", "xlsx", "ppt", "pptx", "epub", "msg", "rst", "xml"]
+
+
+def get_format_group(filename: str, file_content_type: str) -> str:
+    file_ext = filename.split(".")[-1].lower()
+    if file_ext == "pdf":
+        return "pdf"
+    if file_ext in OFFICE_EXTENSIONS or (
+        file_content_type
+        and (
+            file_content_type.startswith("application/vnd.")
+            or file_content_type == "application/epub+zip"
+        )
+    ):
+        return "office"
+    return "text"
+
+
+####################################
+# Worker process functions
+####################################
+
+
+def init_worker(memory_limit_mb: int):
+    if memory_limit_mb > 0:
+        try:
+            import resource
+
+            limit = memory_limit_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError) as e:
+            log.warning(f"Could not limit parsing worker memory: {e}")
+
+
+def load_documents(
+    engine: str, kwargs: dict, filename: str, file_content_type: str, file_path: str
+) -> list[Document]:
+    from open_webui.retrieval.loaders.main import Loader
+
+    return Loader(engine, **kwargs).load_documents(
+        filename, file_content_type, file_path
+    )
+
+
+def get_pdf_page_count(file_path: str) -> int:
+    import pypdf
+
+    return len(pypdf.PdfReader(file_path).pages)
+
+
+def load_pdf_pages(
+    engine: str, kwargs: dict, file_path: str, start: int, end: int
+) -> list[Document]:
+    from open_webui.retrieval.loaders.main import Loader
+
+    return Loader(engine, **kwargs).load_pdf_pages(file_path, start, end)
+
+
+####################################
+# Pool
+####################################
+
+
+class ParsingPool:
+    """
+    Runs document loaders in worker processes so CPU-heavy parsing does not hold
+    the GIL of the web worker.
+
+    Each format group (pdf, office, text) has its own bounded pool, so a runaway
+    spreadsheet cannot starve PDF parsing. Workers run with an address space
+    limit. A crashed worker (e.g. over the memory limit) breaks the pool, which
+    is recreated and the remaining tasks retried once.
+
+    A file that is not parsed within `timeout` seconds has its pool's workers
+    killed: a ProcessPoolExecutor cannot stop a single task, and losing one of its
+    workers breaks the whole pool anyway. Other files parsing in the same format
+    group lose their running tasks, which are resubmitted to the new pool without
+    counting as a crash; files of the other groups are not affected.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        timeout: float,
+        memory_limit_mb: int,
+        pdf_pages_per_task: int,
+    ):
+        self.workers = max(workers, 1)
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.pdf_pages_per_task = pdf_pages_per_task
+
+        self.lock = threading.Lock()
+        self.pools: dict[str, ProcessPoolExecutor] = {}
+        # Pools reset because a task timed out
+        self.timed_out_pools = weakref.WeakSet()
+
+    def get_pool(self, group: str) -> ProcessPoolExecutor:
+        with self.lock:
+            if group not in self.pools:
+                # Forking a process that runs an event loop and threads is unsafe
+                self.pools[group] = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_worker,
+                    initargs=(self.memory_limit_mb,),
+                    max_tasks_per_child=WORKER_MAX_TASKS,
+                )
+            return self.pools[group]
+
+    def reset_pool(
+        self, group: str, pool: ProcessPoolExecutor, timed_out: bool = False
+    ):
+        with self.lock:
+            if self.pools.get(group) is pool:
+                del self.pools[group]
+            if timed_out:
+                self.timed_out_pools.add(pool)
+
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def parse(
+        self,
+        engine: str,
+        kwargs: dict,
+        filename: str,
+        file_content_type: str,
+        file_path: str,
+    ) -> Iterator[Document]:
+        group = get_format_group(filename, file_content_type)
+        deadline = time.monotonic() + self.timeout
+
+        if group == "pdf":
+            [pages] = self.map(
+                group, deadline, [(get_pdf_page_count, (file_path,))], flatten=False
+            )
+
+            if pages > self.pdf_pages_per_task:
+                yield from self.map(
+                    group,
+                    deadline,
+                    [
+                        (
+                            load_pdf_pages,
+                            (
+                                engine,
+                                kwargs,
+                                file_path,
+                                start,
+                                start + self.pdf_pages_per_task,
+                            ),
+                        )
+                        for start in range(0, pages, self.pdf_pages_per_task)
+                    ],
+                )
+                return
+
+        yield from self.map(
+            group,
+            deadline,
+            [
+                (
+                    load_documents,
+                    (engine, kwargs, filename, file_content_type, file_path),
+                )
+            ],
+        )
+
+    def map(self, group: str, deadline: float, tasks: list, flatten: bool = True):
+        # Submits every task at once and yields results in task order
+        index = 0
+        retried = False
+
+        while index < len(tasks):
+            pool = self.get_pool(group)
+            futures = []
+            try:
+                futures = [pool.submit(fn, *args) for fn, args in tasks[index:]]
+                for future in futures:
+                    result = future.result(timeout=max(deadline - time.monotonic(), 0))
+                    index += 1
+                    if flatten:
+                        yield from result
+                    else:
+                        yield result
+            except FuturesTimeoutError:
+                self.reset_pool(group, pool, timed_out=True)
+                raise Exception(f"Parsing timed out after {self.timeout:.0f}s")
+            except (BrokenProcessPool, CancelledError):
+                if pool in self.timed_out_pools:
+                    # Another file's task timed out, this file did nothing wrong
+                    log.info(f"Parsing pool '{group}' was reset, resubmitting")
+                    continue
+
+                # The pool was broken by this or another file's task
+                self.reset_pool(group, pool)
+                if retried:
+                    raise Exception(
+                        "Parsing worker crashed, the file may be too large to parse"
+                    )
+                log.warning(f"Parsing pool '{group}' crashed, retrying")
+                retried = True
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def shutdown(self):
+        with self.lock:
+            pools, self.pools = self.pools, {}
+
+        for pool in pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+PARSING_POOL = ParsingPool(
+    workers=PARSING_POOL_WORKERS,
+    timeout=PARSING_TIMEOUT,
+    memory_limit_mb=PARSING_WORKER_MEMORY_LIMIT_MB,
+    pdf_pages_per_task=PARSING_PDF_PAGES_PER_TASK,
+)
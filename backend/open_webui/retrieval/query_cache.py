@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from open_webui.config import (
+    ENABLE_RETRIEVAL_QUERY_CACHE,
+    RETRIEVAL_QUERY_CACHE_SIZE,
+    RETRIEVAL_QUERY_CACHE_TTL,
+)
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
+
+def normalize_messages(messages: list[dict]) -> list[dict]:
+    # Case and whitespace do not change the queries the task model would generate
+    def normalize(content) -> str:
+        if isinstance(content, list):
+            content = " ".join(
+                item.get("text", "") for item in content if item.get("type") == "text"
+            )
+        return re.sub(r"\s+", " ", str(content or "")).strip().lower()
+
+    return [
+        {"role": message.get("role"), "content": normalize(message.get("content"))}
+        for message in messages
+    ]
+
+
+class RetrievalQueryCache:
+    """
+    Retrieval queries generated by the task model, so a repeated or regenerated
+    turn does not wait for another completion.
+
+    Entries are keyed by the task model and the query generation prompt built
+    from the normalized messages, and expire after `ttl` seconds. Task model
+    calls avoided (cache hits and skipped generations) are counted, and the
+    latency saved is estimated from the average duration of the generations
+    that did run.
+    """
+
+    def __init__(self, size: int, ttl: float, enabled: bool = True):
+        self.size = size
+        self.ttl = ttl
+        self.enabled = enabled
+
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[str, tuple[float, list[str]]] = OrderedDict()
+
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {
+            "generated": 0,
+            "generation_ms": 0,
+            "cache_hits": 0,
+            "skipped": {},
+        }
+
+    def get_key(self, task_model_id: str, prompt: str) -> str:
+        return hashlib.sha256(f"{task_model_id}\0{prompt}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[list[str]]:
+        if not self.enabled:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return list(entry[1])
+
+    def set(self, key: str, queries: list[str]):
+        if not self.enabled or self.size <= 0:
+            return
+
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, list(queries))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def record_generation(self, duration: float):
+        with self.lock:
+            self.stats["generated"] += 1
+            self.stats["generation_ms"] += round(duration * 1000)
+
+    def record_skip(self, reason: str):
+        with self.lock:
+            skipped = self.stats["skipped"]
+            skipped[reason] = skipped.get(reason, 0) + 1
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            generated = self.stats["generated"]
+            average_ms = self.stats["generation_ms"] / generated if generated else 0
+            avoided = self.stats["cache_hits"] + sum(self.stats["skipped"].values())
+            return {
+                "enabled": self.enabled,
+                "entries": len(self.entries),
+                "generated": generated,
+                "cache_hits": self.stats["cache_hits"],
+                "skipped": dict(self.stats["skipped"]),
+                "calls_avoided": avoided,
+                "average_generation_ms": round(average_ms),
+                "latency_saved_ms": round(avoided * average_ms),
+            }
+
+
+RETRIEVAL_QUERY_CACHE = RetrievalQueryCache(
+    size=RETRIEVAL_QUERY_CACHE_SIZE,
+    ttl=RETRIEVAL_QUERY_CACHE_TTL,
+    enabled=ENABLE_RETRIEVAL_QUERY_CACHE,
+)
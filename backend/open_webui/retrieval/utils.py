@@ -1,25 +1,34 @@
 import logging
 import os
 import uuid
-from typing import Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Sequence, Union
 
 import asyncio
-import requests
 
 from huggingface_hub import snapshot_download
 from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
-from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
 
+from open_webui.retrieval.bm25 import BM25_INDEX
+from open_webui.retrieval.embedding_cache import EMBEDDING_CACHE, get_namespace
+from open_webui.retrieval.embedding_client import EMBEDDING_CLIENT
 from open_webui.retrieval.vector.connector import VECTOR_DB_CLIENT
 from open_webui.utils.misc import get_last_user_message
 
+from open_webui.config import RAG_RERANKING_MAX_WORKERS
 from open_webui.env import SRC_LOG_LEVELS, OFFLINE_MODE
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["RAG"])
 
 
+# Bounded pool for CPU-bound reranking and local embedding, shared by all requests
+RERANKING_EXECUTOR = ThreadPoolExecutor(
+    max_workers=RAG_RERANKING_MAX_WORKERS, thread_name_prefix="rag-rerank"
+)
+
+
 from typing import Any
 
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
@@ -58,6 +67,32 @@ class VectorSearchRetriever(BaseRetriever):
         return results
 
 
+class BM25IndexRetriever(BaseRetriever):
+    collection_name: Any
+    top_k: int
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+    ) -> list[Document]:
+        # Collections without an index yet are built once from the vector DB
+        result = BM25_INDEX.search(
+            collection_name=self.collection_name,
+            query=query,
+            k=self.top_k,
+            loader=lambda collection_name: VECTOR_DB_CLIENT.get(
+                collection_name=collection_name
+            ),
+        )
+
+        return [
+            Document(metadata=doc["metadata"], page_content=doc["text"])
+            for doc in result
+        ]
+
+
 def query_doc(
     collection_name: str,
     query_embedding: list[float],
@@ -88,13 +123,10 @@ def query_doc_with_hybrid_search(
     r: float,
 ) -> dict:
     try:
-        result = VECTOR_DB_CLIENT.get(collection_name=collection_name)
-
-        bm25_retriever = BM25Retriever.from_texts(
-            texts=result.documents[0],
-            metadatas=result.metadatas[0],
+        bm25_retriever = BM25IndexRetriever(
+            collection_name=collection_name,
+            top_k=k,
         )
-        bm25_retriever.k = k
 
         vector_search_retriever = VectorSearchRetriever(
             collection_name=collection_name,
@@ -132,6 +164,84 @@ def query_doc_with_hybrid_search(
         raise e
 
 
+async def aquery_doc(
+    collection_name: str,
+    query_embedding: list[float],
+    k: int,
+):
+    return await asyncio.to_thread(
+        query_doc,
+        collection_name=collection_name,
+        query_embedding=query_embedding,
+        k=k,
+    )
+
+
+async def aquery_doc_with_hybrid_search(
+    collection_name: str,
+    query: str,
+    query_embedding: list[float],
+    embedding_function,
+    k: int,
+    reranking_function,
+    r: float,
+) -> dict:
+    """
+    Async version of query_doc_with_hybrid_search. The query embedding is computed
+    by the caller, the BM25 and vector searches run in a worker thread and the
+    reranking runs on RERANKING_EXECUTOR.
+    """
+    ensemble_retriever = EnsembleRetriever(
+        retrievers=[
+            BM25IndexRetriever(
+                collection_name=collection_name,
+                top_k=k,
+            ),
+            VectorSearchRetriever(
+                collection_name=collection_name,
+                embedding_function=lambda _: query_embedding,
+                top_k=k,
+            ),
+        ],
+        weights=[0.5, 0.5],
+    )
+    documents = await asyncio.to_thread(ensemble_retriever.invoke, query)
+    if not documents:
+        # Nothing to rerank (e.g. an empty collection)
+        return {"distances": [[]], "documents": [[]], "metadatas": [[]]}
+
+    loop = asyncio.get_running_loop()
+    if reranking_function is not None:
+        scores = await loop.run_in_executor(
+            RERANKING_EXECUTOR,
+            reranking_function.predict,
+            [(query, doc.page_content) for doc in documents],
+        )
+    else:
+        from sentence_transformers import util
+
+        document_embeddings = await embedding_function(
+            [doc.page_content for doc in documents]
+        )
+        scores = await loop.run_in_executor(
+            RERANKING_EXECUTOR,
+            lambda: util.cos_sim(query_embedding, document_embeddings)[0],
+        )
+
+    result = get_top_n_documents(documents, scores.tolist(), top_n=k, r_score=r)
+    result = {
+        "distances": [[d.metadata.get("score") for d in result]],
+        "documents": [[d.page_content for d in result]],
+        "metadatas": [[d.metadata for d in result]],
+    }
+
+    log.info(
+        "aquery_doc_with_hybrid_search:result "
+        + f'{result["metadatas"]} {result["distances"]}'
+    )
+    return result
+
+
 def merge_and_sort_query_results(
     query_results: list[dict], k: int, reverse: bool = False
 ) -> list[dict]:
@@ -175,30 +285,48 @@ def merge_and_sort_query_results(
     return result
 
 
+def search_collections(
+    collection_names: list[str],
+    query_embeddings: list[list[float]],
+    k: int,
+) -> list[dict]:
+    # One search_many call covers every (query, collection) pair; returns the
+    # merged top k of each query
+    collection_names = [name for name in collection_names if name]
+    if not collection_names or not query_embeddings:
+        return []
+
+    try:
+        result = VECTOR_DB_CLIENT.search_many(
+            collection_names=collection_names,
+            vectors=query_embeddings,
+            limit=k,
+        )
+    except Exception as e:
+        log.exception(f"Error when querying the collections: {e}")
+        return []
+
+    if result is None:
+        return []
+
+    return [
+        {
+            "distances": [result.distances[idx]],
+            "documents": [result.documents[idx]],
+            "metadatas": [result.metadatas[idx]],
+        }
+        for idx in range(len(result.ids))
+    ]
+
+
 def query_collection(
     collection_names: list[str],
     queries: list[str],
     embedding_function,
     k: int,
 ) -> dict:
-    results = []
-    for query in queries:
-        query_embedding = embedding_function(query)
-        for collection_name in collection_names:
-            if collection_name:
-                try:
-                    result = query_doc(
-                        collection_name=collection_name,
-                        k=k,
-                        query_embedding=query_embedding,
-                    )
-                    if result is not None:
-                        results.append(result.model_dump())
-                except Exception as e:
-                    log.exception(f"Error when querying the collection: {e}")
-            else:
-                pass
-
+    query_embeddings = [embedding_function(query) for query in queries]
+    results = search_collections(collection_names, query_embeddings, k)
     return merge_and_sort_query_results(results, k=k)
 
 
@@ -238,6 +366,58 @@ def query_collection_with_hybrid_search(
     return merge_and_sort_query_results(results, k=k, reverse=True)
 
 
+async def aquery_collection(
+    collection_names: list[str],
+    queries: list[str],
+    embedding_function,
+    k: int,
+) -> dict:
+    query_embeddings = await embedding_function(queries)
+    results = await asyncio.to_thread(
+        search_collections, collection_names, query_embeddings, k
+    )
+    return merge_and_sort_query_results(results, k=k)
+
+
+async def aquery_collection_with_hybrid_search(
+    collection_names: list[str],
+    queries: list[str],
+    embedding_function,
+    k: int,
+    reranking_function,
+    r: float,
+) -> dict:
+    query_embeddings = await embedding_function(queries)
+
+    results = await asyncio.gather(
+        *[
+            aquery_doc_with_hybrid_search(
+                collection_name=collection_name,
+                query=query,
+                query_embedding=query_embedding,
+                embedding_function=embedding_function,
+                k=k,
+                reranking_function=reranking_function,
+                r=r,
+            )
+            for collection_name in collection_names
+            for query, query_embedding in zip(queries, query_embeddings)
+        ],
+        return_exceptions=True,
+    )
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    for error in errors:
+        log.error(f"Error when querying the collection with hybrid_search: {error}")
+
+    if errors:
+        raise Exception(
+            "Hybrid search failed for all collections. Using Non hybrid search as fallback."
+        )
+
+    return merge_and_sort_query_results(results, k=k, reverse=True)
+
+
 def get_embedding_function(
     embedding_engine,
     embedding_model,
@@ -246,30 +426,72 @@ def get_embedding_function(
     key,
     embedding_batch_size,
 ):
+    namespace = get_namespace(embedding_engine, embedding_model)
+
     if embedding_engine == "":
-        return lambda query: embedding_function.encode(query).tolist()
+        return lambda query: EMBEDDING_CACHE.embed(
+            namespace, query, lambda texts: embedding_function.encode(texts).tolist()
+        )
     elif embedding_engine in ["ollama", "openai"]:
-        func = lambda query: generate_embeddings(
-            engine=embedding_engine,
-            model=embedding_model,
-            text=query,
-            url=url,
-            key=key,
+        return lambda query: EMBEDDING_CACHE.embed(
+            namespace,
+            query,
+            lambda texts: EMBEDDING_CLIENT.embed(
+                embedding_engine, embedding_model, texts, url, key, embedding_batch_size
+            ),
         )
 
-        def generate_multiple(query, func):
-            if isinstance(query, list):
-                embeddings = []
-                for i in range(0, len(query), embedding_batch_size):
-                    embeddings.extend(func(query[i : i + embedding_batch_size]))
-                return embeddings
-            else:
-                return func(query)
 
-        return lambda query: generate_multiple(query, func)
+def get_async_embedding_function(
+    embedding_engine,
+    embedding_model,
+    embedding_function,
+    url,
+    key,
+    embedding_batch_size,
+):
+    """
+    Async counterpart of get_embedding_function: remote engines are awaited on
+    EMBEDDING_CLIENT and local models run on RERANKING_EXECUTOR.
+    """
+    namespace = get_namespace(embedding_engine, embedding_model)
+
+    if embedding_engine == "":
 
+        async def embed(query):
+            return await asyncio.get_running_loop().run_in_executor(
+                RERANKING_EXECUTOR, lambda: embedding_function.encode(query).tolist()
+            )
 
-def get_sources_from_files(
+        return lambda query: EMBEDDING_CACHE.aembed(namespace, query, embed)
+    elif embedding_engine in ["ollama", "openai"]:
+        return lambda query: EMBEDDING_CACHE.aembed(
+            namespace,
+            query,
+            lambda texts: EMBEDDING_CLIENT.aembed(
+                embedding_engine, embedding_model, texts, url, key, embedding_batch_size
+            ),
+        )
+
+
+def get_file_collection_names(file) -> list[str]:
+    collection_names = []
+    if file.get("type") == "collection":
+        if file.get("legacy"):
+            collection_names = file.get("collection_names", [])
+        else:
+            collection_names.append(file["id"])
+    elif file.get("collection_name"):
+        collection_names.append(file["collection_name"])
+    elif file.get("id"):
+        if file.get("legacy"):
+            collection_names.append(f"{file['id']}")
+        else:
+            collection_names.append(f"file-{file['id']}")
+    return collection_names
+
+
+async def get_sources_from_files(
     files,
     queries,
     embedding_function,
@@ -278,72 +500,79 @@ def get_sources_from_files(
     r,
     hybrid_search,
 ):
+    """
+    `embedding_function` is the async embedding function (see
+    get_async_embedding_function). Files are queried concurrently.
+    """
     log.debug(f"files: {files} {queries} {embedding_function} {reranking_function}")
 
+    async def query_file_collections(collection_names):
+        context = None
+        try:
+            if hybrid_search:
+                try:
+                    context = await aquery_collection_with_hybrid_search(
+                        collection_names=collection_names,
+                        queries=queries,
+                        embedding_function=embedding_function,
+                        k=k,
+                        reranking_function=reranking_function,
+                        r=r,
+                    )
+                except Exception as e:
+                    log.debug(
+                        "Error when using hybrid search, using"
+                        " non hybrid search as fallback."
+                    )
+
+            if (not hybrid_search) or (context is None):
+                context = await aquery_collection(
+                    collection_names=collection_names,
+                    queries=queries,
+                    embedding_function=embedding_function,
+                    k=k,
+                )
+        except Exception as e:
+            log.exception(e)
+        return context
+
     extracted_collections = []
-    relevant_contexts = []
+    file_contexts = []
 
     for file in files:
         if file.get("context") == "full":
             context = {
-                "documents": [[file.get("file").get("data", {}).get("content")]],
+                "documents": [
+                    [((file.get("file") or {}).get("data") or {}).get("content", "")]
+                ],
                 "metadatas": [[{"file_id": file.get("id"), "name": file.get("name")}]],
             }
         else:
-            context = None
-
-            collection_names = []
-            if file.get("type") == "collection":
-                if file.get("legacy"):
-                    collection_names = file.get("collection_names", [])
-                else:
-                    collection_names.append(file["id"])
-            elif file.get("collection_name"):
-                collection_names.append(file["collection_name"])
-            elif file.get("id"):
-                if file.get("legacy"):
-                    collection_names.append(f"{file['id']}")
-                else:
-                    collection_names.append(f"file-{file['id']}")
-
-            collection_names = set(collection_names).difference(extracted_collections)
+            collection_names = set(get_file_collection_names(file)).difference(
+                extracted_collections
+            )
             if not collection_names:
                 log.debug(f"skipping {file} as it has already been extracted")
                 continue
 
-            try:
-                context = None
-                if file.get("type") == "text":
-                    context = file["content"]
-                else:
-                    if hybrid_search:
-                        try:
-                            context = query_collection_with_hybrid_search(
-                                collection_names=collection_names,
-                                queries=queries,
-                                embedding_function=embedding_function,
-                                k=k,
-                                reranking_function=reranking_function,
-                                r=r,
-                            )
-                        except Exception as e:
-                            log.debug(
-                                "Error when using hybrid search, using"
-                                " non hybrid search as fallback."
-                            )
-
-                    if (not hybrid_search) or (context is None):
-                        context = query_collection(
-                            collection_names=collection_names,
-                            queries=queries,
-                            embedding_function=embedding_function,
-                            k=k,
-                        )
-            except Exception as e:
-                log.exception(e)
+            if file.get("type") == "text":
+                context = file["content"]
+            else:
+                context = query_file_collections(list(collection_names))
 
             extracted_collections.extend(collection_names)
 
+        file_contexts.append((file, context))
+
+    contexts = await asyncio.gather(
+        *[
+            context if asyncio.iscoroutine(context) else asyncio.sleep(0, context)
+            for _, context in file_contexts
+        ]
+    )
+
+    relevant_contexts = []
+    for (file, _), context in zip(file_contexts, contexts):
         if context:
             if "data" in file:
                 del file["data"]
@@ -412,76 +641,31 @@ def get_model_path(model: str, update_model: bool = False):
 
 def generate_openai_batch_embeddings(
     model: str, texts: list[str], url: str = "https://api.openai.com/v1", key: str = ""
-) -> Optional[list[list[float]]]:
-    try:
-        r = requests.post(
-            f"{url}/embeddings",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {key}",
-            },
-            json={"input": texts, "model": model},
-        )
-        r.raise_for_status()
-        data = r.json()
-        if "data" in data:
-            return [elem["embedding"] for elem in data["data"]]
-        else:
-            raise "Something went wrong :/"
-    except Exception as e:
-        print(e)
-        return None
+) -> list[list[float]]:
+    return EMBEDDING_CLIENT.embed("openai", model, texts, url, key)
 
 
 def generate_ollama_batch_embeddings(
     model: str, texts: list[str], url: str, key: str = ""
-) -> Optional[list[list[float]]]:
-    try:
-        r = requests.post(
-            f"{url}/api/embed",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {key}",
-            },
-            json={"input": texts, "model": model},
-        )
-        r.raise_for_status()
-        data = r.json()
-
-        if "embeddings" in data:
-            return data["embeddings"]
-        else:
-            raise "Something went wrong :/"
-    except Exception as e:
-        print(e)
-        return None
+) -> list[list[float]]:
+    return EMBEDDING_CLIENT.embed("ollama", model, texts, url, key)
 
 
 def generate_embeddings(engine: str, model: str, text: Union[str, list[str]], **kwargs):
-    url = kwargs.get("url", "")
-    key = kwargs.get("key", "")
+    return EMBEDDING_CLIENT.embed(
+        engine, model, text, kwargs.get("url", ""), kwargs.get("key", "")
+    )
 
-    if engine == "ollama":
-        if isinstance(text, list):
-            embeddings = generate_ollama_batch_embeddings(
-                **{"model": model, "texts": text, "url": url, "key": key}
-            )
-        else:
-            embeddings = generate_ollama_batch_embeddings(
-                **{"model": model, "texts": [text], "url": url, "key": key}
-            )
-        return embeddings[0] if isinstance(text, str) else embeddings
-    elif engine == "openai":
-        if isinstance(text, list):
-            embeddings = generate_openai_batch_embeddings(model, text, url, key)
-        else:
-            embeddings = generate_openai_batch_embeddings(model, [text], url, key)
 
-        return embeddings[0] if isinstance(text, str) else embeddings
+async def agenerate_embeddings(
+    engine: str, model: str, text: Union[str, list[str]], **kwargs
+):
+    return await EMBEDDING_CLIENT.aembed(
+        engine, model, text, kwargs.get("url", ""), kwargs.get("key", "")
+    )
 
 
 import operator
-from typing import Optional, Sequence
 
 from langchain_core.callbacks import Callbacks
 from langchain_core.documents import BaseDocumentCompressor, Document
@@ -518,20 +702,26 @@ class RerankCompressor(BaseDocumentCompressor):
             )
             scores = util.cos_sim(query_embedding, document_embedding)[0]
 
-        docs_with_scores = list(zip(documents, scores.tolist()))
-        if self.r_score:
-            docs_with_scores = [
-                (d, s) for d, s in docs_with_scores if s >= self.r_score
-            ]
-
-        result = sorted(docs_with_scores, key=operator.itemgetter(1), reverse=True)
-        final_results = []
-        for doc, doc_score in result[: self.top_n]:
-            metadata = doc.metadata
-            metadata["score"] = doc_score
-            doc = Document(
-                page_content=doc.page_content,
-                metadata=metadata,
-            )
-            final_results.append(doc)
-        return final_results
+        return get_top_n_documents(
+            documents, scores.tolist(), top_n=self.top_n, r_score=self.r_score
+        )
+
+
+def get_top_n_documents(
+    documents: Sequence[Document], scores: list[float], top_n: int, r_score: float
+) -> list[Document]:
+    docs_with_scores = list(zip(documents, scores))
+    if r_score:
+        docs_with_scores = [(d, s) for d, s in docs_with_scores if s >= r_score]
+
+    result = sorted(docs_with_scores, key=operator.itemgetter(1), reverse=True)
+    final_results = []
+    for doc, doc_score in result[:top_n]:
+        metadata = doc.metadata
+        metadata["score"] = doc_score
+        doc = Document(
+            page_content=doc.page_content,
+            metadata=metadata,
+        )
+        final_results.append(doc)
+    return final_results
@@ -1,10 +1,19 @@
+import threading
+
 import chromadb
 from chromadb import Settings
+from chromadb.api.models.Collection import Collection
+from chromadb.errors import ChromaError
 from chromadb.utils.batch_utils import create_batches
 
-from typing import Optional
+from typing import Callable, Optional
 
-from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
+from open_webui.retrieval.vector.main import (
+    VectorDBBase,
+    VectorItem,
+    SearchResult,
+    GetResult,
+)
 from open_webui.config import (
     CHROMA_DATA_PATH,
     CHROMA_HTTP_HOST,
@@ -18,7 +27,7 @@ from open_webui.config import (
 )
 
 
-class ChromaClient:
+class ChromaClient(VectorDBBase):
     def __init__(self):
         settings_dict = {
             "allow_reset": True,
@@ -49,13 +58,70 @@ class ChromaClient:
                 database=CHROMA_DATABASE,
             )
 
+        # Collection handles by name, so every call does not look the collection up
+        self.collections: dict[str, Collection] = {}
+        self.collections_lock = threading.Lock()
+
+    def get_collection(
+        self, collection_name: str, create: bool = False
+    ) -> Optional[Collection]:
+        collection = self.collections.get(collection_name)
+        if collection is not None:
+            return collection
+
+        if create:
+            collection = self.client.get_or_create_collection(
+                name=collection_name, metadata={"hnsw:space": "cosine"}
+            )
+        else:
+            try:
+                collection = self.client.get_collection(name=collection_name)
+            except (ValueError, ChromaError):
+                # The collection does not exist
+                return None
+
+        with self.collections_lock:
+            self.collections[collection_name] = collection
+        return collection
+
+    def invalidate_collection(self, collection_name: Optional[str] = None):
+        with self.collections_lock:
+            if collection_name is None:
+                self.collections.clear()
+            else:
+                self.collections.pop(collection_name, None)
+
+    def with_collection(self, collection_name: str, fn: Callable, create: bool = False):
+        # Runs fn with the cached handle. The collection may have been deleted or
+        # recreated by another worker, so a failing handle is dropped and fn is
+        # retried once with a fresh one.
+        cached = collection_name in self.collections
+        collection = self.get_collection(collection_name, create=create)
+        if collection is None:
+            return None
+
+        try:
+            return fn(collection)
+        except Exception:
+            if not cached:
+                raise
+            self.invalidate_collection(collection_name)
+
+        collection = self.get_collection(collection_name, create=create)
+        if collection is None:
+            return None
+        return fn(collection)
+
     def has_collection(self, collection_name: str) -> bool:
         # Check if the collection exists based on the collection name.
-        collections = self.client.list_collections()
-        return collection_name in [collection.name for collection in collections]
+        # Looked up directly rather than served from the cache, as another worker
+        # may have deleted it.
+        self.invalidate_collection(collection_name)
+        return self.get_collection(collection_name) is not None
 
     def delete_collection(self, collection_name: str):
         # Delete the collection based on the collection name.
+        self.invalidate_collection(collection_name)
         return self.client.delete_collection(name=collection_name)
 
     def search(
@@ -63,13 +129,14 @@ class ChromaClient:
     ) -> Optional[SearchResult]:
         # Search for the nearest neighbor items based on the vectors and return 'limit' number of results.
         try:
-            collection = self.client.get_collection(name=collection_name)
-            if collection:
-                result = collection.query(
+            result = self.with_collection(
+                collection_name,
+                lambda collection: collection.query(
                     query_embeddings=vectors,
                     n_results=limit,
-                )
-
+                ),
+            )
+            if result:
                 return SearchResult(
                     **{
                         "ids": result["ids"],
@@ -87,13 +154,14 @@ class ChromaClient:
     ) -> Optional[GetResult]:
         # Query the items from the collection based on the filter.
         try:
-            collection = self.client.get_collection(name=collection_name)
-            if collection:
-                result = collection.get(
+            result = self.with_collection(
+                collection_name,
+                lambda collection: collection.get(
                     where=filter,
                     limit=limit,
-                )
-
+                ),
+            )
+            if result:
                 return GetResult(
                     **{
                         "ids": [result["ids"]],
@@ -108,9 +176,10 @@ class ChromaClient:
 
     def get(self, collection_name: str) -> Optional[GetResult]:
         # Get all the items in the collection.
-        collection = self.client.get_collection(name=collection_name)
-        if collection:
-            result = collection.get()
+        result = self.with_collection(
+            collection_name, lambda collection: collection.get()
+        )
+        if result:
             return GetResult(
                 **{
                     "ids": [result["ids"]],
@@ -122,37 +191,36 @@ class ChromaClient:
 
     def insert(self, collection_name: str, items: list[VectorItem]):
         # Insert the items into the collection, if the collection does not exist, it will be created.
-        collection = self.client.get_or_create_collection(
-            name=collection_name, metadata={"hnsw:space": "cosine"}
-        )
-
         ids = [item["id"] for item in items]
         documents = [item["text"] for item in items]
         embeddings = [item["vector"] for item in items]
         metadatas = [item["metadata"] for item in items]
 
-        for batch in create_batches(
-            api=self.client,
-            documents=documents,
-            embeddings=embeddings,
-            ids=ids,
-            metadatas=metadatas,
-        ):
-            collection.add(*batch)
+        def add(collection: Collection):
+            for batch in create_batches(
+                api=self.client,
+                documents=documents,
+                embeddings=embeddings,
+                ids=ids,
+                metadatas=metadatas,
+            ):
+                collection.add(*batch)
+
+        self.with_collection(collection_name, add, create=True)
 
     def upsert(self, collection_name: str, items: list[VectorItem]):
         # Update the items in the collection, if the items are not present, insert them. If the collection does not exist, it will be created.
-        collection = self.client.get_or_create_collection(
-            name=collection_name, metadata={"hnsw:space": "cosine"}
-        )
-
         ids = [item["id"] for item in items]
         documents = [item["text"] for item in items]
         embeddings = [item["vector"] for item in items]
         metadatas = [item["metadata"] for item in items]
 
-        collection.upsert(
-            ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas
+        self.with_collection(
+            collection_name,
+            lambda collection: collection.upsert(
+                ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas
+            ),
+            create=True,
         )
 
     def delete(
@@ -162,13 +230,15 @@ class ChromaClient:
         filter: Optional[dict] = None,
     ):
         # Delete the items from the collection based on the ids.
-        collection = self.client.get_collection(name=collection_name)
-        if collection:
+        def delete(collection: Collection):
             if ids:
                 collection.delete(ids=ids)
             elif filter:
                 collection.delete(where=filter)
 
+        self.with_collection(collection_name, delete)
+
     def reset(self):
         # Resets the database. This will delete all collections and item entries.
+        self.invalidate_collection()
         return self.client.reset()
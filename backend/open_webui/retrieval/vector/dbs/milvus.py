@@ -4,16 +4,26 @@ import json
 
 from typing import Optional
 
-from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
+from open_webui.retrieval.vector.main import (
+    VectorDBBase,
+    VectorItem,
+    SearchResult,
+    GetResult,
+)
 from open_webui.config import (
     MILVUS_URI,
 )
 
 
-class MilvusClient:
+class MilvusClient(VectorDBBase):
+    # Collections use the COSINE metric, whose distances are similarities
+    higher_is_closer = True
+
     def __init__(self):
         self.collection_prefix = "open_webui"
         self.client = Client(uri=MILVUS_URI)
+        # Collections known to exist, so writes skip the existence check
+        self.collections: set[str] = set()
 
     def _result_to_get_result(self, result) -> GetResult:
         ids = []
@@ -109,16 +119,59 @@ class MilvusClient:
             index_params=index_params,
         )
 
+    def _create_collection_if_not_exists(self, collection_name: str, dimension: int):
+        if collection_name in self.collections:
+            return
+        if not self.has_collection(collection_name):
+            self._create_collection(
+                collection_name=collection_name, dimension=dimension
+            )
+        self.collections.add(collection_name)
+
+    def _write(self, collection_name: str, items: list[VectorItem], write):
+        self._create_collection_if_not_exists(collection_name, len(items[0]["vector"]))
+        data = [
+            {
+                "id": item["id"],
+                "vector": item["vector"],
+                "data": {"text": item["text"]},
+                "metadata": item["metadata"],
+            }
+            for item in items
+        ]
+        try:
+            return write(
+                collection_name=f"{self.collection_prefix}_{collection_name}",
+                data=data,
+            )
+        except Exception:
+            # The collection may have been dropped by another worker
+            if self.has_collection(collection_name):
+                raise
+            self._create_collection_if_not_exists(
+                collection_name, len(items[0]["vector"])
+            )
+            return write(
+                collection_name=f"{self.collection_prefix}_{collection_name}",
+                data=data,
+            )
+
     def has_collection(self, collection_name: str) -> bool:
         # Check if the collection exists based on the collection name.
         collection_name = collection_name.replace("-", "_")
-        return self.client.has_collection(
+        exists = self.client.has_collection(
             collection_name=f"{self.collection_prefix}_{collection_name}"
         )
+        if exists:
+            self.collections.add(collection_name)
+        else:
+            self.collections.discard(collection_name)
+        return exists
 
     def delete_collection(self, collection_name: str):
         # Delete the collection based on the collection name.
         collection_name = collection_name.replace("-", "_")
+        self.collections.discard(collection_name)
         return self.client.drop_collection(
             collection_name=f"{self.collection_prefix}_{collection_name}"
         )
@@ -208,48 +261,12 @@ class MilvusClient:
     def insert(self, collection_name: str, items: list[VectorItem]):
         # Insert the items into the collection, if the collection does not exist, it will be created.
         collection_name = collection_name.replace("-", "_")
-        if not self.client.has_collection(
-            collection_name=f"{self.collection_prefix}_{collection_name}"
-        ):
-            self._create_collection(
-                collection_name=collection_name, dimension=len(items[0]["vector"])
-            )
-
-        return self.client.insert(
-            collection_name=f"{self.collection_prefix}_{collection_name}",
-            data=[
-                {
-                    "id": item["id"],
-                    "vector": item["vector"],
-                    "data": {"text": item["text"]},
-                    "metadata": item["metadata"],
-                }
-                for item in items
-            ],
-        )
+        return self._write(collection_name, items, self.client.insert)
 
     def upsert(self, collection_name: str, items: list[VectorItem]):
         # Update the items in the collection, if the items are not present, insert them. If the collection does not exist, it will be created.
         collection_name = collection_name.replace("-", "_")
-        if not self.client.has_collection(
-            collection_name=f"{self.collection_prefix}_{collection_name}"
-        ):
-            self._create_collection(
-                collection_name=collection_name, dimension=len(items[0]["vector"])
-            )
-
-        return self.client.upsert(
-            collection_name=f"{self.collection_prefix}_{collection_name}",
-            data=[
-                {
-                    "id": item["id"],
-                    "vector": item["vector"],
-                    "data": {"text": item["text"]},
-                    "metadata": item["metadata"],
-                }
-                for item in items
-            ],
-        )
+        return self._write(collection_name, items, self.client.upsert)
 
     def delete(
         self,
@@ -280,6 +297,7 @@ class MilvusClient:
 
     def reset(self):
         # Resets the database. This will delete all collections and item entries.
+        self.collections.clear()
         collection_names = self.client.list_collections()
         for collection_name in collection_names:
             if collection_name.startswith(self.collection_prefix):
@@ -1,7 +1,13 @@
 from opensearchpy import OpenSearch
 from typing import Optional
 
-from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
+from open_webui.retrieval.vector.main import (
+    VectorDBBase,
+    VectorItem,
+    SearchResult,
+    GetResult,
+    merge_search_results,
+)
 from open_webui.config import (
     OPENSEARCH_URI,
     OPENSEARCH_SSL,
@@ -11,7 +17,10 @@ from open_webui.config import (
 )
 
 
-class OpenSearchClient:
+class OpenSearchClient(VectorDBBase):
+    # Hits are scored by cosine similarity
+    higher_is_closer = True
+
     def __init__(self):
         self.index_prefix = "open_webui"
         self.client = OpenSearch(
@@ -20,6 +29,8 @@ class OpenSearchClient:
             verify_certs=OPENSEARCH_CERT_VERIFY,
             http_auth=(OPENSEARCH_USERNAME, OPENSEARCH_PASSWORD),
         )
+        # Indices known to exist, so writes skip the existence check
+        self.indices: set[str] = set()
 
     def _result_to_get_result(self, result) -> GetResult:
         ids = []
@@ -81,11 +92,17 @@ class OpenSearchClient:
     def has_collection(self, index_name: str) -> bool:
         # has_collection here means has index.
         # We are simply adapting to the norms of the other DBs.
-        return self.client.indices.exists(index=f"{self.index_prefix}_{index_name}")
-
-    def delete_colleciton(self, index_name: str):
+        exists = self.client.indices.exists(index=f"{self.index_prefix}_{index_name}")
+        if exists:
+            self.indices.add(index_name)
+        else:
+            self.indices.discard(index_name)
+        return exists
+
+    def delete_collection(self, index_name: str):
         # delete_collection here means delete index.
         # We are simply adapting to the norms of the other DBs.
+        self.indices.discard(index_name)
         self.client.indices.delete(index=f"{self.index_prefix}_{index_name}")
 
     def search(
@@ -113,9 +130,57 @@ class OpenSearchClient:
 
         return self._result_to_search_result(result)
 
+    def search_many(
+        self,
+        collection_names: list[str],
+        vectors: list[list[float]],
+        limit: Optional[int],
+    ) -> Optional[SearchResult]:
+        # All (index, vector) searches are sent in a single msearch request
+        body = []
+        for index_name in collection_names:
+            for vector in vectors:
+                body.append({"index": f"{self.index_prefix}_{index_name}"})
+                body.append(
+                    {
+                        "size": limit,
+                        "_source": ["text", "metadata"],
+                        "query": {
+                            "script_score": {
+                                "query": {"match_all": {}},
+                                "script": {
+                                    "source": "cosineSimilarity(params.vector, 'vector') + 1.0",
+                                    "params": {"vector": vector},
+                                },
+                            }
+                        },
+                    }
+                )
+
+        responses = self.client.msearch(body=body)["responses"]
+
+        results = []
+        for idx in range(len(collection_names)):
+            result = {"ids": [], "distances": [], "documents": [], "metadatas": []}
+            for response in responses[idx * len(vectors) : (idx + 1) * len(vectors)]:
+                # Missing indexes come back as errors and are skipped
+                hits = response.get("hits", {}).get("hits", [])
+                result["ids"].append([hit["_id"] for hit in hits])
+                result["distances"].append([hit["_score"] for hit in hits])
+                result["documents"].append([hit["_source"].get("text") for hit in hits])
+                result["metadatas"].append(
+                    [hit["_source"].get("metadata") for hit in hits]
+                )
+            results.append(SearchResult(**result))
+
+        return merge_search_results(results, len(vectors), limit, reverse=True)
+
     def get_or_create_index(self, index_name: str, dimension: int):
-        if not self.has_index(index_name):
+        if index_name in self.indices:
+            return
+        if not self.has_collection(index_name):
             self._create_index(index_name, dimension)
+        self.indices.add(index_name)
 
     def get(self, index_name: str) -> Optional[GetResult]:
         query = {"query": {"match_all": {}}, "_source": ["text", "metadata"]}
@@ -126,8 +191,7 @@ class OpenSearchClient:
         return self._result_to_get_result(result)
 
     def insert(self, index_name: str, items: list[VectorItem]):
-        if not self.has_index(index_name):
-            self._create_index(index_name, dimension=len(items[0]["vector"]))
+        self.get_or_create_index(index_name, dimension=len(items[0]["vector"]))
 
         for batch in self._create_batches(items):
             actions = [
@@ -146,8 +210,7 @@ class OpenSearchClient:
             self.client.bulk(actions)
 
     def upsert(self, index_name: str, items: list[VectorItem]):
-        if not self.has_index(index_name):
-            self._create_index(index_name, dimension=len(items[0]["vector"]))
+        self.get_or_create_index(index_name, dimension=len(items[0]["vector"]))
 
         for batch in self._create_batches(items):
             actions = [
@@ -173,6 +236,7 @@ class OpenSearchClient:
         self.client.bulk(body=actions)
 
     def reset(self):
+        self.indices.clear()
         indices = self.client.indices.get(index=f"{self.index_prefix}_*")
         for index in indices:
             self.client.indices.delete(index=index)
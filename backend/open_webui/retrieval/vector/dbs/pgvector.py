@@ -1,30 +1,69 @@
+import hashlib
+import io
+import json
+import math
+import re
+import struct
+import threading
+import time
 from typing import Optional, List, Dict, Any
+
+import numpy as np
 from sqlalchemy import (
+    BigInteger,
     cast,
     column,
     create_engine,
+    exists,
     Column,
     Integer,
     MetaData,
     select,
     text,
     Text,
+    func,
+    union_all,
     values,
 )
 from sqlalchemy.sql import true
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import QueuePool
 
 from sqlalchemy.orm import declarative_base, scoped_session, sessionmaker
-from sqlalchemy.dialects.postgresql import JSONB, array
+from sqlalchemy.dialects.postgresql import JSONB, array, insert as pg_insert
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.ext.mutable import MutableDict
 
-from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
-from open_webui.config import PGVECTOR_DB_URL, PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH
+from open_webui.retrieval.vector.main import (
+    VectorDBBase,
+    VectorItem,
+    SearchResult,
+    GetResult,
+)
+from open_webui.config import (
+    PGVECTOR_DB_URL,
+    PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH,
+    PGVECTOR_POOL_SIZE,
+    PGVECTOR_POOL_MAX_OVERFLOW,
+    PGVECTOR_WRITE_BATCH_SIZE,
+    PGVECTOR_INDEX_MODE,
+    PGVECTOR_INDEX_METHOD,
+    PGVECTOR_INDEX_MIN_ROWS,
+    PGVECTOR_HNSW_M,
+    PGVECTOR_HNSW_EF_CONSTRUCTION,
+    PGVECTOR_HNSW_EF_SEARCH,
+    PGVECTOR_IVFFLAT_PROBES,
+)
 
 VECTOR_LENGTH = PGVECTOR_INITIALIZE_MAX_VECTOR_LENGTH
 Base = declarative_base()
 
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+COPY_TRAILER = struct.pack("!h", -1)
+
+GLOBAL_INDEX_NAME = "idx_document_chunk_vector"
+# Collection names are inlined into partial index predicates
+INDEXABLE_COLLECTION_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
 
 class DocumentChunk(Base):
     __tablename__ = "document_chunk"
@@ -36,8 +75,24 @@ class DocumentChunk(Base):
     vmetadata = Column(MutableDict.as_mutable(JSONB), nullable=True)
 
 
-class PgvectorClient:
+class DocumentChunkIndex(Base):
+    __tablename__ = "document_chunk_index"
+
+    # Partial vector index of one collection
+    collection_name = Column(Text, primary_key=True)
+    index_name = Column(Text, nullable=False)
+    method = Column(Text, nullable=False)
+    rows = Column(Integer, nullable=False)
+    lists = Column(Integer, nullable=True)
+    created_at = Column(BigInteger, nullable=False)
+
+
+class PgvectorClient(VectorDBBase):
     def __init__(self) -> None:
+        # Collections whose index is being built by this process
+        self.lock = threading.Lock()
+        self.indexing: set[str] = set()
+        self.global_index_lists: Optional[int] = None
 
         # if no pgvector uri, use the existing database connection
         if not PGVECTOR_DB_URL:
@@ -46,7 +101,12 @@ class PgvectorClient:
             self.session = Session
         else:
             engine = create_engine(
-                PGVECTOR_DB_URL, pool_pre_ping=True, poolclass=NullPool
+                PGVECTOR_DB_URL,
+                pool_pre_ping=True,
+                poolclass=QueuePool,
+                pool_size=PGVECTOR_POOL_SIZE,
+                max_overflow=PGVECTOR_POOL_MAX_OVERFLOW,
+                pool_recycle=3600,
             )
             SessionLocal = sessionmaker(
                 autocommit=False, autoflush=False, bind=engine, expire_on_commit=False
@@ -66,13 +126,18 @@ class PgvectorClient:
             connection = self.session.connection()
             Base.metadata.create_all(bind=connection)
 
-            # Create an index on the vector column if it doesn't exist
-            self.session.execute(
-                text(
-                    "CREATE INDEX IF NOT EXISTS idx_document_chunk_vector "
-                    "ON document_chunk USING ivfflat (vector vector_cosine_ops) WITH (lists = 100);"
+            if PGVECTOR_INDEX_MODE == "collection":
+                # Filtering a global approximate index by collection loses recall;
+                # collections get their own partial indexes instead
+                self.session.execute(text(f"DROP INDEX IF EXISTS {GLOBAL_INDEX_NAME};"))
+            else:
+                # Create an index on the vector column if it doesn't exist
+                self.session.execute(
+                    text(
+                        f"CREATE INDEX IF NOT EXISTS {GLOBAL_INDEX_NAME} "
+                        "ON document_chunk USING ivfflat (vector vector_cosine_ops) WITH (lists = 100);"
+                    )
                 )
-            )
             self.session.execute(
                 text(
                     "CREATE INDEX IF NOT EXISTS idx_document_chunk_collection_name "
@@ -130,58 +195,86 @@ class PgvectorClient:
             )
         return vector
 
+    def encode_copy_row(self, collection_name: str, item: VectorItem) -> bytes:
+        # One tuple of the binary COPY format: field count, then length and
+        # value of each field in network byte order
+        vector = self.adjust_vector_length(list(item["vector"]))
+        fields = [
+            item["id"].encode(),
+            struct.pack("!hh", len(vector), 0)
+            + np.asarray(vector, dtype=">f4").tobytes(),
+            collection_name.encode(),
+            item["text"].encode(),
+            # jsonb binary format version 1
+            b"\x01" + json.dumps(item["metadata"], default=str).encode(),
+        ]
+        return struct.pack("!h", len(fields)) + b"".join(
+            struct.pack("!i", len(field)) + field for field in fields
+        )
+
+    def write(self, collection_name: str, items: List[VectorItem]) -> None:
+        """
+        Writes items with binary COPY into a temporary staging table and moves
+        them into document_chunk with INSERT ... ON CONFLICT DO UPDATE, one
+        transaction per PGVECTOR_WRITE_BATCH_SIZE items.
+        """
+        # ON CONFLICT cannot update the same row twice in one statement
+        items = list({item["id"]: item for item in items}.values())
+
+        for start in range(0, len(items), PGVECTOR_WRITE_BATCH_SIZE):
+            batch = items[start : start + PGVECTOR_WRITE_BATCH_SIZE]
+            data = io.BytesIO()
+            data.write(COPY_HEADER)
+            for item in batch:
+                data.write(self.encode_copy_row(collection_name, item))
+            data.write(COPY_TRAILER)
+            data.seek(0)
+
+            try:
+                connection = self.session.connection().connection.dbapi_connection
+                with connection.cursor() as cursor:
+                    # Temporary tables live as long as the pooled connection
+                    cursor.execute(
+                        "CREATE TEMP TABLE IF NOT EXISTS document_chunk_staging "
+                        "(LIKE document_chunk INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+                    )
+                    cursor.copy_expert(
+                        "COPY document_chunk_staging "
+                        "(id, vector, collection_name, text, vmetadata) "
+                        "FROM STDIN WITH (FORMAT binary)",
+                        data,
+                    )
+                    cursor.execute(
+                        "INSERT INTO document_chunk "
+                        "(id, vector, collection_name, text, vmetadata) "
+                        "SELECT id, vector, collection_name, text, vmetadata "
+                        "FROM document_chunk_staging "
+                        "ON CONFLICT (id) DO UPDATE SET "
+                        "vector = EXCLUDED.vector, "
+                        "collection_name = EXCLUDED.collection_name, "
+                        "text = EXCLUDED.text, "
+                        "vmetadata = EXCLUDED.vmetadata"
+                    )
+                self.session.commit()
+            except Exception:
+                self.session.rollback()
+                raise
+
     def insert(self, collection_name: str, items: List[VectorItem]) -> None:
         try:
-            new_items = []
-            for item in items:
-                vector = self.adjust_vector_length(item["vector"])
-                new_chunk = DocumentChunk(
-                    id=item["id"],
-                    vector=vector,
-                    collection_name=collection_name,
-                    text=item["text"],
-                    vmetadata=item["metadata"],
-                )
-                new_items.append(new_chunk)
-            self.session.bulk_save_objects(new_items)
-            self.session.commit()
-            print(
-                f"Inserted {len(new_items)} items into collection '{collection_name}'."
-            )
+            self.write(collection_name, items)
+            self.schedule_index(collection_name)
+            print(f"Inserted {len(items)} items into collection '{collection_name}'.")
         except Exception as e:
-            self.session.rollback()
             print(f"Error during insert: {e}")
             raise
 
     def upsert(self, collection_name: str, items: List[VectorItem]) -> None:
         try:
-            for item in items:
-                vector = self.adjust_vector_length(item["vector"])
-                existing = (
-                    self.session.query(DocumentChunk)
-                    .filter(DocumentChunk.id == item["id"])
-                    .first()
-                )
-                if existing:
-                    existing.vector = vector
-                    existing.text = item["text"]
-                    existing.vmetadata = item["metadata"]
-                    existing.collection_name = (
-                        collection_name  # Update collection_name if necessary
-                    )
-                else:
-                    new_chunk = DocumentChunk(
-                        id=item["id"],
-                        vector=vector,
-                        collection_name=collection_name,
-                        text=item["text"],
-                        vmetadata=item["metadata"],
-                    )
-                    self.session.add(new_chunk)
-            self.session.commit()
+            self.write(collection_name, items)
+            self.schedule_index(collection_name)
             print(f"Upserted {len(items)} items into collection '{collection_name}'.")
         except Exception as e:
-            self.session.rollback()
             print(f"Error during upsert: {e}")
             raise
 
@@ -190,9 +283,17 @@ class PgvectorClient:
         collection_name: str,
         vectors: List[List[float]],
         limit: Optional[int] = None,
+    ) -> Optional[SearchResult]:
+        return self.search_many([collection_name], vectors, limit)
+
+    def search_many(
+        self,
+        collection_names: List[str],
+        vectors: List[List[float]],
+        limit: Optional[int] = None,
     ) -> Optional[SearchResult]:
         try:
-            if not vectors:
+            if not vectors or not collection_names:
                 return None
 
             # Adjust query vectors to VECTOR_LENGTH
@@ -202,79 +303,86 @@ class PgvectorClient:
             def vector_expr(vector):
                 return cast(array(vector), Vector(VECTOR_LENGTH))
 
-            # Create the values for query vectors
+            # Create the values for query vectors, shared by all subqueries
             qid_col = column("qid", Integer)
             q_vector_col = column("q_vector", Vector(VECTOR_LENGTH))
-            query_vectors = (
-                values(qid_col, q_vector_col)
-                .data(
+            query_vectors = select(
+                values(qid_col, q_vector_col, name="query_vector_values").data(
                     [(idx, vector_expr(vector)) for idx, vector in enumerate(vectors)]
                 )
-                .alias("query_vectors")
-            )
-
-            # Build the lateral subquery for each query vector
-            subq = (
-                select(
-                    DocumentChunk.id,
-                    DocumentChunk.text,
-                    DocumentChunk.vmetadata,
-                    (
-                        DocumentChunk.vector.cosine_distance(query_vectors.c.q_vector)
-                    ).label("distance"),
-                )
-                .where(DocumentChunk.collection_name == collection_name)
-                .order_by(
-                    (DocumentChunk.vector.cosine_distance(query_vectors.c.q_vector))
+            ).cte("query_vectors")
+
+            if PGVECTOR_INDEX_MODE == "collection":
+                # Partial indexes only match an equality on a single collection,
+                # so every collection gets its own lateral subquery
+                conditions = [
+                    DocumentChunk.collection_name == collection_name
+                    for collection_name in collection_names
+                ]
+            else:
+                conditions = [DocumentChunk.collection_name.in_(collection_names)]
+
+            selects = []
+            for idx, condition in enumerate(conditions):
+                # Build the lateral subquery for each query vector
+                subq = (
+                    select(
+                        DocumentChunk.id,
+                        DocumentChunk.text,
+                        DocumentChunk.vmetadata,
+                        (
+                            DocumentChunk.vector.cosine_distance(
+                                query_vectors.c.q_vector
+                            )
+                        ).label("distance"),
+                    )
+                    .where(condition)
+                    .order_by(
+                        (DocumentChunk.vector.cosine_distance(query_vectors.c.q_vector))
+                    )
                 )
-            )
-            if limit is not None:
-                subq = subq.limit(limit)
-            subq = subq.lateral("result")
-
-            # Build the main query by joining query_vectors and the lateral subquery
-            stmt = (
-                select(
-                    query_vectors.c.qid,
-                    subq.c.id,
-                    subq.c.text,
-                    subq.c.vmetadata,
-                    subq.c.distance,
+                if limit is not None:
+                    subq = subq.limit(limit)
+                subq = subq.lateral(f"result_{idx}")
+
+                # Join query_vectors and the lateral subquery
+                selects.append(
+                    select(
+                        query_vectors.c.qid,
+                        subq.c.id,
+                        subq.c.text,
+                        subq.c.vmetadata,
+                        subq.c.distance,
+                    )
+                    .select_from(query_vectors)
+                    .join(subq, true())
                 )
-                .select_from(query_vectors)
-                .join(subq, true())
-                .order_by(query_vectors.c.qid, subq.c.distance)
-            )
-
-            result_proxy = self.session.execute(stmt)
-            results = result_proxy.all()
-
-            ids = [[] for _ in range(num_queries)]
-            distances = [[] for _ in range(num_queries)]
-            documents = [[] for _ in range(num_queries)]
-            metadatas = [[] for _ in range(num_queries)]
+            stmt = selects[0] if len(selects) == 1 else union_all(*selects)
 
-            if not results:
-                return SearchResult(
-                    ids=ids,
-                    distances=distances,
-                    documents=documents,
-                    metadatas=metadatas,
-                )
+            self.set_search_params(collection_names, limit)
+            results = self.session.execute(stmt).all()
 
+            # Top `limit` rows of each query vector over all collections
+            rows = [[] for _ in range(num_queries)]
             for row in results:
-                qid = int(row.qid)
-                ids[qid].append(row.id)
-                distances[qid].append(row.distance)
-                documents[qid].append(row.text)
-                metadatas[qid].append(row.vmetadata)
+                rows[int(row.qid)].append(row)
+            for idx in range(num_queries):
+                rows[idx].sort(key=lambda row: row.distance)
+                if limit is not None:
+                    rows[idx] = rows[idx][:limit]
 
             return SearchResult(
-                ids=ids, distances=distances, documents=documents, metadatas=metadatas
+                ids=[[row.id for row in qrows] for qrows in rows],
+                distances=[[row.distance for row in qrows] for qrows in rows],
+                documents=[[row.text for row in qrows] for qrows in rows],
+                metadatas=[[row.vmetadata for row in qrows] for qrows in rows],
             )
         except Exception as e:
             print(f"Error during search: {e}")
             return None
+        finally:
+            # Do not keep a transaction open, it would block concurrent index builds
+            self.session.rollback()
 
     def query(
         self, collection_name: str, filter: Dict[str, Any], limit: Optional[int] = None
@@ -307,6 +415,9 @@ class PgvectorClient:
         except Exception as e:
             print(f"Error during query: {e}")
             return None
+        finally:
+            # Do not keep a transaction open, it would block concurrent index builds
+            self.session.rollback()
 
     def get(
         self, collection_name: str, limit: Optional[int] = None
@@ -331,6 +442,9 @@ class PgvectorClient:
         except Exception as e:
             print(f"Error during get: {e}")
             return None
+        finally:
+            # Do not keep a transaction open, it would block concurrent index builds
+            self.session.rollback()
 
     def delete(
         self,
@@ -360,7 +474,15 @@ class PgvectorClient:
     def reset(self) -> None:
         try:
             deleted = self.session.query(DocumentChunk).delete()
+            collection_names = [
+                name
+                for (name,) in self.session.query(
+                    DocumentChunkIndex.collection_name
+                ).all()
+            ]
             self.session.commit()
+            for collection_name in collection_names:
+                self.drop_index(collection_name)
             print(
                 f"Reset complete. Deleted {deleted} items from 'document_chunk' table."
             )
@@ -374,17 +496,274 @@ class PgvectorClient:
 
     def has_collection(self, collection_name: str) -> bool:
         try:
-            exists = (
-                self.session.query(DocumentChunk)
-                .filter(DocumentChunk.collection_name == collection_name)
-                .first()
-                is not None
-            )
-            return exists
+            # EXISTS stops at the first row of the collection_name index and does
+            # not load its vector
+            return self.session.query(
+                exists().where(DocumentChunk.collection_name == collection_name)
+            ).scalar()
         except Exception as e:
             print(f"Error checking collection existence: {e}")
             return False
+        finally:
+            # Do not keep a transaction open, it would block concurrent index builds
+            self.session.rollback()
 
     def delete_collection(self, collection_name: str) -> None:
         self.delete(collection_name)
+        self.drop_index(collection_name)
         print(f"Collection '{collection_name}' deleted.")
+
+    ####################################
+    # Vector indexes
+    ####################################
+
+    def get_autocommit_connection(self):
+        # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction
+        return (
+            self.session.get_bind()
+            .connect()
+            .execution_options(isolation_level="AUTOCOMMIT")
+        )
+
+    def get_index_params(self, rows: int) -> dict:
+        if PGVECTOR_INDEX_METHOD == "ivfflat":
+            # pgvector recommends rows / 1000 lists up to 1M rows, sqrt(rows) above
+            lists = max(rows // 1000, 10) if rows <= 1_000_000 else int(math.sqrt(rows))
+            return {"method": "ivfflat", "lists": lists, "with": f"lists = {lists}"}
+        return {
+            "method": "hnsw",
+            "lists": None,
+            "with": f"m = {PGVECTOR_HNSW_M}, "
+            f"ef_construction = {PGVECTOR_HNSW_EF_CONSTRUCTION}",
+        }
+
+    def needs_index(self, index: Optional[DocumentChunkIndex], rows: int) -> bool:
+        if index is None:
+            return rows >= PGVECTOR_INDEX_MIN_ROWS
+        if index.method != PGVECTOR_INDEX_METHOD:
+            return True
+        # ivfflat lists are sized at build time; rebuild once the data doubled
+        return index.method == "ivfflat" and rows > 2 * index.rows
+
+    def schedule_index(self, collection_name: str) -> None:
+        if PGVECTOR_INDEX_MODE != "collection":
+            return
+
+        with self.lock:
+            if collection_name in self.indexing:
+                return
+            self.indexing.add(collection_name)
+
+        def run():
+            try:
+                self.build_index(collection_name)
+            except Exception as e:
+                print(f"Error building index for collection '{collection_name}': {e}")
+            finally:
+                with self.lock:
+                    self.indexing.discard(collection_name)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def build_index(self, collection_name: str, force: bool = False) -> Optional[dict]:
+        """
+        Builds the partial vector index of a collection if it is large enough and
+        has none yet, or replaces it when the configured method changed (or, for
+        ivfflat, the collection outgrew its lists). With `force` the index is
+        always rebuilt. The new index is created concurrently before the old one
+        is dropped, so searches keep using an index the whole time.
+        """
+        if not INDEXABLE_COLLECTION_NAME.match(collection_name):
+            return None
+
+        lock_key = f"document_chunk_index:{collection_name}"
+        with self.get_autocommit_connection() as connection:
+            # Only one process builds the index of a collection at a time
+            if not connection.execute(
+                text("SELECT pg_try_advisory_lock(hashtext(:key))"), {"key": lock_key}
+            ).scalar():
+                return None
+
+            try:
+                index = connection.execute(
+                    select(DocumentChunkIndex).where(
+                        DocumentChunkIndex.collection_name == collection_name
+                    )
+                ).first()
+                rows = connection.execute(
+                    select(func.count())
+                    .select_from(DocumentChunk)
+                    .where(DocumentChunk.collection_name == collection_name)
+                ).scalar()
+
+                if not force and not self.needs_index(index, rows):
+                    return dict(index._mapping) if index else None
+                if rows == 0:
+                    self.drop_index(collection_name)
+                    return None
+
+                params = self.get_index_params(rows)
+                name_hash = hashlib.sha1(collection_name.encode()).hexdigest()[:12]
+                index_name = f"idx_document_chunk_{name_hash}_{time.time_ns()}"
+
+                start = time.time()
+                connection.execute(
+                    text(
+                        f"CREATE INDEX CONCURRENTLY {index_name} ON document_chunk "
+                        f"USING {params['method']} (vector vector_cosine_ops) "
+                        f"WITH ({params['with']}) "
+                        f"WHERE collection_name = '{collection_name}'"
+                    )
+                )
+
+                values = {
+                    "collection_name": collection_name,
+                    "index_name": index_name,
+                    "method": params["method"],
+                    "rows": rows,
+                    "lists": params["lists"],
+                    "created_at": int(time.time()),
+                }
+                connection.execute(
+                    pg_insert(DocumentChunkIndex)
+                    .values(**values)
+                    .on_conflict_do_update(
+                        index_elements=["collection_name"], set_=values
+                    )
+                )
+                if index is not None:
+                    connection.execute(
+                        text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.index_name}")
+                    )
+
+                print(
+                    f"Built {params['method']} index for collection "
+                    f"'{collection_name}' ({rows} rows) in {time.time() - start:.1f}s."
+                )
+                return values
+            finally:
+                connection.execute(
+                    text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": lock_key}
+                )
+
+    def drop_index(self, collection_name: str) -> None:
+        with self.get_autocommit_connection() as connection:
+            index = connection.execute(
+                select(DocumentChunkIndex).where(
+                    DocumentChunkIndex.collection_name == collection_name
+                )
+            ).first()
+            if index is None:
+                return
+
+            connection.execute(
+                text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.index_name}")
+            )
+            connection.execute(
+                DocumentChunkIndex.__table__.delete().where(
+                    DocumentChunkIndex.collection_name == collection_name
+                )
+            )
+
+    def rebuild_global_index(self) -> dict:
+        # Recreates the shared ivfflat index with lists sized to the current data
+        with self.get_autocommit_connection() as connection:
+            rows = connection.execute(
+                select(func.count()).select_from(DocumentChunk)
+            ).scalar()
+            lists = max(rows // 1000, 10) if rows <= 1_000_000 else int(math.sqrt(rows))
+
+            connection.execute(text(f"DROP INDEX IF EXISTS {GLOBAL_INDEX_NAME}_new"))
+            connection.execute(
+                text(
+                    f"CREATE INDEX CONCURRENTLY {GLOBAL_INDEX_NAME}_new ON document_chunk "
+                    f"USING ivfflat (vector vector_cosine_ops) WITH (lists = {lists})"
+                )
+            )
+            connection.execute(
+                text(f"DROP INDEX CONCURRENTLY IF EXISTS {GLOBAL_INDEX_NAME}")
+            )
+            connection.execute(
+                text(
+                    f"ALTER INDEX {GLOBAL_INDEX_NAME}_new RENAME TO {GLOBAL_INDEX_NAME}"
+                )
+            )
+        self.global_index_lists = lists
+        return {"index_name": GLOBAL_INDEX_NAME, "rows": rows, "lists": lists}
+
+    def rebuild_indexes(self, collection_name: Optional[str] = None) -> list[dict]:
+        if PGVECTOR_INDEX_MODE != "collection":
+            return [self.rebuild_global_index()]
+
+        if collection_name is not None:
+            collection_names = [collection_name]
+        else:
+            collection_names = [
+                name
+                for (name,) in self.session.query(DocumentChunk.collection_name)
+                .group_by(DocumentChunk.collection_name)
+                .having(func.count() >= PGVECTOR_INDEX_MIN_ROWS)
+                .all()
+            ]
+            self.session.commit()
+
+        results = []
+        for name in collection_names:
+            result = self.build_index(name, force=True)
+            if result:
+                results.append(result)
+        return results
+
+    def get_indexes(self) -> list[dict]:
+        try:
+            return [
+                dict(row._mapping)
+                for row in self.session.execute(
+                    select(
+                        *DocumentChunkIndex.__table__.columns,
+                        func.pg_relation_size(
+                            func.to_regclass(DocumentChunkIndex.index_name)
+                        ).label("size"),
+                    )
+                ).all()
+            ]
+        finally:
+            self.session.commit()
+
+    def get_global_index_lists(self) -> int:
+        if self.global_index_lists is None:
+            options = self.session.execute(
+                text("SELECT reloptions FROM pg_class WHERE relname = :name"),
+                {"name": GLOBAL_INDEX_NAME},
+            ).scalar()
+            lists = [
+                int(option.split("=")[1])
+                for option in options or []
+                if option.startswith("lists=")
+            ]
+            self.global_index_lists = lists[0] if lists else 100
+        return self.global_index_lists
+
+    def set_search_params(
+        self, collection_names: List[str], limit: Optional[int]
+    ) -> None:
+        # Applies to the current transaction only
+        if PGVECTOR_INDEX_MODE == "collection":
+            indexes = self.session.execute(
+                select(DocumentChunkIndex.method, DocumentChunkIndex.lists).where(
+                    DocumentChunkIndex.collection_name.in_(collection_names)
+                )
+            ).all()
+        else:
+            indexes = [("ivfflat", self.get_global_index_lists())]
+
+        if any(method == "hnsw" for method, _ in indexes):
+            # ef_search bounds how many results the index can return
+            ef_search = min(max(PGVECTOR_HNSW_EF_SEARCH, 2 * (limit or 0)), 1000)
+            self.session.execute(text(f"SET LOCAL hnsw.ef_search = {ef_search}"))
+
+        lists = [lists or 1 for method, lists in indexes if method == "ivfflat"]
+        if lists:
+            probes = PGVECTOR_IVFFLAT_PROBES or int(math.sqrt(max(lists)))
+            probes = min(max(probes, 1), max(lists))
+            self.session.execute(text(f"SET LOCAL ivfflat.probes = {probes}"))
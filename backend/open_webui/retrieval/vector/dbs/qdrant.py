@@ -4,13 +4,22 @@ from qdrant_client import QdrantClient as Qclient
 from qdrant_client.http.models import PointStruct
 from qdrant_client.models import models
 
-from open_webui.retrieval.vector.main import VectorItem, SearchResult, GetResult
+from open_webui.retrieval.vector.main import (
+    VectorDBBase,
+    VectorItem,
+    SearchResult,
+    GetResult,
+    merge_search_results,
+)
 from open_webui.config import QDRANT_URI, QDRANT_API_KEY
 
 NO_LIMIT = 999999999
 
 
-class QdrantClient:
+class QdrantClient(VectorDBBase):
+    # Points are scored by cosine similarity
+    higher_is_closer = True
+
     def __init__(self):
         self.collection_prefix = "open-webui"
         self.QDRANT_URI = QDRANT_URI
@@ -20,6 +29,8 @@ class QdrantClient:
             if self.QDRANT_URI
             else None
         )
+        # Collections known to exist, so writes skip the existence check
+        self.collections: set[str] = set()
 
     def _result_to_get_result(self, points) -> GetResult:
         ids = []
@@ -52,10 +63,27 @@ class QdrantClient:
         print(f"collection {collection_name_with_prefix} successfully created!")
 
     def _create_collection_if_not_exists(self, collection_name, dimension):
+        if collection_name in self.collections:
+            return
         if not self.has_collection(collection_name=collection_name):
             self._create_collection(
                 collection_name=collection_name, dimension=dimension
             )
+        self.collections.add(collection_name)
+
+    def _write(self, collection_name: str, items: list[VectorItem], write):
+        self._create_collection_if_not_exists(collection_name, len(items[0]["vector"]))
+        points = self._create_points(items)
+        try:
+            return write(f"{self.collection_prefix}_{collection_name}", points)
+        except Exception:
+            # The collection may have been deleted by another worker
+            if self.has_collection(collection_name):
+                raise
+            self._create_collection_if_not_exists(
+                collection_name, len(items[0]["vector"])
+            )
+            return write(f"{self.collection_prefix}_{collection_name}", points)
 
     def _create_points(self, items: list[VectorItem]):
         return [
@@ -68,11 +96,17 @@ class QdrantClient:
         ]
 
     def has_collection(self, collection_name: str) -> bool:
-        return self.client.collection_exists(
+        exists = self.client.collection_exists(
             f"{self.collection_prefix}_{collection_name}"
         )
+        if exists:
+            self.collections.add(collection_name)
+        else:
+            self.collections.discard(collection_name)
+        return exists
 
     def delete_collection(self, collection_name: str):
+        self.collections.discard(collection_name)
         return self.client.delete_collection(
             collection_name=f"{self.collection_prefix}_{collection_name}"
         )
@@ -97,6 +131,55 @@ class QdrantClient:
             distances=[[point.score for point in query_response.points]],
         )
 
+    def search_many(
+        self,
+        collection_names: list[str],
+        vectors: list[list[float | int]],
+        limit: Optional[int],
+    ) -> Optional[SearchResult]:
+        # One batch request per collection for all query vectors
+        if limit is None:
+            limit = NO_LIMIT
+
+        results = []
+        for collection_name in collection_names:
+            try:
+                responses = self.client.query_batch_points(
+                    collection_name=f"{self.collection_prefix}_{collection_name}",
+                    requests=[
+                        models.QueryRequest(
+                            query=vector, limit=limit, with_payload=True
+                        )
+                        for vector in vectors
+                    ],
+                )
+            except Exception as e:
+                print(f"Error searching collection {collection_name}: {e}")
+                continue
+
+            results.append(
+                SearchResult(
+                    ids=[
+                        [point.id for point in response.points]
+                        for response in responses
+                    ],
+                    documents=[
+                        [point.payload["text"] for point in response.points]
+                        for response in responses
+                    ],
+                    metadatas=[
+                        [point.payload["metadata"] for point in response.points]
+                        for response in responses
+                    ],
+                    distances=[
+                        [point.score for point in response.points]
+                        for response in responses
+                    ],
+                )
+            )
+
+        return merge_search_results(results, len(vectors), limit, reverse=True)
+
     def query(self, collection_name: str, filter: dict, limit: Optional[int] = None):
         # Construct the filter string for querying
         if not self.has_collection(collection_name):
@@ -133,15 +216,11 @@ class QdrantClient:
 
     def insert(self, collection_name: str, items: list[VectorItem]):
         # Insert the items into the collection, if the collection does not exist, it will be created.
-        self._create_collection_if_not_exists(collection_name, len(items[0]["vector"]))
-        points = self._create_points(items)
-        self.client.upload_points(f"{self.collection_prefix}_{collection_name}", points)
+        self._write(collection_name, items, self.client.upload_points)
 
     def upsert(self, collection_name: str, items: list[VectorItem]):
         # Update the items in the collection, if the items are not present, insert them. If the collection does not exist, it will be created.
-        self._create_collection_if_not_exists(collection_name, len(items[0]["vector"]))
-        points = self._create_points(items)
-        return self.client.upsert(f"{self.collection_prefix}_{collection_name}", points)
+        return self._write(collection_name, items, self.client.upsert)
 
     def delete(
         self,
@@ -178,6 +257,7 @@ class QdrantClient:
 
     def reset(self):
         # Resets the database. This will delete all collections and item entries.
+        self.collections.clear()
         collection_names = self.client.get_collections().collections
         for collection_name in collection_names:
             if collection_name.name.startswith(self.collection_prefix):
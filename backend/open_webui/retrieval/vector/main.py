@@ -1,6 +1,13 @@
+import logging
+
 from pydantic import BaseModel
 from typing import Optional, List, Any
 
+from open_webui.env import SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["RAG"])
+
 
 class VectorItem(BaseModel):
     id: str
@@ -17,3 +24,70 @@ class GetResult(BaseModel):
 
 class SearchResult(GetResult):
     distances: Optional[List[List[float | int]]]
+
+
+def merge_search_results(
+    results: List[Optional[SearchResult]],
+    num_queries: int,
+    limit: Optional[int],
+    reverse: bool = False,
+) -> SearchResult:
+    # Merges searches of several collections into the top `limit` items of each
+    # query vector; `reverse` when higher distances are closer matches
+    merged = {"ids": [], "distances": [], "documents": [], "metadatas": []}
+
+    for idx in range(num_queries):
+        rows = []
+        for result in results:
+            if result is None or not result.ids or idx >= len(result.ids):
+                continue
+            rows.extend(
+                zip(
+                    result.distances[idx],
+                    result.ids[idx],
+                    result.documents[idx],
+                    result.metadatas[idx],
+                )
+            )
+
+        rows.sort(key=lambda row: row[0], reverse=reverse)
+        if limit is not None:
+            rows = rows[:limit]
+
+        merged["distances"].append([row[0] for row in rows])
+        merged["ids"].append([row[1] for row in rows])
+        merged["documents"].append([row[2] for row in rows])
+        merged["metadatas"].append([row[3] for row in rows])
+
+    return SearchResult(**merged)
+
+
+class VectorDBBase:
+    # Whether the backend returns similarity scores (higher is closer) as
+    # distances instead of actual distances
+    higher_is_closer = False
+
+    def search_many(
+        self,
+        collection_names: List[str],
+        vectors: List[List[float | int]],
+        limit: Optional[int],
+    ) -> Optional[SearchResult]:
+        """
+        Searches several collections with several query vectors at once and
+        returns, for each query vector, the `limit` closest items over all the
+        collections. Collections that do not exist are skipped.
+
+        This default runs one batched search per collection; clients override it
+        when their backend can search several collections in one request.
+        """
+        results = []
+        for collection_name in collection_names:
+            try:
+                results.append(self.search(collection_name, vectors, limit))
+            except Exception as e:
+                log.debug(f"Error searching collection {collection_name}: {e}")
+
+        return merge_search_results(
+            results, len(vectors), limit, reverse=self.higher_is_closer
+        )
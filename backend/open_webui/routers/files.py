@@ -15,6 +15,10 @@ from open_webui.models.files import (
     FileModelResponse,
     Files,
 )
+from open_webui.models.jobs import IngestionJobModel, IngestionJobs
+from open_webui.retrieval.ingestion import INGESTION_JOBS
+from open_webui.retrieval.vector.connector import VECTOR_DB_CLIENT
+from open_webui.retrieval.bm25 import BM25_INDEX
 from open_webui.routers.retrieval import process_file, ProcessFileForm
 
 from open_webui.config import UPLOAD_DIR
@@ -41,7 +45,10 @@ router = APIRouter()
 
 @router.post("/", response_model=FileModelResponse)
 def upload_file(
-    request: Request, file: UploadFile = File(...), user=Depends(get_verified_user)
+    request: Request,
+    file: UploadFile = File(...),
+    process_in_background: bool = True,
+    user=Depends(get_verified_user),
 ):
     log.info(f"file.content_type: {file.content_type}")
     try:
@@ -71,8 +78,20 @@ def upload_file(
         )
 
         try:
-            process_file(request, ProcessFileForm(file_id=id))
-            file_item = Files.get_file_by_id(id=id)
+            if process_in_background and INGESTION_JOBS.started:
+                # Parsing and embedding run in the background; clients follow the
+                # job through socket events or /files/{id}/process/status, the
+                # returned file has no content until the job completes
+                job = INGESTION_JOBS.submit(user.id, id, {"file_id": id})
+                file_item = FileModelResponse(
+                    **{
+                        **file_item.model_dump(),
+                        "job": {"id": job.id, "status": job.status},
+                    }
+                )
+            else:
+                process_file(request, ProcessFileForm(file_id=id))
+                file_item = Files.get_file_by_id(id=id)
         except Exception as e:
             log.exception(e)
             log.error(f"Error processing file: {file_item.id}")
@@ -157,6 +176,24 @@ async def get_file_by_id(id: str, user=Depends(get_verified_user)):
         )
 
 
+############################
+# Get File Process Status By Id
+############################
+
+
+@router.get("/{id}/process/status", response_model=Optional[IngestionJobModel])
+async def get_file_process_status_by_id(id: str, user=Depends(get_verified_user)):
+    file = Files.get_file_by_id(id)
+
+    if file and (file.user_id == user.id or user.role == "admin"):
+        return IngestionJobs.get_latest_job_by_file_id(id)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=ERROR_MESSAGES.NOT_FOUND,
+        )
+
+
 ############################
 # Get File Data Content By Id
 ############################
@@ -347,6 +384,13 @@ async def delete_file_by_id(id: str, user=Depends(get_verified_user)):
     if file and (file.user_id == user.id or user.role == "admin"):
         result = Files.delete_file_by_id(id)
         if result:
+            IngestionJobs.delete_jobs_by_file_id(id)
+            try:
+                # Knowledge bases hold their own copies of the file's chunks
+                VECTOR_DB_CLIENT.delete_collection(collection_name=f"file-{id}")
+                BM25_INDEX.delete_collection(collection_name=f"file-{id}")
+            except Exception as e:
+                log.debug(e)
             try:
                 Storage.delete_file(file.path)
             except Exception as e:
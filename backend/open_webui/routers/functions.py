@@ -8,7 +8,12 @@ from open_webui.models.functions import (
     FunctionResponse,
     Functions,
 )
-from open_webui.utils.plugin import load_function_module_by_id, replace_imports
+from open_webui.utils.plugin import (
+    PLUGIN_MODULES,
+    get_function_module,
+    load_function_module_by_id,
+    replace_imports,
+)
 from open_webui.config import CACHE_DIR
 from open_webui.constants import ERROR_MESSAGES
 from fastapi import APIRouter, Depends, HTTPException, Request, status
@@ -63,15 +68,16 @@ async def create_new_function(
             )
             form_data.meta.manifest = frontmatter
 
-            FUNCTIONS = request.app.state.FUNCTIONS
-            FUNCTIONS[form_data.id] = function_module
-
             function = Functions.insert_new_function(user.id, function_type, form_data)
 
             function_cache_dir = Path(CACHE_DIR) / "functions" / form_data.id
             function_cache_dir.mkdir(parents=True, exist_ok=True)
 
             if function:
+                # Only once saved, so other workers reload the new content
+                PLUGIN_MODULES.invalidate(
+                    f"function:{form_data.id}", function_module, form_data.content
+                )
                 return function
             else:
                 raise HTTPException(
@@ -179,15 +185,16 @@ async def update_function_by_id(
         )
         form_data.meta.manifest = frontmatter
 
-        FUNCTIONS = request.app.state.FUNCTIONS
-        FUNCTIONS[id] = function_module
-
         updated = {**form_data.model_dump(exclude={"id"}), "type": function_type}
         print(updated)
 
         function = Functions.update_function_by_id(id, updated)
 
         if function:
+            # Only once saved, so other workers reload the new content
+            PLUGIN_MODULES.invalidate(
+                f"function:{id}", function_module, form_data.content
+            )
             return function
         else:
             raise HTTPException(
@@ -214,9 +221,7 @@ async def delete_function_by_id(
     result = Functions.delete_function_by_id(id)
 
     if result:
-        FUNCTIONS = request.app.state.FUNCTIONS
-        if id in FUNCTIONS:
-            del FUNCTIONS[id]
+        PLUGIN_MODULES.invalidate(f"function:{id}")
 
     return result
 
@@ -256,11 +261,7 @@ async def get_function_valves_spec_by_id(
 ):
     function = Functions.get_function_by_id(id)
     if function:
-        if id in request.app.state.FUNCTIONS:
-            function_module = request.app.state.FUNCTIONS[id]
-        else:
-            function_module, function_type, frontmatter = load_function_module_by_id(id)
-            request.app.state.FUNCTIONS[id] = function_module
+        function_module = get_function_module(id)
 
         if hasattr(function_module, "Valves"):
             Valves = function_module.Valves
@@ -284,11 +285,7 @@ async def update_function_valves_by_id(
 ):
     function = Functions.get_function_by_id(id)
     if function:
-        if id in request.app.state.FUNCTIONS:
-            function_module = request.app.state.FUNCTIONS[id]
-        else:
-            function_module, function_type, frontmatter = load_function_module_by_id(id)
-            request.app.state.FUNCTIONS[id] = function_module
+        function_module = get_function_module(id)
 
         if hasattr(function_module, "Valves"):
             Valves = function_module.Valves
@@ -347,11 +344,7 @@ async def get_function_user_valves_spec_by_id(
 ):
     function = Functions.get_function_by_id(id)
     if function:
-        if id in request.app.state.FUNCTIONS:
-            function_module = request.app.state.FUNCTIONS[id]
-        else:
-            function_module, function_type, frontmatter = load_function_module_by_id(id)
-            request.app.state.FUNCTIONS[id] = function_module
+        function_module = get_function_module(id)
 
         if hasattr(function_module, "UserValves"):
             UserValves = function_module.UserValves
@@ -371,11 +364,7 @@ async def update_function_user_valves_by_id(
     function = Functions.get_function_by_id(id)
 
     if function:
-        if id in request.app.state.FUNCTIONS:
-            function_module = request.app.state.FUNCTIONS[id]
-        else:
-            function_module, function_type, frontmatter = load_function_module_by_id(id)
-            request.app.state.FUNCTIONS[id] = function_module
+        function_module = get_function_module(id)
 
         if hasattr(function_module, "UserValves"):
             UserValves = function_module.UserValves
@@ -1,12 +1,7 @@
-# TODO: Implement a more intelligent load balancing mechanism for distributing requests among multiple backend instances.
-# Current implementation uses a simple round-robin approach (random.choice). Consider incorporating algorithms like weighted round-robin,
-# least connections, or least response time for better resource utilization and performance optimization.
-
 import asyncio
 import json
 import logging
 import os
-import random
 import re
 import time
 from typing import Optional, Union
@@ -29,7 +24,6 @@ from fastapi import (
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, ConfigDict
-from starlette.background import BackgroundTask
 
 
 from open_webui.models.models import Models
@@ -43,6 +37,13 @@ from open_webui.utils.payload import (
 )
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.access_control import has_access
+from open_webui.utils.http_client import (
+    UPSTREAM_CLIENTS,
+    cleanup_response,
+    get_upstream_key,
+    stream_response_content,
+)
+from open_webui.utils.load_balancer import LoadBalancer
 
 
 from open_webui.config import (
@@ -54,6 +55,9 @@ from open_webui.env import (
     AIOHTTP_CLIENT_TIMEOUT,
     AIOHTTP_CLIENT_TIMEOUT_OPENAI_MODEL_LIST,
     BYPASS_MODEL_ACCESS_CONTROL,
+    OLLAMA_LOAD_BALANCING_STRATEGY,
+    OLLAMA_PREFER_LOADED_MODELS,
+    OLLAMA_LOADED_MODELS_TTL,
 )
 from open_webui.constants import ERROR_MESSAGES
 
@@ -61,6 +65,13 @@ log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
 
 
+# Backends are tracked per base url, so path-prefixed urls on one host stay apart
+OLLAMA_LOAD_BALANCER = LoadBalancer(
+    strategy=OLLAMA_LOAD_BALANCING_STRATEGY,
+    prefer_loaded=OLLAMA_PREFER_LOADED_MODELS,
+)
+
+
 ##########################################
 #
 # Utility functions
@@ -71,25 +82,21 @@ log.setLevel(SRC_LOG_LEVELS["OLLAMA"])
 async def send_get_request(url, key=None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_OPENAI_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(
-                url, headers={**({"Authorization": f"Bearer {key}"} if key else {})}
-            ) as response:
-                return await response.json()
+        session = UPSTREAM_CLIENTS.get_session(url)
+        async with session.get(
+            url,
+            headers={**({"Authorization": f"Bearer {key}"} if key else {})},
+            timeout=timeout,
+        ) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
         return None
 
 
-async def cleanup_response(
-    response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
-):
-    if response:
-        response.close()
-    if session:
-        await session.close()
+def get_backend_key(url: str) -> str:
+    return url.rstrip("/")
 
 
 async def send_post_request(
@@ -98,13 +105,15 @@ async def send_post_request(
     stream: bool = True,
     key: Optional[str] = None,
     content_type: Optional[str] = None,
+    base_url: Optional[str] = None,
 ):
+    backend = get_backend_key(base_url or get_upstream_key(url))
+    start = OLLAMA_LOAD_BALANCER.acquire(backend)
 
     r = None
+    streaming = False
     try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-        )
+        session = UPSTREAM_CLIENTS.get_session(url)
 
         r = await session.post(
             url,
@@ -113,8 +122,10 @@ async def send_post_request(
                 "Content-Type": "application/json",
                 **({"Authorization": f"Bearer {key}"} if key else {}),
             },
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
         )
         r.raise_for_status()
+        OLLAMA_LOAD_BALANCER.record_success(backend, time.monotonic() - start)
 
         if stream:
             response_headers = dict(r.headers)
@@ -122,22 +133,27 @@ async def send_post_request(
             if content_type:
                 response_headers["Content-Type"] = content_type
 
+            # The stream stays in flight until the body has been sent
+            streaming = True
             return StreamingResponse(
-                r.content,
+                stream_response_content(
+                    r, lambda: OLLAMA_LOAD_BALANCER.release(backend)
+                ),
                 status_code=r.status,
                 headers=response_headers,
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
             )
         else:
             res = await r.json()
-            await cleanup_response(r, session)
+            await cleanup_response(r)
             return res
 
     except Exception as e:
         detail = None
 
+        # Client errors (4xx) say nothing about the health of the backend
+        if r is None or r.status >= 500:
+            OLLAMA_LOAD_BALANCER.record_failure(backend)
+
         if r is not None:
             try:
                 res = await r.json()
@@ -145,11 +161,15 @@ async def send_post_request(
                     detail = f"Ollama: {res.get('error', 'Unknown error')}"
             except Exception:
                 detail = f"Ollama: {e}"
+            await cleanup_response(r)
 
         raise HTTPException(
             status_code=r.status if r else 500,
             detail=detail if detail else "Open WebUI: Server Connection Error",
         )
+    finally:
+        if not streaming:
+            OLLAMA_LOAD_BALANCER.release(backend)
 
 
 def get_api_key(url, configs):
@@ -158,6 +178,74 @@ def get_api_key(url, configs):
     return configs.get(base_url, {}).get("key", None)
 
 
+def set_loaded_models(request: Request, responses: dict):
+    # Record which models each node has in memory (from /api/ps), using the same
+    # prefixed model ids as get_all_models
+    for url, response in responses.items():
+        if response is None:
+            continue
+
+        api_config = request.app.state.config.OLLAMA_API_CONFIGS.get(url, {})
+        prefix_id = api_config.get("prefix_id", None)
+
+        OLLAMA_LOAD_BALANCER.set_loaded_models(
+            get_backend_key(url),
+            [
+                f"{prefix_id}.{model['model']}" if prefix_id else model["model"]
+                for model in response.get("models", [])
+            ],
+        )
+
+
+async def update_loaded_models(request: Request):
+    urls = [
+        url
+        for url in request.app.state.config.OLLAMA_BASE_URLS
+        if request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}).get("enable", True)
+    ]
+    responses = await asyncio.gather(
+        *[
+            send_get_request(
+                f"{url}/api/ps",
+                request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}).get(
+                    "key", None
+                ),
+            )
+            for url in urls
+        ]
+    )
+    set_loaded_models(request, dict(zip(urls, responses)))
+
+
+def select_ollama_url_idx(request: Request, model: str) -> int:
+    url_idxs = request.app.state.OLLAMA_MODELS[model].get("urls", [])
+    if len(url_idxs) == 1:
+        return url_idxs[0]
+
+    if OLLAMA_LOAD_BALANCER.prefer_loaded:
+        # Refresh the loaded models in the background so selection never waits on it
+        now = time.monotonic()
+        if (
+            now - OLLAMA_LOAD_BALANCER.loaded_models_updated_at
+            > OLLAMA_LOADED_MODELS_TTL
+        ):
+            OLLAMA_LOAD_BALANCER.loaded_models_updated_at = now
+            asyncio.create_task(update_loaded_models(request))
+
+    backends = {}
+    weights = {}
+    for url_idx in url_idxs:
+        url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
+        backend = get_backend_key(url)
+
+        backends.setdefault(backend, url_idx)
+        weights[backend] = request.app.state.config.OLLAMA_API_CONFIGS.get(url, {}).get(
+            "weight", 1
+        )
+
+    return backends[OLLAMA_LOAD_BALANCER.select(list(backends), model, weights)]
+
+
 ##########################################
 #
 # API routes
@@ -185,33 +273,34 @@ async def verify_connection(
     url = form_data.url
     key = form_data.key
 
-    async with aiohttp.ClientSession(
-        timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_OPENAI_MODEL_LIST)
-    ) as session:
-        try:
-            async with session.get(
-                f"{url}/api/version",
-                headers={**({"Authorization": f"Bearer {key}"} if key else {})},
-            ) as r:
-                if r.status != 200:
-                    detail = f"HTTP Error: {r.status}"
-                    res = await r.json()
+    session = UPSTREAM_CLIENTS.get_session(url, trust_env=False)
+    try:
+        async with session.get(
+            f"{url}/api/version",
+            headers={**({"Authorization": f"Bearer {key}"} if key else {})},
+            timeout=aiohttp.ClientTimeout(
+                total=AIOHTTP_CLIENT_TIMEOUT_OPENAI_MODEL_LIST
+            ),
+        ) as r:
+            if r.status != 200:
+                detail = f"HTTP Error: {r.status}"
+                res = await r.json()
 
-                    if "error" in res:
-                        detail = f"External Error: {res['error']}"
-                    raise Exception(detail)
+                if "error" in res:
+                    detail = f"External Error: {res['error']}"
+                raise Exception(detail)
 
-                data = await r.json()
-                return data
-        except aiohttp.ClientError as e:
-            log.exception(f"Client error: {str(e)}")
-            raise HTTPException(
-                status_code=500, detail="Open WebUI: Server Connection Error"
-            )
-        except Exception as e:
-            log.exception(f"Unexpected error: {e}")
-            error_detail = f"Unexpected error: {str(e)}"
-            raise HTTPException(status_code=500, detail=error_detail)
+            data = await r.json()
+            return data
+    except aiohttp.ClientError as e:
+        log.exception(f"Client error: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail="Open WebUI: Server Connection Error"
+        )
+    except Exception as e:
+        log.exception(f"Unexpected error: {e}")
+        error_detail = f"Unexpected error: {str(e)}"
+        raise HTTPException(status_code=500, detail=error_detail)
 
 
 @router.get("/config")
@@ -251,6 +340,11 @@ async def update_config(
     }
 
 
+@router.get("/load_balancer")
+async def get_load_balancer_stats(user=Depends(get_admin_user)):
+    return OLLAMA_LOAD_BALANCER.get_stats()
+
+
 @cached(ttl=3)
 async def get_all_models(request: Request):
     log.info("get_all_models()")
@@ -325,17 +419,14 @@ async def get_all_models(request: Request):
     return models
 
 
-async def get_filtered_models(models, user):
+def get_filtered_models(models, user):
     # Filter models based on user access control
-    filtered_models = []
-    for model in models.get("models", []):
-        model_info = Models.get_model_by_id(model["model"])
-        if model_info:
-            if user.id == model_info.user_id or has_access(
-                user.id, type="read", access_control=model_info.access_control
-            ):
-                filtered_models.append(model)
-    return filtered_models
+    readable_model_ids = Models.get_model_ids_by_user_access(user.id, type="read")
+    return [
+        model
+        for model in models.get("models", [])
+        if model["model"] in readable_model_ids
+    ]
 
 
 @router.get("/api/tags")
@@ -461,8 +552,10 @@ async def get_ollama_loaded_models(request: Request, user=Depends(get_verified_u
             for url in request.app.state.config.OLLAMA_BASE_URLS
         ]
         responses = await asyncio.gather(*request_tasks)
+        responses = dict(zip(request.app.state.config.OLLAMA_BASE_URLS, responses))
 
-        return dict(zip(request.app.state.config.OLLAMA_BASE_URLS, responses))
+        set_loaded_models(request, responses)
+        return responses
     else:
         return {}
 
@@ -487,6 +580,7 @@ async def pull_model(
 
     return await send_post_request(
         url=f"{url}/api/pull",
+        base_url=url,
         payload=json.dumps(payload),
         key=get_api_key(url, request.app.state.config.OLLAMA_API_CONFIGS),
     )
@@ -523,6 +617,7 @@ async def push_model(
 
     return await send_post_request(
         url=f"{url}/api/push",
+        base_url=url,
         payload=form_data.model_dump_json(exclude_none=True).encode(),
         key=get_api_key(url, request.app.state.config.OLLAMA_API_CONFIGS),
     )
@@ -548,6 +643,7 @@ async def create_model(
 
     return await send_post_request(
         url=f"{url}/api/create",
+        base_url=url,
         payload=form_data.model_dump_json(exclude_none=True).encode(),
         key=get_api_key(url, request.app.state.config.OLLAMA_API_CONFIGS),
     )
@@ -681,7 +777,7 @@ async def show_model_info(
             detail=ERROR_MESSAGES.MODEL_NOT_FOUND(form_data.name),
         )
 
-    url_idx = random.choice(models[form_data.name]["urls"])
+    url_idx = select_ollama_url_idx(request, form_data.name)
 
     url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
     key = get_api_key(url, request.app.state.config.OLLAMA_API_CONFIGS)
@@ -745,7 +841,7 @@ async def embed(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url_idx = select_ollama_url_idx(request, model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -814,7 +910,7 @@ async def embeddings(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url_idx = select_ollama_url_idx(request, model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -889,7 +985,7 @@ async def generate_completion(
             model = f"{model}:latest"
 
         if model in models:
-            url_idx = random.choice(models[model]["urls"])
+            url_idx = select_ollama_url_idx(request, model)
         else:
             raise HTTPException(
                 status_code=400,
@@ -905,6 +1001,7 @@ async def generate_completion(
 
     return await send_post_request(
         url=f"{url}/api/generate",
+        base_url=url,
         payload=form_data.model_dump_json(exclude_none=True).encode(),
         key=get_api_key(url, request.app.state.config.OLLAMA_API_CONFIGS),
     )
@@ -934,7 +1031,7 @@ async def get_ollama_url(request: Request, model: str, url_idx: Optional[int] =
                 status_code=400,
                 detail=ERROR_MESSAGES.MODEL_NOT_FOUND(model),
             )
-        url_idx = random.choice(models[model].get("urls", []))
+        url_idx = select_ollama_url_idx(request, model)
     url = request.app.state.config.OLLAMA_BASE_URLS[url_idx]
     return url
 
@@ -1013,6 +1110,7 @@ async def generate_chat_completion(
 
     return await send_post_request(
         url=f"{url}/api/chat",
+        base_url=url,
         payload=json.dumps(payload),
         stream=form_data.stream,
         key=get_api_key(url, request.app.state.config.OLLAMA_API_CONFIGS),
@@ -1113,6 +1211,7 @@ async def generate_openai_completion(
 
     return await send_post_request(
         url=f"{url}/v1/completions",
+        base_url=url,
         payload=json.dumps(payload),
         stream=payload.get("stream", False),
         key=get_api_key(url, request.app.state.config.OLLAMA_API_CONFIGS),
@@ -1186,6 +1285,7 @@ async def generate_openai_chat_completion(
 
     return await send_post_request(
         url=f"{url}/v1/chat/completions",
+        base_url=url,
         payload=json.dumps(payload),
         stream=payload.get("stream", False),
         key=get_api_key(url, request.app.state.config.OLLAMA_API_CONFIGS),
@@ -2,6 +2,7 @@ import asyncio
 import hashlib
 import json
 import logging
+import time
 from pathlib import Path
 from typing import Literal, Optional, overload
 
@@ -25,6 +26,8 @@ from open_webui.env import (
     AIOHTTP_CLIENT_TIMEOUT_OPENAI_MODEL_LIST,
     ENABLE_FORWARD_USER_INFO_HEADERS,
     BYPASS_MODEL_ACCESS_CONTROL,
+    OPENAI_LOAD_BALANCING_STRATEGY,
+    OPENAI_API_MAX_RETRIES,
 )
 
 from open_webui.constants import ERROR_MESSAGES
@@ -38,12 +41,23 @@ from open_webui.utils.payload import (
 
 from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.utils.access_control import has_access
+from open_webui.utils.http_client import (
+    UPSTREAM_CLIENTS,
+    cleanup_response,
+    stream_response_content,
+)
+from open_webui.utils.load_balancer import LoadBalancer
 
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["OPENAI"])
 
 
+# Connections are tracked by base url, so replicas behind different urls on the
+# same host are balanced separately
+OPENAI_LOAD_BALANCER = LoadBalancer(strategy=OPENAI_LOAD_BALANCING_STRATEGY)
+
+
 ##########################################
 #
 # Utility functions
@@ -54,27 +68,19 @@ log.setLevel(SRC_LOG_LEVELS["OPENAI"])
 async def send_get_request(url, key=None):
     timeout = aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_OPENAI_MODEL_LIST)
     try:
-        async with aiohttp.ClientSession(timeout=timeout, trust_env=True) as session:
-            async with session.get(
-                url, headers={**({"Authorization": f"Bearer {key}"} if key else {})}
-            ) as response:
-                return await response.json()
+        session = UPSTREAM_CLIENTS.get_session(url)
+        async with session.get(
+            url,
+            headers={**({"Authorization": f"Bearer {key}"} if key else {})},
+            timeout=timeout,
+        ) as response:
+            return await response.json()
     except Exception as e:
         # Handle connection error here
         log.error(f"Connection error: {e}")
         return None
 
 
-async def cleanup_response(
-    response: Optional[aiohttp.ClientResponse],
-    session: Optional[aiohttp.ClientSession],
-):
-    if response:
-        response.close()
-    if session:
-        await session.close()
-
-
 def openai_o1_handler(payload):
     """
     Handle O1 specific parameters
@@ -245,6 +251,11 @@ async def speech(request: Request, user=Depends(get_verified_user)):
         raise HTTPException(status_code=401, detail=ERROR_MESSAGES.OPENAI_NOT_FOUND)
 
 
+@router.get("/load_balancer")
+async def get_load_balancer_stats(user=Depends(get_admin_user)):
+    return OPENAI_LOAD_BALANCER.get_stats()
+
+
 async def get_all_models_responses(request: Request) -> list:
     if not request.app.state.config.ENABLE_OPENAI_API:
         return []
@@ -324,17 +335,12 @@ async def get_all_models_responses(request: Request) -> list:
     return responses
 
 
-async def get_filtered_models(models, user):
+def get_filtered_models(models, user):
     # Filter models based on user access control
-    filtered_models = []
-    for model in models.get("data", []):
-        model_info = Models.get_model_by_id(model["id"])
-        if model_info:
-            if user.id == model_info.user_id or has_access(
-                user.id, type="read", access_control=model_info.access_control
-            ):
-                filtered_models.append(model)
-    return filtered_models
+    readable_model_ids = Models.get_model_ids_by_user_access(user.id, type="read")
+    return [
+        model for model in models.get("data", []) if model["id"] in readable_model_ids
+    ]
 
 
 @cached(ttl=3)
@@ -355,23 +361,15 @@ async def get_all_models(request: Request) -> dict[str, list]:
 
     def merge_models_lists(model_lists):
         log.debug(f"merge_models_lists {model_lists}")
-        merged_list = []
+        merged_models = {}
 
         for idx, models in enumerate(model_lists):
             if models is not None and "error" not in models:
-                merged_list.extend(
-                    [
-                        {
-                            **model,
-                            "name": model.get("name", model["id"]),
-                            "owned_by": "openai",
-                            "openai": model,
-                            "urlIdx": idx,
-                        }
-                        for model in models
-                        if "api.openai.com"
-                        not in request.app.state.config.OPENAI_API_BASE_URLS[idx]
-                        or not any(
+                for model in models:
+                    if (
+                        "api.openai.com"
+                        in request.app.state.config.OPENAI_API_BASE_URLS[idx]
+                        and any(
                             name in model["id"]
                             for name in [
                                 "babbage",
@@ -382,10 +380,24 @@ async def get_all_models(request: Request) -> dict[str, list]:
                                 "whisper",
                             ]
                         )
-                    ]
-                )
+                    ):
+                        continue
+
+                    # The same model id served by several connections is merged
+                    # into one entry; requests are balanced across "urlIdxs"
+                    if model["id"] in merged_models:
+                        merged_models[model["id"]]["urlIdxs"].append(idx)
+                    else:
+                        merged_models[model["id"]] = {
+                            **model,
+                            "name": model.get("name", model["id"]),
+                            "owned_by": "openai",
+                            "openai": model,
+                            "urlIdx": idx,
+                            "urlIdxs": [idx],
+                        }
 
-        return merged_list
+        return list(merged_models.values())
 
     models = {"data": merge_models_lists(map(extract_data, responses))}
     log.debug(f"models: {models}")
@@ -410,98 +422,27 @@ async def get_models(
         key = request.app.state.config.OPENAI_API_KEYS[url_idx]
 
         r = None
-        async with aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(
-                total=AIOHTTP_CLIENT_TIMEOUT_OPENAI_MODEL_LIST
-            )
-        ) as session:
-            try:
-                async with session.get(
-                    f"{url}/models",
-                    headers={
-                        "Authorization": f"Bearer {key}",
-                        "Content-Type": "application/json",
-                        **(
-                            {
-                                "X-OpenWebUI-User-Name": user.name,
-                                "X-OpenWebUI-User-Id": user.id,
-                                "X-OpenWebUI-User-Email": user.email,
-                                "X-OpenWebUI-User-Role": user.role,
-                            }
-                            if ENABLE_FORWARD_USER_INFO_HEADERS
-                            else {}
-                        ),
-                    },
-                ) as r:
-                    if r.status != 200:
-                        # Extract response error details if available
-                        error_detail = f"HTTP Error: {r.status}"
-                        res = await r.json()
-                        if "error" in res:
-                            error_detail = f"External Error: {res['error']}"
-                        raise Exception(error_detail)
-
-                    response_data = await r.json()
-
-                    # Check if we're calling OpenAI API based on the URL
-                    if "api.openai.com" in url:
-                        # Filter models according to the specified conditions
-                        response_data["data"] = [
-                            model
-                            for model in response_data.get("data", [])
-                            if not any(
-                                name in model["id"]
-                                for name in [
-                                    "babbage",
-                                    "dall-e",
-                                    "davinci",
-                                    "embedding",
-                                    "tts",
-                                    "whisper",
-                                ]
-                            )
-                        ]
-
-                    models = response_data
-            except aiohttp.ClientError as e:
-                # ClientError covers all aiohttp requests issues
-                log.exception(f"Client error: {str(e)}")
-                raise HTTPException(
-                    status_code=500, detail="Open WebUI: Server Connection Error"
-                )
-            except Exception as e:
-                log.exception(f"Unexpected error: {e}")
-                error_detail = f"Unexpected error: {str(e)}"
-                raise HTTPException(status_code=500, detail=error_detail)
-
-    if user.role == "user" and not BYPASS_MODEL_ACCESS_CONTROL:
-        models["data"] = get_filtered_models(models, user)
-
-    return models
-
-
-class ConnectionVerificationForm(BaseModel):
-    url: str
-    key: str
-
-
-@router.post("/verify")
-async def verify_connection(
-    form_data: ConnectionVerificationForm, user=Depends(get_admin_user)
-):
-    url = form_data.url
-    key = form_data.key
-
-    async with aiohttp.ClientSession(
-        timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT_OPENAI_MODEL_LIST)
-    ) as session:
+        session = UPSTREAM_CLIENTS.get_session(url, trust_env=False)
         try:
             async with session.get(
                 f"{url}/models",
                 headers={
                     "Authorization": f"Bearer {key}",
                     "Content-Type": "application/json",
+                    **(
+                        {
+                            "X-OpenWebUI-User-Name": user.name,
+                            "X-OpenWebUI-User-Id": user.id,
+                            "X-OpenWebUI-User-Email": user.email,
+                            "X-OpenWebUI-User-Role": user.role,
+                        }
+                        if ENABLE_FORWARD_USER_INFO_HEADERS
+                        else {}
+                    ),
                 },
+                timeout=aiohttp.ClientTimeout(
+                    total=AIOHTTP_CLIENT_TIMEOUT_OPENAI_MODEL_LIST
+                ),
             ) as r:
                 if r.status != 200:
                     # Extract response error details if available
@@ -512,8 +453,27 @@ async def verify_connection(
                     raise Exception(error_detail)
 
                 response_data = await r.json()
-                return response_data
 
+                # Check if we're calling OpenAI API based on the URL
+                if "api.openai.com" in url:
+                    # Filter models according to the specified conditions
+                    response_data["data"] = [
+                        model
+                        for model in response_data.get("data", [])
+                        if not any(
+                            name in model["id"]
+                            for name in [
+                                "babbage",
+                                "dall-e",
+                                "davinci",
+                                "embedding",
+                                "tts",
+                                "whisper",
+                            ]
+                        )
+                    ]
+
+                models = response_data
         except aiohttp.ClientError as e:
             # ClientError covers all aiohttp requests issues
             log.exception(f"Client error: {str(e)}")
@@ -525,6 +485,58 @@ async def verify_connection(
             error_detail = f"Unexpected error: {str(e)}"
             raise HTTPException(status_code=500, detail=error_detail)
 
+    if user.role == "user" and not BYPASS_MODEL_ACCESS_CONTROL:
+        models["data"] = get_filtered_models(models, user)
+
+    return models
+
+
+class ConnectionVerificationForm(BaseModel):
+    url: str
+    key: str
+
+
+@router.post("/verify")
+async def verify_connection(
+    form_data: ConnectionVerificationForm, user=Depends(get_admin_user)
+):
+    url = form_data.url
+    key = form_data.key
+
+    session = UPSTREAM_CLIENTS.get_session(url, trust_env=False)
+    try:
+        async with session.get(
+            f"{url}/models",
+            headers={
+                "Authorization": f"Bearer {key}",
+                "Content-Type": "application/json",
+            },
+            timeout=aiohttp.ClientTimeout(
+                total=AIOHTTP_CLIENT_TIMEOUT_OPENAI_MODEL_LIST
+            ),
+        ) as r:
+            if r.status != 200:
+                # Extract response error details if available
+                error_detail = f"HTTP Error: {r.status}"
+                res = await r.json()
+                if "error" in res:
+                    error_detail = f"External Error: {res['error']}"
+                raise Exception(error_detail)
+
+            response_data = await r.json()
+            return response_data
+
+    except aiohttp.ClientError as e:
+        # ClientError covers all aiohttp requests issues
+        log.exception(f"Client error: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail="Open WebUI: Server Connection Error"
+        )
+    except Exception as e:
+        log.exception(f"Unexpected error: {e}")
+        error_detail = f"Unexpected error: {str(e)}"
+        raise HTTPException(status_code=500, detail=error_detail)
+
 
 @router.post("/chat/completions")
 async def generate_chat_completion(
@@ -536,7 +548,6 @@ async def generate_chat_completion(
     if BYPASS_MODEL_ACCESS_CONTROL:
         bypass_filter = True
 
-    idx = 0
     payload = {**form_data}
     if "metadata" in payload:
         del payload["metadata"]
@@ -574,23 +585,12 @@ async def generate_chat_completion(
             )
 
     model = request.app.state.OPENAI_MODELS.get(model_id)
-    if model:
-        idx = model["urlIdx"]
-    else:
+    if not model:
         raise HTTPException(
             status_code=404,
             detail="Model not found",
         )
 
-    # Get the API config for the model
-    api_config = request.app.state.config.OPENAI_API_CONFIGS.get(
-        request.app.state.config.OPENAI_API_BASE_URLS[idx], {}
-    )
-
-    prefix_id = api_config.get("prefix_id", None)
-    if prefix_id:
-        payload["model"] = payload["model"].replace(f"{prefix_id}.", "")
-
     # Add user info to the payload if the model is a pipeline
     if "pipeline" in model and model.get("pipeline"):
         payload["user"] = {
@@ -600,9 +600,66 @@ async def generate_chat_completion(
             "role": user.role,
         }
 
+    url_idxs = model.get("urlIdxs", [model["urlIdx"]])
+    attempts = min(len(url_idxs), OPENAI_API_MAX_RETRIES + 1)
+
+    tried_idxs = []
+    while True:
+        idx = select_openai_url_idx(
+            request, [idx for idx in url_idxs if idx not in tried_idxs]
+        )
+        tried_idxs.append(idx)
+
+        try:
+            return await send_chat_completion_request(request, idx, payload, user)
+        except aiohttp.ClientConnectionError as e:
+            # Nothing has been sent to the client yet, so the request can be retried
+            # on another connection. Streamed requests are only retried when the
+            # connection could not be opened at all.
+            if len(tried_idxs) >= attempts or (
+                payload.get("stream")
+                and not isinstance(e, aiohttp.ClientConnectorError)
+            ):
+                log.exception(e)
+                raise HTTPException(
+                    status_code=500, detail="Open WebUI: Server Connection Error"
+                )
+
+            log.warning(
+                f"Connection to {request.app.state.config.OPENAI_API_BASE_URLS[idx]} failed, retrying: {e}"
+            )
+
+
+def select_openai_url_idx(request: Request, url_idxs: list[int]) -> int:
+    if len(url_idxs) == 1:
+        return url_idxs[0]
+
+    backends = {}
+    weights = {}
+    for url_idx in url_idxs:
+        url = request.app.state.config.OPENAI_API_BASE_URLS[url_idx]
+
+        backends.setdefault(url, url_idx)
+        weights[url] = request.app.state.config.OPENAI_API_CONFIGS.get(url, {}).get(
+            "weight", 1
+        )
+
+    return backends[OPENAI_LOAD_BALANCER.select(list(backends), weights=weights)]
+
+
+async def send_chat_completion_request(request: Request, idx: int, payload: dict, user):
     url = request.app.state.config.OPENAI_API_BASE_URLS[idx]
     key = request.app.state.config.OPENAI_API_KEYS[idx]
 
+    # Get the API config for the model
+    api_config = request.app.state.config.OPENAI_API_CONFIGS.get(url, {})
+
+    payload = {**payload}
+
+    prefix_id = api_config.get("prefix_id", None)
+    if prefix_id:
+        payload["model"] = payload["model"].replace(f"{prefix_id}.", "")
+
     # Fix: O1 does not support the "max_tokens" parameter, Modify "max_tokens" to "max_completion_tokens"
     is_o1 = payload["model"].lower().startswith("o1-")
     if is_o1:
@@ -619,20 +676,20 @@ async def generate_chat_completion(
     # Convert the modified body back to JSON
     payload = json.dumps(payload)
 
+    start = OPENAI_LOAD_BALANCER.acquire(url)
+
     r = None
-    session = None
     streaming = False
     response = None
 
     try:
-        session = aiohttp.ClientSession(
-            trust_env=True, timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT)
-        )
+        session = UPSTREAM_CLIENTS.get_session(url)
 
         r = await session.request(
             method="POST",
             url=f"{url}/chat/completions",
             data=payload,
+            timeout=aiohttp.ClientTimeout(total=AIOHTTP_CLIENT_TIMEOUT),
             headers={
                 "Authorization": f"Bearer {key}",
                 "Content-Type": "application/json",
@@ -657,16 +714,18 @@ async def generate_chat_completion(
             },
         )
 
+        if r.status >= 500:
+            OPENAI_LOAD_BALANCER.record_failure(url)
+        else:
+            OPENAI_LOAD_BALANCER.record_success(url, time.monotonic() - start)
+
         # Check if response is SSE
         if "text/event-stream" in r.headers.get("Content-Type", ""):
             streaming = True
             return StreamingResponse(
-                r.content,
+                stream_response_content(r, lambda: OPENAI_LOAD_BALANCER.release(url)),
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
             )
         else:
             try:
@@ -678,6 +737,11 @@ async def generate_chat_completion(
             r.raise_for_status()
             return response
     except Exception as e:
+        if r is None:
+            OPENAI_LOAD_BALANCER.record_failure(url)
+            if isinstance(e, aiohttp.ClientConnectionError):
+                raise
+
         log.exception(e)
 
         detail = None
@@ -692,10 +756,9 @@ async def generate_chat_completion(
             detail=detail if detail else "Open WebUI: Server Connection Error",
         )
     finally:
-        if not streaming and session:
-            if r:
-                r.close()
-            await session.close()
+        if not streaming:
+            await cleanup_response(r)
+            OPENAI_LOAD_BALANCER.release(url)
 
 
 @router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
@@ -711,11 +774,10 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
     key = request.app.state.config.OPENAI_API_KEYS[idx]
 
     r = None
-    session = None
     streaming = False
 
     try:
-        session = aiohttp.ClientSession(trust_env=True)
+        session = UPSTREAM_CLIENTS.get_session(url)
         r = await session.request(
             method=request.method,
             url=f"{url}/{path}",
@@ -744,9 +806,7 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
                 r.content,
                 status_code=r.status,
                 headers=dict(r.headers),
-                background=BackgroundTask(
-                    cleanup_response, response=r, session=session
-                ),
+                background=BackgroundTask(cleanup_response, response=r),
             )
         else:
             response_data = await r.json()
@@ -769,7 +829,5 @@ async def proxy(path: str, request: Request, user=Depends(get_verified_user)):
             detail=detail if detail else "Open WebUI: Server Connection Error",
         )
     finally:
-        if not streaming and session:
-            if r:
-                r.close()
-            await session.close()
+        if not streaming:
+            await cleanup_response(r)
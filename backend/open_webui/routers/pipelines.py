@@ -10,14 +10,20 @@ from fastapi import (
     APIRouter,
 )
 import os
+import asyncio
 import logging
 import shutil
+import aiohttp
 import requests
 from pydantic import BaseModel
 from starlette.responses import FileResponse
 from typing import Optional
 
-from open_webui.env import SRC_LOG_LEVELS
+from open_webui.env import (
+    ENABLE_PIPELINE_FILTER_CACHE,
+    PIPELINE_FILTER_TIMEOUT,
+    SRC_LOG_LEVELS,
+)
 from open_webui.config import CACHE_DIR
 from open_webui.constants import ERROR_MESSAGES
 
@@ -25,6 +31,7 @@ from open_webui.constants import ERROR_MESSAGES
 from open_webui.routers.openai import get_all_models_responses
 
 from open_webui.utils.auth import get_admin_user
+from open_webui.utils.http_client import UPSTREAM_CLIENTS
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MAIN"])
@@ -56,96 +63,132 @@ def get_sorted_filters(model_id, models):
     return sorted_filters
 
 
-def process_pipeline_inlet_filter(request, payload, user, models):
+class PipelineFilterCache:
+    """
+    Sorted pipelines filters of each model. The cache is tied to the models
+    dict it was resolved from, which is replaced whenever the model list
+    changes, so a new model list drops it.
+    """
+
+    def __init__(self):
+        self.models: Optional[dict] = None
+        self.filters: dict[str, list[dict]] = {}
+
+    def get(self, model_id: str, models: dict) -> list[dict]:
+        if not ENABLE_PIPELINE_FILTER_CACHE:
+            return get_sorted_filters(model_id, models)
+
+        if models is not self.models:
+            self.models = models
+            self.filters = {}
+
+        if model_id not in self.filters:
+            self.filters[model_id] = get_sorted_filters(model_id, models)
+        return self.filters[model_id]
+
+
+PIPELINE_FILTERS = PipelineFilterCache()
+
+
+class PipelineFilterError(Exception):
+    def __init__(self, status: int, res: dict):
+        super().__init__(status, res)
+        self.status = status
+        self.res = res
+
+
+async def post_pipeline_filter(
+    request, filter: dict, action: str, user: dict, payload: dict
+) -> Optional[dict]:
+    # Returns the filtered payload, or None if the filter was skipped
+    urlIdx = filter["urlIdx"]
+
+    url = request.app.state.config.OPENAI_API_BASE_URLS[urlIdx]
+    key = request.app.state.config.OPENAI_API_KEYS[urlIdx]
+
+    if key == "":
+        return None
+
+    try:
+        session = UPSTREAM_CLIENTS.get_session(url)
+        async with session.post(
+            f"{url}/{filter['id']}/filter/{action}",
+            headers={"Authorization": f"Bearer {key}"},
+            json={
+                "user": user,
+                "body": payload,
+            },
+            timeout=aiohttp.ClientTimeout(total=PIPELINE_FILTER_TIMEOUT),
+        ) as r:
+            if r.ok:
+                return await r.json()
+
+            try:
+                res = await r.json()
+            except Exception:
+                res = {}
+            raise PipelineFilterError(r.status, res)
+    except PipelineFilterError:
+        raise
+    except asyncio.TimeoutError:
+        log.warning(
+            f"Pipeline filter {filter['id']} {action} timed out after {PIPELINE_FILTER_TIMEOUT}s"
+        )
+    except Exception as e:
+        # Handle connection error here
+        print(f"Connection error: {e}")
+    return None
+
+
+async def process_pipeline_inlet_filter(request, payload, user, models):
     user = {"id": user.id, "email": user.email, "name": user.name, "role": user.role}
     model_id = payload["model"]
 
-    sorted_filters = get_sorted_filters(model_id, models)
+    sorted_filters = PIPELINE_FILTERS.get(model_id, models)
     model = models[model_id]
 
     if "pipeline" in model:
-        sorted_filters.append(model)
+        sorted_filters = sorted_filters + [model]
 
+    # Each filter receives the payload returned by the previous one
     for filter in sorted_filters:
-        r = None
         try:
-            urlIdx = filter["urlIdx"]
-
-            url = request.app.state.config.OPENAI_API_BASE_URLS[urlIdx]
-            key = request.app.state.config.OPENAI_API_KEYS[urlIdx]
-
-            if key == "":
-                continue
-
-            headers = {"Authorization": f"Bearer {key}"}
-            r = requests.post(
-                f"{url}/{filter['id']}/filter/inlet",
-                headers=headers,
-                json={
-                    "user": user,
-                    "body": payload,
-                },
-            )
-
-            r.raise_for_status()
-            payload = r.json()
-        except Exception as e:
-            # Handle connection error here
+            result = await post_pipeline_filter(request, filter, "inlet", user, payload)
+        except PipelineFilterError as e:
             print(f"Connection error: {e}")
+            if "detail" in e.res:
+                raise Exception(e.status, e.res["detail"])
+            continue
 
-            if r is not None:
-                res = r.json()
-                if "detail" in res:
-                    raise Exception(r.status_code, res["detail"])
+        if result is not None:
+            payload = result
 
     return payload
 
 
-def process_pipeline_outlet_filter(request, payload, user, models):
+async def process_pipeline_outlet_filter(request, payload, user, models):
     user = {"id": user.id, "email": user.email, "name": user.name, "role": user.role}
     model_id = payload["model"]
 
-    sorted_filters = get_sorted_filters(model_id, models)
+    sorted_filters = PIPELINE_FILTERS.get(model_id, models)
     model = models[model_id]
 
     if "pipeline" in model:
         sorted_filters = [model] + sorted_filters
 
     for filter in sorted_filters:
-        r = None
         try:
-            urlIdx = filter["urlIdx"]
-
-            url = request.app.state.config.OPENAI_API_BASE_URLS[urlIdx]
-            key = request.app.state.config.OPENAI_API_KEYS[urlIdx]
-
-            if key != "":
-                r = requests.post(
-                    f"{url}/{filter['id']}/filter/outlet",
-                    headers={"Authorization": f"Bearer {key}"},
-                    json={
-                        "user": user,
-                        "body": payload,
-                    },
-                )
-
-                r.raise_for_status()
-                data = r.json()
-                payload = data
-        except Exception as e:
-            # Handle connection error here
+            result = await post_pipeline_filter(
+                request, filter, "outlet", user, payload
+            )
+        except PipelineFilterError as e:
             print(f"Connection error: {e}")
+            if "detail" in e.res:
+                return Exception(e.status, e.res)
+            continue
 
-            if r is not None:
-                try:
-                    res = r.json()
-                    if "detail" in res:
-                        return Exception(r.status_code, res)
-                except Exception:
-                    pass
-
-            else:
-                pass
+        if result is not None:
+            payload = result
 
     return payload
 
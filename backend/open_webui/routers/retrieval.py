@@ -1,13 +1,18 @@
+import asyncio
+import hashlib
+import itertools
 import json
 import logging
 import mimetypes
 import os
+import queue
 import shutil
+import threading
 
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Iterator, List, Optional, Sequence, Union
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Union
 
 from fastapi import (
     Depends,
@@ -29,11 +34,16 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter, TokenTextSpl
 from langchain_core.documents import Document
 
 from open_webui.models.files import FileModel, Files
+from open_webui.models.jobs import IngestionJobs
 from open_webui.models.knowledge import Knowledges
 from open_webui.storage.provider import Storage
 
 
 from open_webui.retrieval.vector.connector import VECTOR_DB_CLIENT
+from open_webui.retrieval.bm25 import BM25_INDEX
+from open_webui.retrieval.embedding_cache import EMBEDDING_CACHE
+from open_webui.retrieval.embedding_client import EMBEDDING_CLIENT
+from open_webui.retrieval.ingestion import report_progress
 
 # Document loaders
 from open_webui.retrieval.loaders.main import Loader
@@ -59,6 +69,7 @@ from open_webui.retrieval.web.bing import search_bing
 
 from open_webui.retrieval.utils import (
     get_embedding_function,
+    get_async_embedding_function,
     get_model_path,
     query_collection,
     query_collection_with_hybrid_search,
@@ -79,6 +90,8 @@ from open_webui.config import (
     RAG_RERANKING_MODEL_TRUST_REMOTE_CODE,
     UPLOAD_DIR,
     DEFAULT_LOCALE,
+    RAG_INGESTION_WINDOW_SIZE,
+    RAG_INGESTION_MAX_BUFFERED_WINDOWS,
 )
 from open_webui.env import (
     SRC_LOG_LEVELS,
@@ -205,6 +218,22 @@ async def get_embedding_config(request: Request, user=Depends(get_admin_user)):
     }
 
 
+@router.get("/embedding/cache")
+async def get_embedding_cache_stats(user=Depends(get_admin_user)):
+    return EMBEDDING_CACHE.get_stats()
+
+
+@router.get("/embedding/client")
+async def get_embedding_client_stats(user=Depends(get_admin_user)):
+    return EMBEDDING_CLIENT.get_stats()
+
+
+@router.post("/embedding/cache/reset")
+async def reset_embedding_cache(user=Depends(get_admin_user)):
+    await asyncio.to_thread(EMBEDDING_CACHE.clear)
+    return EMBEDDING_CACHE.get_stats()
+
+
 @router.get("/reranking")
 async def get_reraanking_config(request: Request, user=Depends(get_admin_user)):
     return {
@@ -285,6 +314,23 @@ async def update_embedding_config(
             request.app.state.config.RAG_EMBEDDING_BATCH_SIZE,
         )
 
+        request.app.state.ASYNC_EMBEDDING_FUNCTION = get_async_embedding_function(
+            request.app.state.config.RAG_EMBEDDING_ENGINE,
+            request.app.state.config.RAG_EMBEDDING_MODEL,
+            request.app.state.ef,
+            (
+                request.app.state.config.RAG_OPENAI_API_BASE_URL
+                if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
+                else request.app.state.config.RAG_OLLAMA_BASE_URL
+            ),
+            (
+                request.app.state.config.RAG_OPENAI_API_KEY
+                if request.app.state.config.RAG_EMBEDDING_ENGINE == "openai"
+                else request.app.state.config.RAG_OLLAMA_API_KEY
+            ),
+            request.app.state.config.RAG_EMBEDDING_BATCH_SIZE,
+        )
+
         return {
             "status": True,
             "embedding_engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
@@ -652,6 +698,78 @@ async def update_query_settings(
 ####################################
 
 
+def run_windowed_pipeline(
+    items: Iterator,
+    window_size: int,
+    max_buffered_windows: int,
+    stages: list[Callable[[Any], Any]],
+):
+    """
+    Groups `items` into windows and passes each window through `stages`, each on
+    its own thread, so the next window is split and embedded while the previous
+    ones are being inserted. Every stage gets the result of the previous one.
+
+    The queues between the stages hold at most `max_buffered_windows` windows
+    each, so a slow stage blocks the ones before it instead of buffering the
+    whole document in memory. The first error stops the pipeline and is raised.
+    """
+    queues = [queue.Queue(maxsize=max_buffered_windows) for _ in stages]
+    errors = []
+    failed = threading.Event()
+
+    def run_stage(source: queue.Queue, target: Optional[queue.Queue], fn):
+        while True:
+            window = source.get()
+            if window is None:
+                break
+            # Keep draining after a failure so upstream stages never block
+            if failed.is_set():
+                continue
+            try:
+                result = fn(window)
+                if target is not None:
+                    target.put(result)
+            except Exception as e:
+                errors.append(e)
+                failed.set()
+
+        if target is not None:
+            target.put(None)
+
+    workers = [
+        threading.Thread(
+            target=run_stage,
+            args=(queues[idx], queues[idx + 1] if idx + 1 < len(queues) else None, fn),
+        )
+        for idx, fn in enumerate(stages)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        window = []
+        for item in items:
+            if failed.is_set():
+                break
+            window.append(item)
+            if len(window) >= window_size:
+                queues[0].put(window)
+                window = []
+
+        if window and not failed.is_set():
+            queues[0].put(window)
+    except Exception as e:
+        errors.append(e)
+        failed.set()
+    finally:
+        queues[0].put(None)
+        for worker in workers:
+            worker.join()
+
+    if errors:
+        raise errors[0]
+
+
 def save_docs_to_vector_db(
     request: Request,
     docs,
@@ -661,6 +779,12 @@ def save_docs_to_vector_db(
     split: bool = True,
     add: bool = False,
 ) -> bool:
+    """
+    Splits, embeds and inserts `docs` (a list or any iterable of documents, e.g.
+    Loader.lazy_load) in windows of RAG_INGESTION_WINDOW_SIZE chunks, so memory
+    stays bounded by the window size rather than the document size.
+    """
+
     def _get_docs_info(docs: list[Document]) -> str:
         docs_info = set()
 
@@ -678,11 +802,12 @@ def save_docs_to_vector_db(
         return ", ".join(docs_info)
 
     log.info(
-        f"save_docs_to_vector_db: document {_get_docs_info(docs)} {collection_name}"
+        f"save_docs_to_vector_db: document {_get_docs_info(docs) if isinstance(docs, list) else ''} {collection_name}"
     )
 
-    # Check if entries with the same hash (metadata.hash) already exist
-    if metadata and "hash" in metadata:
+    # Check if entries with the same hash (metadata.hash) already exist; an
+    # overwrite replaces them, so saving unchanged content again is allowed
+    if metadata and "hash" in metadata and not overwrite:
         result = VECTOR_DB_CLIENT.query(
             collection_name=collection_name,
             filter={"hash": metadata["hash"]},
@@ -716,39 +841,50 @@ def save_docs_to_vector_db(
         else:
             raise ValueError(ERROR_MESSAGES.DEFAULT("Invalid text splitter"))
 
-        docs = text_splitter.split_documents(docs)
+    total = len(docs) if isinstance(docs, list) else None
 
-    if len(docs) == 0:
+    def get_chunks():
+        # Documents are split one at a time, which gives the same chunks as
+        # splitting the whole list at once
+        for idx, doc in enumerate(docs):
+            yield from text_splitter.split_documents([doc]) if split else [doc]
+            if total:
+                report_progress(0.4 + 0.6 * (idx + 1) / total, "embedding")
+
+    chunks = get_chunks()
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
         raise ValueError(ERROR_MESSAGES.EMPTY_CONTENT)
 
-    texts = [doc.page_content for doc in docs]
-    metadatas = [
+    embedding_config = json.dumps(
         {
+            "engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
+            "model": request.app.state.config.RAG_EMBEDDING_MODEL,
+        }
+    )
+
+    def get_metadata(doc: Document) -> dict:
+        doc_metadata = {
             **doc.metadata,
             **(metadata if metadata else {}),
-            "embedding_config": json.dumps(
-                {
-                    "engine": request.app.state.config.RAG_EMBEDDING_ENGINE,
-                    "model": request.app.state.config.RAG_EMBEDDING_MODEL,
-                }
-            ),
+            "embedding_config": embedding_config,
         }
-        for doc in docs
-    ]
 
-    # ChromaDB does not like datetime formats
-    # for meta-data so convert them to string.
-    for metadata in metadatas:
-        for key, value in metadata.items():
+        # ChromaDB does not like datetime formats
+        # for meta-data so convert them to string.
+        for key, value in doc_metadata.items():
             if isinstance(value, datetime):
-                metadata[key] = str(value)
+                doc_metadata[key] = str(value)
+        return doc_metadata
 
+    inserted_ids = []
     try:
         if VECTOR_DB_CLIENT.has_collection(collection_name=collection_name):
             log.info(f"collection {collection_name} already exists")
 
             if overwrite:
                 VECTOR_DB_CLIENT.delete_collection(collection_name=collection_name)
+                BM25_INDEX.delete_collection(collection_name=collection_name)
                 log.info(f"deleting existing collection {collection_name}")
             elif add is False:
                 log.info(
@@ -774,28 +910,66 @@ def save_docs_to_vector_db(
             request.app.state.config.RAG_EMBEDDING_BATCH_SIZE,
         )
 
-        embeddings = embedding_function(
-            list(map(lambda x: x.replace("\n", " "), texts))
-        )
+        # Chunks with the same text as chunks of another file, collection or an
+        # earlier version of the document are served by the embedding cache
+        def embed(window: list[Document]) -> list[dict]:
+            texts = [doc.page_content for doc in window]
+            embeddings = embedding_function(
+                list(map(lambda x: x.replace("\n", " "), texts))
+            )
 
-        items = [
-            {
-                "id": str(uuid.uuid4()),
-                "text": text,
-                "vector": embeddings[idx],
-                "metadata": metadatas[idx],
-            }
-            for idx, text in enumerate(texts)
-        ]
-
-        VECTOR_DB_CLIENT.insert(
-            collection_name=collection_name,
-            items=items,
+            return [
+                {
+                    "id": str(uuid.uuid4()),
+                    "text": text,
+                    "vector": embeddings[idx],
+                    "metadata": get_metadata(window[idx]),
+                }
+                for idx, text in enumerate(texts)
+            ]
+
+        def insert(items: list[dict]) -> list[dict]:
+            VECTOR_DB_CLIENT.insert(
+                collection_name=collection_name,
+                items=items,
+            )
+            inserted_ids.extend(item["id"] for item in items)
+            return items
+
+        def index(items: list[dict]):
+            # Creates the index with the first window of a new collection, and
+            # builds it from the vector DB if it is missing or outdated
+            BM25_INDEX.add(
+                collection_name=collection_name,
+                ids=[item["id"] for item in items],
+                texts=[item["text"] for item in items],
+                metadatas=[item["metadata"] for item in items],
+                loader=lambda collection_name: VECTOR_DB_CLIENT.get(
+                    collection_name=collection_name
+                ),
+            )
+
+        run_windowed_pipeline(
+            itertools.chain([first_chunk], chunks),
+            window_size=RAG_INGESTION_WINDOW_SIZE,
+            max_buffered_windows=RAG_INGESTION_MAX_BUFFERED_WINDOWS,
+            stages=[embed, insert, index],
         )
 
+        log.info(f"saved {len(inserted_ids)} chunks to {collection_name}")
         return True
     except Exception as e:
         log.exception(e)
+
+        # Do not leave a partially indexed document behind
+        if inserted_ids:
+            try:
+                VECTOR_DB_CLIENT.delete(
+                    collection_name=collection_name, ids=inserted_ids
+                )
+                BM25_INDEX.delete(collection_name=collection_name, ids=inserted_ids)
+            except Exception as cleanup_error:
+                log.warning(f"Error removing partially indexed chunks: {cleanup_error}")
         raise e
 
 
@@ -819,11 +993,18 @@ def process_file(
         if collection_name is None:
             collection_name = f"file-{file.id}"
 
+        overwrite = False
         if form_data.content:
             # Update the content in the file
             # Usage: /files/{file_id}/data/content/update
 
-            VECTOR_DB_CLIENT.delete_collection(collection_name=f"file-{file.id}")
+            if collection_name == f"file-{file.id}":
+                # Replaced in save_docs_to_vector_db; chunks that did not change
+                # are not embedded again (see EMBEDDING_CACHE)
+                overwrite = True
+            else:
+                VECTOR_DB_CLIENT.delete_collection(collection_name=f"file-{file.id}")
+                BM25_INDEX.delete_collection(collection_name=f"file-{file.id}")
 
             docs = [
                 Document(
@@ -843,6 +1024,11 @@ def process_file(
             # Check if the file has already been processed and save the content
             # Usage: /knowledge/{id}/file/add, /knowledge/{id}/file/update
 
+            # Files uploaded for background processing can be added once their
+            # job is done; don't hold a request thread waiting for it
+            if IngestionJobs.get_unfinished_jobs_by_file_ids([file.id]):
+                raise ValueError(f"File {file.id} is still being processed")
+
             result = VECTOR_DB_CLIENT.query(
                 collection_name=f"file-{file.id}", filter={"file_id": file.id}
             )
@@ -881,23 +1067,37 @@ def process_file(
                     TIKA_SERVER_URL=request.app.state.config.TIKA_SERVER_URL,
                     PDF_EXTRACT_IMAGES=request.app.state.config.PDF_EXTRACT_IMAGES,
                 )
-                docs = loader.load(
-                    file.filename, file.meta.get("content_type"), file_path
-                )
 
-                docs = [
-                    Document(
-                        page_content=doc.page_content,
-                        metadata={
-                            **doc.metadata,
-                            "name": file.filename,
-                            "created_by": file.user_id,
-                            "file_id": file.id,
-                            "source": file.filename,
-                        },
-                    )
-                    for doc in docs
-                ]
+                # Documents are split and embedded as they are parsed; the content
+                # and its hash are only known once the whole file was read
+                text_parts = []
+                sha256_hash = hashlib.sha256()
+
+                def get_docs():
+                    for doc in loader.lazy_load(
+                        file.filename, file.meta.get("content_type"), file_path
+                    ):
+                        # Same as hashing the space separated content
+                        sha256_hash.update(
+                            f"{' ' if text_parts else ''}{doc.page_content}".encode(
+                                "utf-8"
+                            )
+                        )
+                        text_parts.append(doc.page_content)
+
+                        yield Document(
+                            page_content=doc.page_content,
+                            metadata={
+                                **doc.metadata,
+                                "name": file.filename,
+                                "created_by": file.user_id,
+                                "file_id": file.id,
+                                "source": file.filename,
+                            },
+                        )
+
+                docs = get_docs()
+                text_content = None
             else:
                 docs = [
                     Document(
@@ -911,30 +1111,45 @@ def process_file(
                         },
                     )
                 ]
-            text_content = " ".join([doc.page_content for doc in docs])
+                text_content = " ".join([doc.page_content for doc in docs])
 
-        log.debug(f"text_content: {text_content}")
-        Files.update_file_data_by_id(
-            file.id,
-            {"content": text_content},
-        )
+        report_progress(0.4, "embedding")
 
-        hash = calculate_sha256_string(text_content)
-        Files.update_file_hash_by_id(file.id, hash)
+        metadata = {"file_id": file.id, "name": file.filename}
+        if text_content is not None:
+            log.debug(f"text_content: {text_content}")
+            Files.update_file_data_by_id(
+                file.id,
+                {"content": text_content},
+            )
+
+            hash = calculate_sha256_string(text_content)
+            Files.update_file_hash_by_id(file.id, hash)
+            metadata["hash"] = hash
 
         try:
             result = save_docs_to_vector_db(
                 request,
                 docs=docs,
                 collection_name=collection_name,
-                metadata={
-                    "file_id": file.id,
-                    "name": file.filename,
-                    "hash": hash,
-                },
+                metadata=metadata,
+                overwrite=overwrite,
                 add=(True if form_data.collection_name else False),
             )
 
+            if text_content is None:
+                # The collection may have been kept without reading every document
+                for _ in docs:
+                    pass
+
+                text_content = " ".join(text_parts)
+                log.debug(f"text_content: {text_content}")
+                Files.update_file_data_by_id(
+                    file.id,
+                    {"content": text_content},
+                )
+                Files.update_file_hash_by_id(file.id, sha256_hash.hexdigest())
+
             if result:
                 Files.update_file_metadata_by_id(
                     file.id,
@@ -1396,6 +1611,10 @@ def delete_entries_from_collection(form_data: DeleteForm, user=Depends(get_admin
                 collection_name=form_data.collection_name,
                 metadata={"hash": hash},
             )
+            BM25_INDEX.delete(
+                collection_name=form_data.collection_name,
+                filter={"hash": hash},
+            )
             return {"status": True}
         else:
             return {"status": False}
@@ -1404,9 +1623,41 @@ def delete_entries_from_collection(form_data: DeleteForm, user=Depends(get_admin
         return {"status": False}
 
 
+@router.get("/vector/indexes")
+def get_vector_indexes(user=Depends(get_admin_user)):
+    if not hasattr(VECTOR_DB_CLIENT, "get_indexes"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT(
+                "Index management is not supported by this vector database"
+            ),
+        )
+    return VECTOR_DB_CLIENT.get_indexes()
+
+
+class RebuildVectorIndexesForm(BaseModel):
+    collection_name: Optional[str] = None
+
+
+@router.post("/vector/indexes/rebuild")
+def rebuild_vector_indexes(
+    form_data: RebuildVectorIndexesForm, user=Depends(get_admin_user)
+):
+    # Indexes are rebuilt concurrently, searches keep working in the meantime
+    if not hasattr(VECTOR_DB_CLIENT, "rebuild_indexes"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ERROR_MESSAGES.DEFAULT(
+                "Index management is not supported by this vector database"
+            ),
+        )
+    return VECTOR_DB_CLIENT.rebuild_indexes(form_data.collection_name)
+
+
 @router.post("/reset/db")
 def reset_vector_db(user=Depends(get_admin_user)):
     VECTOR_DB_CLIENT.reset()
+    BM25_INDEX.reset()
     Knowledges.delete_all_knowledge()
 
 
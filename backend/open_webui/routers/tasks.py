@@ -18,6 +18,7 @@ from open_webui.utils.auth import get_admin_user, get_verified_user
 from open_webui.constants import TASKS
 
 from open_webui.routers.pipelines import process_pipeline_inlet_filter
+from open_webui.retrieval.query_cache import RETRIEVAL_QUERY_CACHE
 from open_webui.utils.task import get_task_model_id
 
 from open_webui.config import (
@@ -326,6 +327,11 @@ async def generate_queries(
         )
 
 
+@router.get("/queries/cache")
+async def get_query_cache_stats(user=Depends(get_admin_user)):
+    return RETRIEVAL_QUERY_CACHE.get_stats()
+
+
 @router.post("/auto/completions")
 async def generate_autocompletion(
     request: Request, form_data: dict, user=Depends(get_verified_user)
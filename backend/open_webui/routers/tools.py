@@ -8,7 +8,12 @@ from open_webui.models.tools import (
     ToolUserResponse,
     Tools,
 )
-from open_webui.utils.plugin import load_tools_module_by_id, replace_imports
+from open_webui.utils.plugin import (
+    PLUGIN_MODULES,
+    get_tools_module,
+    load_tools_module_by_id,
+    replace_imports,
+)
 from open_webui.config import CACHE_DIR
 from open_webui.constants import ERROR_MESSAGES
 from fastapi import APIRouter, Depends, HTTPException, Request, status
@@ -94,16 +99,17 @@ async def create_new_tools(
             )
             form_data.meta.manifest = frontmatter
 
-            TOOLS = request.app.state.TOOLS
-            TOOLS[form_data.id] = tools_module
-
-            specs = get_tools_specs(TOOLS[form_data.id])
+            specs = get_tools_specs(tools_module)
             tools = Tools.insert_new_tool(user.id, form_data, specs)
 
             tool_cache_dir = Path(CACHE_DIR) / "tools" / form_data.id
             tool_cache_dir.mkdir(parents=True, exist_ok=True)
 
             if tools:
+                # Only once saved, so other workers reload the new content
+                PLUGIN_MODULES.invalidate(
+                    f"tool:{form_data.id}", tools_module, form_data.content
+                )
                 return tools
             else:
                 raise HTTPException(
@@ -178,10 +184,7 @@ async def update_tools_by_id(
         )
         form_data.meta.manifest = frontmatter
 
-        TOOLS = request.app.state.TOOLS
-        TOOLS[id] = tools_module
-
-        specs = get_tools_specs(TOOLS[id])
+        specs = get_tools_specs(tools_module)
 
         updated = {
             **form_data.model_dump(exclude={"id"}),
@@ -192,6 +195,8 @@ async def update_tools_by_id(
         tools = Tools.update_tool_by_id(id, updated)
 
         if tools:
+            # Only once saved, so other workers reload the new content
+            PLUGIN_MODULES.invalidate(f"tool:{id}", tools_module, form_data.content)
             return tools
         else:
             raise HTTPException(
@@ -230,9 +235,7 @@ async def delete_tools_by_id(
 
     result = Tools.delete_tool_by_id(id)
     if result:
-        TOOLS = request.app.state.TOOLS
-        if id in TOOLS:
-            del TOOLS[id]
+        PLUGIN_MODULES.invalidate(f"tool:{id}")
 
     return result
 
@@ -272,11 +275,7 @@ async def get_tools_valves_spec_by_id(
 ):
     tools = Tools.get_tool_by_id(id)
     if tools:
-        if id in request.app.state.TOOLS:
-            tools_module = request.app.state.TOOLS[id]
-        else:
-            tools_module, _ = load_tools_module_by_id(id)
-            request.app.state.TOOLS[id] = tools_module
+        tools_module = get_tools_module(id)
 
         if hasattr(tools_module, "Valves"):
             Valves = tools_module.Valves
@@ -304,11 +303,7 @@ async def update_tools_valves_by_id(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=ERROR_MESSAGES.NOT_FOUND,
         )
-    if id in request.app.state.TOOLS:
-        tools_module = request.app.state.TOOLS[id]
-    else:
-        tools_module, _ = load_tools_module_by_id(id)
-        request.app.state.TOOLS[id] = tools_module
+    tools_module = get_tools_module(id)
 
     if not hasattr(tools_module, "Valves"):
         raise HTTPException(
@@ -360,11 +355,7 @@ async def get_tools_user_valves_spec_by_id(
 ):
     tools = Tools.get_tool_by_id(id)
     if tools:
-        if id in request.app.state.TOOLS:
-            tools_module = request.app.state.TOOLS[id]
-        else:
-            tools_module, _ = load_tools_module_by_id(id)
-            request.app.state.TOOLS[id] = tools_module
+        tools_module = get_tools_module(id)
 
         if hasattr(tools_module, "UserValves"):
             UserValves = tools_module.UserValves
@@ -384,11 +375,7 @@ async def update_tools_user_valves_by_id(
     tools = Tools.get_tool_by_id(id)
 
     if tools:
-        if id in request.app.state.TOOLS:
-            tools_module = request.app.state.TOOLS[id]
-        else:
-            tools_module, _ = load_tools_module_by_id(id)
-            request.app.state.TOOLS[id] = tools_module
+        tools_module = get_tools_module(id)
 
         if hasattr(tools_module, "UserValves"):
             UserValves = tools_module.UserValves
@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from open_webui.models.chats import Chats
+from open_webui.env import (
+    CHAT_SAVE_FLUSH_INTERVAL,
+    CHAT_SAVE_FLUSH_MAX_EVENTS,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["SOCKET"])
+
+# Flushes a status waits for its message to be created before it is dropped
+STATUS_MAX_ATTEMPTS = 10
+
+
+class PendingMessageWrite:
+    def __init__(self):
+        # Absolute content set by a "replace" event or a full save, if any
+        self.content: Optional[str] = None
+        # Content appended by "message" events since the last flush
+        self.append = ""
+        self.statuses: list[dict] = []
+        self.status_attempts = 0
+        self.fields: dict = {}
+        self.events = 0
+        self.created_at = time.monotonic()
+
+
+class ChatMessageWriteBuffer:
+    """
+    Coalesces message and status writes per (chat_id, message_id).
+
+    Streaming handlers only update an in-memory entry; the entry is written with a
+    single upsert once it is older than CHAT_SAVE_FLUSH_INTERVAL, once it holds
+    CHAT_SAVE_FLUSH_MAX_EVENTS events, or when the stream ends. Database work runs
+    in a worker thread so it does not block the event loop.
+    """
+
+    def __init__(self, interval: float, max_events: int):
+        self.interval = interval
+        self.max_events = max_events
+
+        self.pending: dict[tuple[str, str], PendingMessageWrite] = {}
+        self.locks: dict[tuple[str, str], asyncio.Lock] = {}
+        self.task: Optional[asyncio.Task] = None
+        # Flushes started from get_entry, referenced until they finish
+        self.flush_tasks: set[asyncio.Task] = set()
+
+        self.stats = {
+            "flushes": 0,
+            "events": 0,
+            "errors": 0,
+            "last_flush_latency": 0.0,
+            "max_flush_latency": 0.0,
+            "total_flush_latency": 0.0,
+        }
+
+    def get_entry(self, chat_id: str, message_id: str) -> PendingMessageWrite:
+        key = (chat_id, message_id)
+        if key not in self.pending:
+            self.pending[key] = PendingMessageWrite()
+
+        entry = self.pending[key]
+        entry.events += 1
+        self.stats["events"] += 1
+
+        if entry.events == self.max_events:
+            task = asyncio.create_task(self.flush(chat_id, message_id))
+            self.flush_tasks.add(task)
+            task.add_done_callback(self.flush_tasks.discard)
+        return entry
+
+    def append_content(self, chat_id: str, message_id: str, content: str):
+        entry = self.get_entry(chat_id, message_id)
+        if entry.content is not None:
+            entry.content += content
+        else:
+            entry.append += content
+
+    def set_content(self, chat_id: str, message_id: str, content: str):
+        entry = self.get_entry(chat_id, message_id)
+        entry.content = content
+        entry.append = ""
+
+    def add_status(self, chat_id: str, message_id: str, status: dict):
+        self.get_entry(chat_id, message_id).statuses.append(status)
+
+    def update(self, chat_id: str, message_id: str, fields: dict):
+        self.get_entry(chat_id, message_id).fields.update(fields)
+
+    def write(
+        self, chat_id: str, message_id: str, entry: PendingMessageWrite
+    ) -> list[dict]:
+        # Returns the statuses that could not be written yet
+        message = {**entry.fields}
+
+        existing = None
+        if (entry.content is None and entry.append) or entry.statuses:
+            existing = Chats.get_message_by_id_and_message_id(chat_id, message_id)
+
+        if entry.content is not None:
+            message["content"] = entry.content
+        elif entry.append:
+            message["content"] = (existing or {}).get("content", "") + entry.append
+
+        # Statuses wait until the message exists or is created by this write
+        pending_statuses = []
+        if entry.statuses:
+            if existing or message:
+                message["statusHistory"] = [
+                    *(existing or {}).get("statusHistory", []),
+                    *entry.statuses,
+                ]
+            else:
+                pending_statuses = entry.statuses
+
+        if message:
+            Chats.upsert_message_to_chat_by_id_and_message_id(
+                chat_id, message_id, message
+            )
+        return pending_statuses
+
+    async def flush(self, chat_id: str, message_id: str):
+        key = (chat_id, message_id)
+        lock = self.locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            entry = self.pending.pop(key, None)
+            if entry is not None:
+                start = time.monotonic()
+                try:
+                    statuses = await asyncio.to_thread(
+                        self.write, chat_id, message_id, entry
+                    )
+                    if statuses:
+                        self.requeue_statuses(chat_id, message_id, entry, statuses)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    log.exception(f"Error flushing message {chat_id}/{message_id}: {e}")
+
+                latency = time.monotonic() - start
+                self.stats["flushes"] += 1
+                self.stats["last_flush_latency"] = latency
+                self.stats["total_flush_latency"] += latency
+                self.stats["max_flush_latency"] = max(
+                    self.stats["max_flush_latency"], latency
+                )
+
+        if key not in self.pending and not lock.locked():
+            self.locks.pop(key, None)
+
+    def requeue_statuses(
+        self,
+        chat_id: str,
+        message_id: str,
+        entry: PendingMessageWrite,
+        statuses: list[dict],
+    ):
+        attempts = entry.status_attempts + 1
+        if attempts >= STATUS_MAX_ATTEMPTS:
+            log.warning(
+                f"Dropping {len(statuses)} statuses for missing message {chat_id}/{message_id}"
+            )
+            return
+
+        # Keep them ahead of statuses added while the write ran
+        pending = self.pending.setdefault((chat_id, message_id), PendingMessageWrite())
+        pending.statuses = [*statuses, *pending.statuses]
+        pending.status_attempts = max(pending.status_attempts, attempts)
+        pending.created_at = min(pending.created_at, entry.created_at)
+
+    async def flush_all(self):
+        await asyncio.gather(
+            *[
+                self.flush(chat_id, message_id)
+                for chat_id, message_id in list(self.pending)
+            ]
+        )
+
+    async def run(self):
+        try:
+            while True:
+                await asyncio.sleep(self.interval / 2)
+
+                now = time.monotonic()
+                await asyncio.gather(
+                    *[
+                        self.flush(chat_id, message_id)
+                        for (chat_id, message_id), entry in list(self.pending.items())
+                        if now - entry.created_at >= self.interval
+                    ]
+                )
+        except asyncio.CancelledError:
+            pass
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self.flush_all()
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        flushes = self.stats["flushes"]
+        return {
+            **self.stats,
+            "pending_messages": len(self.pending),
+            "pending_events": sum(entry.events for entry in self.pending.values()),
+            "oldest_pending_age": max(
+                (now - entry.created_at for entry in self.pending.values()),
+                default=0.0,
+            ),
+            "avg_flush_latency": (
+                self.stats["total_flush_latency"] / flushes if flushes else 0.0
+            ),
+        }
+
+
+CHAT_MESSAGE_BUFFER = ChatMessageWriteBuffer(
+    interval=CHAT_SAVE_FLUSH_INTERVAL,
+    max_events=CHAT_SAVE_FLUSH_MAX_EVENTS,
+)
@@ -6,7 +6,6 @@ import time
 
 from open_webui.models.users import Users, UserNameResponse
 from open_webui.models.channels import Channels
-from open_webui.models.chats import Chats
 
 from open_webui.env import (
     ENABLE_WEBSOCKET_SUPPORT,
@@ -15,6 +14,7 @@ from open_webui.env import (
 )
 from open_webui.utils.auth import decode_token
 from open_webui.socket.utils import RedisDict, RedisLock
+from open_webui.socket.buffer import CHAT_MESSAGE_BUFFER
 
 from open_webui.env import (
     GLOBAL_LOG_LEVEL,
@@ -271,9 +271,9 @@ async def disconnect(sid):
 def get_event_emitter(request_info):
     async def __event_emitter__(event_data):
         user_id = request_info["user_id"]
-        session_ids = list(
-            set(USER_POOL.get(user_id, []) + [request_info["session_id"]])
-        )
+        session_ids = set(USER_POOL.get(user_id, []))
+        if request_info.get("session_id"):
+            session_ids.add(request_info["session_id"])
 
         for session_id in session_ids:
             await sio.emit(
@@ -286,39 +286,29 @@ def get_event_emitter(request_info):
                 to=session_id,
             )
 
+        # Events not tied to a chat message (e.g. file processing) are not saved
+        if not request_info.get("chat_id"):
+            return
+
         if "type" in event_data and event_data["type"] == "status":
-            Chats.add_message_status_to_chat_by_id_and_message_id(
+            CHAT_MESSAGE_BUFFER.add_status(
                 request_info["chat_id"],
                 request_info["message_id"],
                 event_data.get("data", {}),
             )
 
         if "type" in event_data and event_data["type"] == "message":
-            message = Chats.get_message_by_id_and_message_id(
-                request_info["chat_id"],
-                request_info["message_id"],
-            )
-
-            content = message.get("content", "")
-            content += event_data.get("data", {}).get("content", "")
-
-            Chats.upsert_message_to_chat_by_id_and_message_id(
+            CHAT_MESSAGE_BUFFER.append_content(
                 request_info["chat_id"],
                 request_info["message_id"],
-                {
-                    "content": content,
-                },
+                event_data.get("data", {}).get("content", ""),
             )
 
         if "type" in event_data and event_data["type"] == "replace":
-            content = event_data.get("data", {}).get("content", "")
-
-            Chats.upsert_message_to_chat_by_id_and_message_id(
+            CHAT_MESSAGE_BUFFER.set_content(
                 request_info["chat_id"],
                 request_info["message_id"],
-                {
-                    "content": content,
-                },
+                event_data.get("data", {}).get("content", ""),
             )
 
     return __event_emitter__
@@ -106,6 +106,28 @@ class TestChats(AbstractPostgresTest):
         assert response.status_code == 200
         assert len(response.json()) == 1
 
+    def test_get_user_chats_with_unsaved_messages(self):
+        from open_webui.models.chats import ChatForm
+
+        chat = self.chats.insert_new_chat(
+            "5",
+            ChatForm(
+                chat={"history": {"currentId": "1", "messages": {"1": {"id": "1"}}}}
+            ),
+        )
+        # Written to the message rows only, not yet to the chat
+        self.chats.upsert_message_to_chat_by_id_and_message_id(
+            chat.id, "1", {"content": "hello"}
+        )
+
+        with mock_webui_user(id="5"):
+            response = self.fast_api_client.get(self.create_url("/all"))
+        assert response.status_code == 200
+        assert response.json()[0]["chat"]["history"]["messages"]["1"] == {
+            "id": "1",
+            "content": "hello",
+        }
+
     def test_get_archived_session_user_chat_list(self):
         self.test_get_user_archived_chats()
 
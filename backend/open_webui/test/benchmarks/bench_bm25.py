@@ -0,0 +1,85 @@
+"""
+BM25 keyword search: persistent index vs. rebuilding the index for every query.
+
+    DATA_DIR=/tmp/bench python -m open_webui.test.benchmarks.bench_bm25 --docs 20000
+
+Also reports the cost of adding documents in small batches, which is what
+uploading files one by one to a knowledge base does.
+"""
+
+import argparse
+import random
+import tempfile
+import time
+import types
+
+from open_webui.retrieval.bm25 import BM25Collection, BM25Index
+
+
+def get_texts(count: int, words_per_doc: int = 150) -> list[str]:
+    rng = random.Random(0)
+    vocabulary = [
+        "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 9)))
+        for _ in range(20000)
+    ]
+    return [" ".join(rng.choices(vocabulary, k=words_per_doc)) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    texts = get_texts(args.docs)
+    ids = [str(idx) for idx in range(args.docs)]
+    metadatas = [{"file_id": str(idx // 100)} for idx in range(args.docs)]
+    queries = [
+        " ".join(random.Random(idx).sample(texts[idx].split(), 3))
+        for idx in range(args.queries)
+    ]
+
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        for idx in range(min(args.queries, 3)):
+            collection = BM25Collection(f"{path}/rebuild-{idx}", "rebuild")
+            collection.add(ids, texts, metadatas)
+            collection.search(queries[idx], 10)
+        rebuild = (time.perf_counter() - start) / min(args.queries, 3)
+
+        index = BM25Index(f"{path}/index")
+        collection_name = f"bench-bm25-{time.time_ns()}"
+        result = types.SimpleNamespace(
+            ids=[ids], documents=[texts], metadatas=[metadatas]
+        )
+
+        start = time.perf_counter()
+        index.search(collection_name, queries[0], 10, loader=lambda _: result)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for query in queries:
+            index.search(collection_name, query, 10)
+        search = (time.perf_counter() - start) / len(queries)
+
+        start = time.perf_counter()
+        for idx in range(0, 5000, args.batch_size):
+            index.add(
+                collection_name,
+                [f"new-{idx + offset}" for offset in range(args.batch_size)],
+                texts[idx : idx + args.batch_size],
+                metadatas[idx : idx + args.batch_size],
+            )
+        add = time.perf_counter() - start
+
+    print(f"{args.docs} documents")
+    print(f"rebuild per query: {rebuild * 1000:8.1f} ms/query")
+    print(
+        f"persistent index:  {search * 1000:8.1f} ms/query (built once in {build:.2f}s)"
+    )
+    print(f"add 5000 documents in batches of {args.batch_size}: {add:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Remote embedding throughput by number of concurrent batch requests, against a
+local OpenAI-compatible server that adds latency per request and answers 5% of
+requests with 429.
+
+    python -m open_webui.test.benchmarks.bench_embedding_client --texts 2000
+
+Concurrency 1 sends one batch at a time, like the previous client.
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+from aiohttp import web
+
+from open_webui.retrieval.embedding_client import EmbeddingClient
+
+
+async def embeddings(request: web.Request) -> web.Response:
+    texts = (await request.json())["input"]
+    if random.random() < 0.05:
+        return web.Response(status=429, headers={"Retry-After": "0.05"})
+
+    await asyncio.sleep(0.03 + 0.0005 * len(texts))
+    return web.json_response(
+        {
+            "data": [
+                {"index": idx, "embedding": [float(len(text)), 0.0]}
+                for idx, text in enumerate(texts)
+            ]
+        }
+    )
+
+
+def serve(port: int):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    app = web.Application(client_max_size=2**26)
+    app.router.add_post("/v1/embeddings", embeddings)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+    loop.run_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    threading.Thread(target=serve, args=(args.port,), daemon=True).start()
+    time.sleep(0.5)
+
+    rng = random.Random(0)
+    texts = [
+        f"chunk {idx} " + "x" * rng.randint(100, 1500) for idx in range(args.texts)
+    ]
+
+    for concurrency in (1, 2, 4, 8, 16):
+        client = EmbeddingClient(concurrency, 5, 100000, 30)
+        start = time.perf_counter()
+        vectors = client.embed(
+            "openai",
+            "model",
+            texts,
+            f"http://127.0.0.1:{args.port}/v1",
+            "",
+            args.batch_size,
+        )
+        elapsed = time.perf_counter() - start
+        asyncio.run(client.close())
+
+        assert [vector[0] for vector in vectors] == [float(len(text)) for text in texts]
+        stats = client.get_stats()
+        print(
+            f"concurrency {concurrency:2d}: {len(texts) / elapsed:7.0f} texts/s "
+            f"({stats['requests']} requests, {stats['retries']} retries)"
+        )
+
+
+if __name__ == "__main__":
+    main()
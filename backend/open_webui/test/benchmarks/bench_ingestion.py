@@ -0,0 +1,112 @@
+"""
+Time and peak memory of save_docs_to_vector_db for a large document, streamed in
+windows vs. in a single window holding every chunk (splitting, embedding and
+inserting everything at once).
+
+    DATA_DIR=/tmp/bench python -m open_webui.test.benchmarks.bench_ingestion --mb 10
+
+Each run is a separate process so peak RSS is measured on its own. Embeddings
+come from a fake 768-dimensional model that takes 2ms per text.
+"""
+
+import argparse
+import os
+import random
+import resource
+import string
+import subprocess
+import sys
+import time
+import types
+
+
+class FakeEmbeddingModel:
+    def encode(self, texts):
+        import numpy as np
+
+        time.sleep(0.002 * len(texts))
+        return np.random.rand(len(texts), 768).astype(np.float32)
+
+
+def get_docs(mb: int):
+    from langchain_core.documents import Document
+
+    rng = random.Random(0)
+    words = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+        for _ in range(5000)
+    ]
+    for idx in range(mb * 1024 * 1024 // 10000):
+        yield Document(
+            page_content=" ".join(rng.choices(words, k=1700))[:10000],
+            metadata={"source": "bench.txt", "page": idx},
+        )
+
+
+def run(mb: int, window_size: int):
+    from open_webui.retrieval.vector.connector import VECTOR_DB_CLIENT
+    from open_webui.routers import retrieval
+
+    retrieval.RAG_INGESTION_WINDOW_SIZE = window_size
+    config = types.SimpleNamespace(
+        TEXT_SPLITTER="",
+        CHUNK_SIZE=1000,
+        CHUNK_OVERLAP=100,
+        RAG_EMBEDDING_ENGINE="",
+        RAG_EMBEDDING_MODEL=f"bench-{time.time_ns()}",
+        RAG_OPENAI_API_BASE_URL="",
+        RAG_OPENAI_API_KEY="",
+        RAG_OLLAMA_BASE_URL="",
+        RAG_OLLAMA_API_KEY="",
+        RAG_EMBEDDING_BATCH_SIZE=32,
+    )
+    request = types.SimpleNamespace(
+        app=types.SimpleNamespace(
+            state=types.SimpleNamespace(config=config, ef=FakeEmbeddingModel())
+        )
+    )
+
+    collection_name = f"bench-ingestion-{window_size}"
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+    start = time.perf_counter()
+    retrieval.save_docs_to_vector_db(
+        request, get_docs(mb), collection_name, overwrite=True
+    )
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+    VECTOR_DB_CLIENT.delete_collection(collection_name=collection_name)
+    print(
+        f"window {window_size:>8}: {elapsed:6.1f}s, "
+        f"peak rss {peak} MB (+{peak - rss} MB)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=int, default=10)
+    parser.add_argument("--window-size", type=int)
+    args = parser.parse_args()
+
+    if args.window_size:
+        run(args.mb, args.window_size)
+        return
+
+    for window_size in (256, 10**9):
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                __spec__.name,
+                "--mb",
+                str(args.mb),
+                "--window-size",
+                str(window_size),
+            ],
+            env=os.environ,
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
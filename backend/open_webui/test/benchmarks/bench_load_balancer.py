@@ -0,0 +1,80 @@
+"""
+Backend selection for Ollama requests: the load balancer strategies vs. random
+choice, on simulated backends of different speeds.
+
+    python -m open_webui.test.benchmarks.bench_load_balancer --requests 1000
+
+Each backend serves `parallel` requests at a time and queues the rest, like
+OLLAMA_NUM_PARALLEL. Requests arrive at a fixed rate; latency includes queueing.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from open_webui.utils.load_balancer import STRATEGIES, LoadBalancer
+
+# (service time in seconds, parallel requests)
+BACKENDS = {
+    "http://fast:11434": (0.02, 4),
+    "http://medium:11434": (0.04, 4),
+    "http://slow:11434": (0.12, 2),
+}
+
+
+async def run(strategy: str, requests: int, rate: float, down: bool) -> list[float]:
+    balancer = LoadBalancer(strategy=strategy, eject_failures=3, eject_duration=30)
+    slots = {
+        url: asyncio.Semaphore(parallel) for url, (_, parallel) in BACKENDS.items()
+    }
+    latencies = []
+
+    async def request(rng: random.Random):
+        start = time.perf_counter()
+        while True:
+            url = balancer.select(list(BACKENDS), "llama3")
+            acquired = balancer.acquire(url)
+            try:
+                if down and url == "http://slow:11434":
+                    # Connection refused after a short timeout
+                    await asyncio.sleep(0.01)
+                    balancer.record_failure(url)
+                    continue
+
+                async with slots[url]:
+                    await asyncio.sleep(BACKENDS[url][0] * rng.uniform(0.5, 1.5))
+                balancer.record_success(url, time.monotonic() - acquired)
+                break
+            finally:
+                balancer.release(url)
+        latencies.append(time.perf_counter() - start)
+
+    rng = random.Random(0)
+    tasks = []
+    for _ in range(requests):
+        tasks.append(asyncio.create_task(request(rng)))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=150, help="requests per second")
+    args = parser.parse_args()
+
+    for down in (False, True):
+        print("slow backend down" if down else "all backends up")
+        for strategy in STRATEGIES:
+            latencies = asyncio.run(run(strategy, args.requests, args.rate, down))
+            p50 = latencies[len(latencies) // 2]
+            p99 = latencies[int(len(latencies) * 0.99)]
+            print(
+                f"  {strategy:22s} p50 {p50 * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
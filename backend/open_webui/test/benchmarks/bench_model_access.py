@@ -0,0 +1,123 @@
+"""
+Filtering the model list by read access: one model lookup and access check per
+model vs. the access index loaded in one query.
+
+    DATA_DIR=/tmp/bench python -m open_webui.test.benchmarks.bench_model_access
+
+Seeds the database in DATA_DIR with models, groups and memberships; use an empty
+directory.
+"""
+
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+from open_webui.config import run_migrations
+from open_webui.internal.db import get_db
+from open_webui.models.groups import Group, Groups
+from open_webui.models.models import Model, Models
+from open_webui.utils.access_control import has_access
+
+
+def seed(models: int, groups: int, users: int, members: int, restricted: float):
+    rng = random.Random(0)
+    now = int(time.time())
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    group_ids = [str(uuid.uuid4()) for _ in range(groups)]
+
+    with get_db() as db:
+        for group_id in group_ids:
+            group_user_ids = rng.sample(user_ids, members)
+            db.add(
+                Group(
+                    id=group_id,
+                    user_id=user_ids[0],
+                    name=group_id,
+                    description="",
+                    user_ids=group_user_ids,
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+            Groups.set_group_members(db, group_id, group_user_ids)
+
+        for idx in range(models):
+            access_control = None
+            if rng.random() < restricted:
+                access_control = {
+                    "read": {"group_ids": rng.sample(group_ids, 3), "user_ids": []},
+                    "write": {"group_ids": [], "user_ids": []},
+                }
+            db.add(
+                Model(
+                    id=f"model-{idx}",
+                    user_id=rng.choice(user_ids),
+                    name=f"model-{idx}",
+                    params={},
+                    meta={},
+                    access_control=access_control,
+                    is_active=True,
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+        db.commit()
+
+    return user_ids, [{"id": f"model-{idx}"} for idx in range(models)]
+
+
+def filter_per_model(models: list[dict], user_id: str) -> list[dict]:
+    filtered_models = []
+    for model in models:
+        model_info = Models.get_model_by_id(model["id"])
+        if model_info:
+            if user_id == model_info.user_id or has_access(
+                user_id, type="read", access_control=model_info.access_control
+            ):
+                filtered_models.append(model)
+    return filtered_models
+
+
+def filter_by_index(models: list[dict], user_id: str) -> list[dict]:
+    readable_model_ids = Models.get_model_ids_by_user_access(user_id, type="read")
+    return [model for model in models if model["id"] in readable_model_ids]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--models", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--members", type=int, default=30)
+    parser.add_argument("--restricted", type=float, default=0.9)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    run_migrations()
+    user_ids, models = seed(
+        args.models, args.groups, args.users, args.members, args.restricted
+    )
+
+    def measure(fn, clear_group_cache: bool = False):
+        timings = []
+        for user_id in user_ids[: args.runs]:
+            if clear_group_cache:
+                Groups.membership_cache.clear()
+            start = time.perf_counter()
+            visible = fn(models, user_id)
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings), visible
+
+    per_model, expected = measure(filter_per_model)
+    by_index, visible = measure(filter_by_index)
+    assert visible == expected
+
+    print(f"{args.models} models, {args.groups} groups, {args.users} users")
+    print(f"per-model lookups: {per_model * 1000:8.1f} ms")
+    print(f"access index:      {by_index * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+pgvector writes: binary COPY with ON CONFLICT upserts vs. the ORM writes they
+replaced (bulk_save_objects for inserts, a lookup per row for upserts).
+
+    PGVECTOR_DB_URL=postgresql://... python -m open_webui.test.benchmarks.bench_pgvector
+
+Needs a Postgres database with the vector extension; the rows written are removed
+afterwards.
+"""
+
+import argparse
+import random
+import time
+import uuid
+
+from open_webui.retrieval.vector.dbs.pgvector import DocumentChunk, PgvectorClient
+
+
+def get_items(count: int, dim: int) -> list[dict]:
+    rng = random.Random(0)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "vector": [rng.random() for _ in range(dim)],
+            "text": " ".join(str(rng.random()) for _ in range(60)),
+            "metadata": {"file_id": "bench", "source": "bench.txt", "start_index": idx},
+        }
+        for idx in range(count)
+    ]
+
+
+def orm_insert(client: PgvectorClient, collection_name: str, items: list[dict]):
+    client.session.bulk_save_objects(
+        [
+            DocumentChunk(
+                id=item["id"],
+                vector=client.adjust_vector_length(list(item["vector"])),
+                collection_name=collection_name,
+                text=item["text"],
+                vmetadata=item["metadata"],
+            )
+            for item in items
+        ]
+    )
+    client.session.commit()
+
+
+def orm_upsert(client: PgvectorClient, collection_name: str, items: list[dict]):
+    for item in items:
+        vector = client.adjust_vector_length(list(item["vector"]))
+        existing = (
+            client.session.query(DocumentChunk)
+            .filter(DocumentChunk.id == item["id"])
+            .first()
+        )
+        if existing:
+            existing.vector = vector
+            existing.text = item["text"]
+            existing.vmetadata = item["metadata"]
+            existing.collection_name = collection_name
+        else:
+            client.session.add(
+                DocumentChunk(
+                    id=item["id"],
+                    vector=vector,
+                    collection_name=collection_name,
+                    text=item["text"],
+                    vmetadata=item["metadata"],
+                )
+            )
+    client.session.commit()
+
+
+def copy_write(client: PgvectorClient, collection_name: str, items: list[dict]):
+    client.write(collection_name, items)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    client = PgvectorClient()
+    items = get_items(args.items, args.dim)
+
+    for name, insert, upsert in (
+        ("orm", orm_insert, orm_upsert),
+        ("copy", copy_write, copy_write),
+    ):
+        collection_name = f"bench-pgvector-{name}-{uuid.uuid4().hex[:8]}"
+        try:
+            start = time.perf_counter()
+            insert(client, collection_name, items)
+            inserted = time.perf_counter() - start
+
+            start = time.perf_counter()
+            upsert(client, collection_name, items)
+            upserted = time.perf_counter() - start
+        finally:
+            client.delete_collection(collection_name)
+
+        print(
+            f"{name:4s}: insert {args.items / inserted:8.0f} rows/s, "
+            f"upsert {args.items / upserted:8.0f} rows/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
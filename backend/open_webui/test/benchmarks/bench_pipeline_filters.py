@@ -0,0 +1,115 @@
+"""
+Pipeline inlet filters for concurrent chats: the async filters vs. the previous
+blocking requests calls, which held the event loop for every filter request.
+
+    python -m open_webui.test.benchmarks.bench_pipeline_filters
+
+A local pipelines server answers every filter call after 50ms; each chat goes
+through two filters.
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+import types
+
+import requests
+from aiohttp import web
+
+from open_webui.routers import pipelines
+
+
+async def filter_handler(request: web.Request) -> web.Response:
+    await asyncio.sleep(0.05)
+    return web.json_response((await request.json())["body"])
+
+
+def serve(port: int):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    app = web.Application()
+    app.router.add_post("/{id}/filter/{type}", filter_handler)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+    loop.run_forever()
+
+
+def blocking_inlet_filter(request, payload, user, models):
+    # The filter loop before it was made async
+    user = {"id": user.id, "email": user.email, "name": user.name, "role": user.role}
+    for filter in pipelines.get_sorted_filters(payload["model"], models):
+        url = request.app.state.config.OPENAI_API_BASE_URLS[filter["urlIdx"]]
+        key = request.app.state.config.OPENAI_API_KEYS[filter["urlIdx"]]
+
+        r = requests.post(
+            f"{url}/{filter['id']}/filter/inlet",
+            headers={"Authorization": f"Bearer {key}"},
+            json={"user": user, "body": payload},
+        )
+        r.raise_for_status()
+        payload = r.json()
+    return payload
+
+
+async def run(fn, request, user, models, chats: int) -> tuple[float, list[float]]:
+    # Every chat arrives at once; a blocked event loop delays the ones after it
+    latencies = []
+    start = time.perf_counter()
+
+    async def chat(idx: int):
+        result = fn(
+            request, {"model": f"model-{idx % 100}", "messages": []}, user, models
+        )
+        if asyncio.iscoroutine(result):
+            await result
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(chat(idx) for idx in range(chats)))
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--port", type=int, default=9099)
+    args = parser.parse_args()
+
+    threading.Thread(target=serve, args=(args.port,), daemon=True).start()
+    time.sleep(0.5)
+
+    config = types.SimpleNamespace(
+        OPENAI_API_BASE_URLS=[f"http://127.0.0.1:{args.port}"], OPENAI_API_KEYS=["key"]
+    )
+    request = types.SimpleNamespace(
+        app=types.SimpleNamespace(state=types.SimpleNamespace(config=config))
+    )
+    user = types.SimpleNamespace(
+        id="user", email="user@localhost", name="User", role="user"
+    )
+    models = {
+        f"filter-{idx}": {
+            "id": f"filter-{idx}",
+            "urlIdx": 0,
+            "pipeline": {"type": "filter", "pipelines": ["*"], "priority": idx},
+        }
+        for idx in range(2)
+    }
+    models.update({f"model-{idx}": {"id": f"model-{idx}"} for idx in range(100)})
+
+    for name, fn in (
+        ("blocking", blocking_inlet_filter),
+        ("async", pipelines.process_pipeline_inlet_filter),
+    ):
+        wall, latencies = asyncio.run(run(fn, request, user, models, args.chats))
+        print(
+            f"{name:8s}: {args.chats} chats in {wall:5.2f}s, "
+            f"p50 {latencies[len(latencies) // 2] * 1000:6.0f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import sqlalchemy as sa
+from alembic import command
+from alembic.config import Config
+
+from open_webui.env import OPEN_WEBUI_DIR
+
+# Last revision before the chat_message table
+BASE_REVISION = "3781e22d8b01"
+
+NEW_TABLES = {"chat_message", "group_member", "ingestion_job", "bm25_index"}
+
+
+def get_config(connection) -> Config:
+    config = Config(OPEN_WEBUI_DIR / "alembic.ini")
+    config.set_main_option("script_location", str(OPEN_WEBUI_DIR / "migrations"))
+    # Runs on this connection instead of DATABASE_URL (see migrations/env.py)
+    config.attributes["connection"] = connection
+    return config
+
+
+def get_tables(connection) -> set[str]:
+    return set(sa.inspect(connection).get_table_names())
+
+
+class TestMigrations:
+    def test_downgrade_and_upgrade(self, tmp_path):
+        engine = sa.create_engine(f"sqlite:///{tmp_path / 'webui.db'}")
+
+        with engine.connect() as connection:
+            config = get_config(connection)
+
+            command.upgrade(config, "head")
+            assert NEW_TABLES <= get_tables(connection)
+
+            command.downgrade(config, BASE_REVISION)
+            assert not NEW_TABLES & get_tables(connection)
+
+            command.upgrade(config, "head")
+            assert NEW_TABLES <= get_tables(connection)
+        engine.dispose()
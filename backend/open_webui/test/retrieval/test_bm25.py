@@ -0,0 +1,211 @@
+import multiprocessing
+import threading
+import types
+
+import pytest
+
+from open_webui.models.bm25 import BM25IndexVersions
+from open_webui.retrieval import bm25
+from open_webui.retrieval.bm25 import BM25Collection, BM25Index
+
+
+DOCS = {
+    "a": "the quick brown fox",
+    "b": "a lazy dog sleeps",
+    "c": "the fox jumps over the dog",
+}
+
+
+def get_result(docs: dict):
+    ids = list(docs)
+    return types.SimpleNamespace(
+        ids=[ids],
+        documents=[[docs[id] for id in ids]],
+        metadatas=[[{"file_id": id} for id in ids]],
+    )
+
+
+def add_documents(path: str, collection_name: str, writer: int, count: int):
+    index = BM25Index(path)
+    for i in range(count):
+        id = f"w{writer}-{i}"
+        index.add(collection_name, [id], [f"doc {id}"], [{}])
+
+
+@pytest.fixture
+def collection_name(request):
+    # The versions table is shared, give every test its own collection
+    return f"test-bm25-{request.node.name}-{id(request)}"
+
+
+class TestBM25Collection:
+    def test_add_search_delete(self, tmp_path):
+        collection = BM25Collection(str(tmp_path / "c"), "c")
+        collection.add(list(DOCS), list(DOCS.values()), [{}] * len(DOCS))
+
+        results = collection.search("fox", 3)
+        assert {result["id"] for result in results} == {"a", "c"}
+
+        collection.delete(ids=["a"])
+        assert [result["id"] for result in collection.search("fox", 3)] == ["c"]
+
+    def test_delete_by_filter(self, tmp_path):
+        collection = BM25Collection(str(tmp_path / "c"), "c")
+        collection.add(
+            list(DOCS), list(DOCS.values()), [{"file_id": id} for id in DOCS]
+        )
+
+        collection.delete(filter={"file_id": "c"})
+        assert [result["id"] for result in collection.search("dog", 3)] == ["b"]
+
+    def test_compaction_keeps_old_segments_for_readers(self, tmp_path):
+        collection = BM25Collection(str(tmp_path / "c"), "c")
+        for i in range(bm25.MERGE_FACTOR):
+            collection.add([f"d{i}"], [f"fox {i}"], [{}])
+
+        # A search that loaded the manifest before the merge still reads its segments
+        reader = BM25Collection(collection.path, "c")
+        reader.load()
+        collection.compact()
+
+        assert len(collection.load()[0]["segments"]) == 1
+        assert len(reader.search("fox", 10)) == bm25.MERGE_FACTOR
+        assert all(
+            (tmp_path / "c" / segment["id"]).exists()
+            for segment in collection.manifest["retired"]
+        )
+
+    def test_retired_segments_are_removed_after_grace_period(
+        self, tmp_path, monkeypatch
+    ):
+        collection = BM25Collection(str(tmp_path / "c"), "c")
+        collection.add(["a"], ["fox"], [{}])
+        collection.add(["b"], ["dog"], [{}])
+        collection.compact()
+        retired = [segment["id"] for segment in collection.manifest["retired"]]
+
+        monkeypatch.setattr(bm25, "SEGMENT_GRACE_PERIOD", -1)
+        collection.add(["c"], ["cat"], [{}])
+
+        assert collection.manifest["retired"] == []
+        assert not any((tmp_path / "c" / segment_id).exists() for segment_id in retired)
+
+
+class TestBM25Index:
+    def test_first_add_creates_index(self, tmp_path, collection_name):
+        index = BM25Index(str(tmp_path))
+        docs = {"a": DOCS["a"]}
+
+        # The vector DB holds the window being indexed
+        index.add(
+            collection_name,
+            ["a"],
+            [DOCS["a"]],
+            [{"file_id": "a"}],
+            loader=lambda _: get_result(docs),
+        )
+        assert index.has_collection(collection_name)
+
+        docs.update({"c": DOCS["c"]})
+        index.add(collection_name, ["c"], [DOCS["c"]], [{"file_id": "c"}])
+
+        results = index.search(collection_name, "fox", 3)
+        assert sorted(result["id"] for result in results) == ["a", "c"]
+
+    def test_builds_missing_index(self, tmp_path, collection_name):
+        index = BM25Index(str(tmp_path))
+        BM25IndexVersions.bump_version(collection_name)
+
+        # Without a loader a write cannot create the index, the first search does
+        index.add(collection_name, ["a"], [DOCS["a"]], [{}])
+        assert not index.has_collection(collection_name)
+
+        results = index.search(
+            collection_name, "fox", 3, loader=lambda _: get_result(DOCS)
+        )
+        assert {result["id"] for result in results} == {"a", "c"}
+        assert index.search(collection_name, "fox", 3) == results
+
+    def test_does_not_index_twice(self, tmp_path, collection_name):
+        index = BM25Index(str(tmp_path))
+        index.add(
+            collection_name, ["a"], [DOCS["a"]], [{}], loader=lambda _: get_result({})
+        )
+
+        # Written to the vector DB by another worker, whose index stage has not
+        # run yet when a search rebuilds the index
+        BM25IndexVersions.bump_version(collection_name)
+        index.search(collection_name, "fox", 3, loader=lambda _: get_result(DOCS))
+        index.add(collection_name, ["b", "c"], [DOCS["b"], DOCS["c"]], [{}, {}])
+
+        results = index.search(collection_name, "fox dog", 10)
+        assert sorted(result["id"] for result in results) == ["a", "b", "c"]
+
+    def test_builds_do_not_block_other_collections(self, tmp_path, collection_name):
+        index = BM25Index(str(tmp_path))
+        other = f"{collection_name}-other"
+        index.search(other, "fox", 3, loader=lambda _: get_result(DOCS))
+
+        building = threading.Event()
+        release = threading.Event()
+
+        def loader(_):
+            building.set()
+            release.wait(10)
+            return get_result(DOCS)
+
+        thread = threading.Thread(
+            target=index.search, args=(collection_name, "fox", 3, loader)
+        )
+        thread.start()
+        try:
+            assert building.wait(10)
+            assert len(index.search(other, "fox", 3)) == 2
+        finally:
+            release.set()
+            thread.join(10)
+
+    def test_applies_writes_to_current_index(self, tmp_path, collection_name):
+        index = BM25Index(str(tmp_path))
+        index.search(collection_name, "fox", 3, loader=lambda _: get_result(DOCS))
+
+        index.add(collection_name, ["d"], ["a fox again"], [{}])
+        index.delete(collection_name, ids=["a"])
+
+        results = index.search(collection_name, "fox", 3)
+        assert {result["id"] for result in results} == {"c", "d"}
+
+    def test_rebuilds_stale_index(self, tmp_path, collection_name):
+        index = BM25Index(str(tmp_path / "one"))
+        other = BM25Index(str(tmp_path / "two"))
+        for replica in (index, other):
+            replica.search(collection_name, "fox", 3, loader=lambda _: get_result(DOCS))
+
+        # Written through the other replica only
+        other.delete(collection_name, ids=["a"])
+
+        docs = {id: text for id, text in DOCS.items() if id != "a"}
+        results = index.search(
+            collection_name, "fox", 3, loader=lambda _: get_result(docs)
+        )
+        assert [result["id"] for result in results] == ["c"]
+
+    def test_concurrent_writers(self, tmp_path, collection_name):
+        index = BM25Index(str(tmp_path))
+        index.search(collection_name, "doc", 3, loader=lambda _: get_result({}))
+
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(
+                target=add_documents, args=(str(tmp_path), collection_name, writer, 10)
+            )
+            for writer in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=60)
+            assert process.exitcode == 0
+
+        # No write was lost, so the index is still current
+        assert len(index.search(collection_name, "doc", 100)) == 40
@@ -0,0 +1,146 @@
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from open_webui.retrieval.embedding_cache import (
+    EmbeddingCache,
+    EmbeddingDiskStore,
+    get_namespace,
+)
+
+
+def get_vector(key: str, dim: int = 8) -> list[float]:
+    seed = int.from_bytes(key.encode()[-4:].rjust(4, b"\0"), "big")
+    return np.random.default_rng(seed).random(dim, dtype=np.float32).tolist()
+
+
+def write_vectors(path: str, writer: int, count: int):
+    store = EmbeddingDiskStore(path)
+    for i in range(count):
+        key = f"w{writer}-{i}"
+        store.set_many("ns", {key: get_vector(key)})
+    store.close()
+
+
+class TestEmbeddingDiskStore:
+    def test_round_trip(self, tmp_path):
+        store = EmbeddingDiskStore(str(tmp_path))
+        store.set_many("ns", {"a": [0.5, 1.5], "b": [2.0, -1.0, 3.0]})
+
+        assert store.get_many("ns", ["a", "b", "c"]) == {
+            "a": [0.5, 1.5],
+            "b": [2.0, -1.0, 3.0],
+        }
+        assert store.size > 0
+
+    def test_namespaces(self, tmp_path):
+        store = EmbeddingDiskStore(str(tmp_path))
+        store.set_many("one", {"a": [1.0]})
+        store.set_many("two", {"a": [2.0]})
+
+        assert store.get_many("one", ["a"]) == {"a": [1.0]}
+        assert store.get_many("two", ["a"]) == {"a": [2.0]}
+
+        store.delete(keep="two")
+        assert store.get_many("one", ["a"]) == {}
+        assert store.get_many("two", ["a"]) == {"a": [2.0]}
+
+        store.delete("two")
+        assert store.get_many("two", ["a"]) == {}
+
+    def test_concurrent_writers(self, tmp_path):
+        # Worker processes share one store; every row must keep its own vector
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=write_vectors, args=(str(tmp_path), writer, 50))
+            for writer in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=60)
+            assert process.exitcode == 0
+
+        keys = [f"w{writer}-{i}" for writer in range(4) for i in range(50)]
+        vectors = EmbeddingDiskStore(str(tmp_path)).get_many("ns", keys)
+
+        assert len(vectors) == len(keys)
+        for key in keys:
+            assert vectors[key] == pytest.approx(get_vector(key))
+
+
+class TestEmbeddingCache:
+    def test_embeds_missing_texts_once(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path), memory_size=10, disk_max_bytes=1 << 20)
+        namespace = get_namespace("", "model")
+
+        calls = []
+
+        def embedding_function(texts):
+            calls.append(list(texts))
+            return [[float(len(text))] for text in texts]
+
+        assert cache.embed(namespace, ["a", "bb"], embedding_function) == [
+            [1.0],
+            [2.0],
+        ]
+        assert cache.embed(namespace, ["bb", "ccc"], embedding_function) == [
+            [2.0],
+            [3.0],
+        ]
+        assert calls == [["a", "bb"], ["ccc"]]
+
+        # A new process only has the disk store
+        cache = EmbeddingCache(str(tmp_path), memory_size=10, disk_max_bytes=1 << 20)
+        assert cache.embed(namespace, "ccc", embedding_function) == [3.0]
+        assert cache.stats["disk_hits"] == 1
+
+    def test_namespaces(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path), memory_size=10, disk_max_bytes=1 << 20)
+        one, two = get_namespace("", "one"), get_namespace("", "two")
+
+        cache.embed(one, "a", lambda texts: [[1.0] for _ in texts])
+        assert cache.embed(two, "a", lambda texts: [[2.0] for _ in texts]) == [2.0]
+        assert cache.embed(one, "a", lambda texts: [[3.0] for _ in texts]) == [1.0]
+
+    def test_full_disk_store(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path), memory_size=0, disk_max_bytes=1)
+        one, two = get_namespace("", "one"), get_namespace("", "two")
+        cache.embed(one, "a", lambda texts: [[1.0] for _ in texts])
+        cache.embed(two, "b", lambda texts: [[2.0] for _ in texts])
+
+        # Both namespaces were dropped before writing, memory_size=0 leaves
+        # lookups to the disk store
+        assert cache.get_many(two, ["b"]) == {"b": [2.0]}
+        assert cache.get_many(one, ["a"]) == {}
+
+    def test_tracks_disk_size_between_measurements(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path), memory_size=0, disk_max_bytes=1 << 20)
+        namespace = get_namespace("", "model")
+        cache.embed(namespace, "a", lambda texts: [[1.0] * 256 for _ in texts])
+        size, measured_at = cache.disk_size, cache.disk_size_measured_at
+
+        # Counted without querying the store again
+        cache.embed(namespace, "b", lambda texts: [[2.0] * 256 for _ in texts])
+        assert cache.disk_size > size + 1024
+        assert cache.disk_size_measured_at == measured_at
+
+    def test_concurrent_threads(self, tmp_path):
+        cache = EmbeddingCache(str(tmp_path), memory_size=0, disk_max_bytes=1 << 20)
+        namespace = get_namespace("", "model")
+
+        def embed(writer: int):
+            texts = [f"w{writer}-{i}" for i in range(20)]
+            for text in texts:
+                cache.embed(namespace, text, lambda texts: [get_vector(texts[0])])
+            return cache.get_many(namespace, texts)
+
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(embed, range(4)))
+
+        for result in results:
+            assert len(result) == 20
+            for text, vector in result.items():
+                assert vector == pytest.approx(get_vector(text))
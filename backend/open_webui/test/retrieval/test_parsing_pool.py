@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from open_webui.retrieval.loaders.pool import ParsingPool
+
+
+class TestParsingPool:
+    def test_timeout(self):
+        pool = ParsingPool(
+            workers=1, timeout=1, memory_limit_mb=0, pdf_pages_per_task=1
+        )
+        try:
+            with pytest.raises(Exception, match="timed out"):
+                list(
+                    pool.map(
+                        "text",
+                        time.monotonic() + 1,
+                        [(time.sleep, (30,))],
+                        flatten=False,
+                    )
+                )
+        finally:
+            pool.shutdown()
+
+    def test_other_files_survive_timeouts(self):
+        # Every timeout resets the group's pool; the tasks of other files are
+        # resubmitted however often that happens
+        pool = ParsingPool(
+            workers=3, timeout=1, memory_limit_mb=0, pdf_pages_per_task=1
+        )
+        results = []
+
+        def parse():
+            results.extend(
+                pool.map(
+                    "text",
+                    time.monotonic() + 60,
+                    [(time.sleep, (3,))],
+                    flatten=False,
+                )
+            )
+
+        thread = threading.Thread(target=parse)
+        thread.start()
+        try:
+            for _ in range(2):
+                with pytest.raises(Exception, match="timed out"):
+                    list(
+                        pool.map(
+                            "text",
+                            time.monotonic() + 1,
+                            [(time.sleep, (30,))],
+                            flatten=False,
+                        )
+                    )
+            thread.join(timeout=60)
+        finally:
+            pool.shutdown()
+
+        assert results == [None]
@@ -0,0 +1,83 @@
+import json
+import struct
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from open_webui.retrieval.vector.dbs.pgvector import (
+    COPY_HEADER,
+    COPY_TRAILER,
+    VECTOR_LENGTH,
+    PgvectorClient,
+)
+
+
+def decode_copy_row(row: bytes) -> list[bytes]:
+    (count,) = struct.unpack_from("!h", row)
+    offset = 2
+    fields = []
+    for _ in range(count):
+        (length,) = struct.unpack_from("!i", row, offset)
+        offset += 4
+        fields.append(row[offset : offset + length])
+        offset += length
+    assert offset == len(row)
+    return fields
+
+
+@pytest.fixture
+def client():
+    # Encoding needs no connection
+    return PgvectorClient.__new__(PgvectorClient)
+
+
+class TestEncodeCopyRow:
+    def test_fields(self, client):
+        row = client.encode_copy_row(
+            "file-1",
+            {
+                "id": "chunk-1",
+                "vector": [0.5, -1.25, 3.0],
+                "text": "héllo\nwörld",
+                "metadata": {"page": 1, "created": datetime(2025, 1, 1)},
+            },
+        )
+        id, vector, collection_name, text, metadata = decode_copy_row(row)
+
+        assert id == b"chunk-1"
+        assert collection_name == b"file-1"
+        assert text.decode() == "héllo\nwörld"
+
+        # pgvector binary format: dimensions, unused, big-endian float32 values
+        dim, unused = struct.unpack_from("!hh", vector)
+        assert (dim, unused) == (VECTOR_LENGTH, 0)
+        values = np.frombuffer(vector[4:], dtype=">f4")
+        assert values[:3].tolist() == [0.5, -1.25, 3.0]
+        assert not values[3:].any()
+
+        # jsonb binary format: version byte, then the JSON text
+        assert metadata[:1] == b"\x01"
+        assert json.loads(metadata[1:]) == {"page": 1, "created": "2025-01-01 00:00:00"}
+
+    def test_does_not_modify_item(self, client):
+        item = {"id": "a", "vector": [1.0], "text": "", "metadata": {}}
+        client.encode_copy_row("c", item)
+        assert item["vector"] == [1.0]
+
+    def test_vector_too_long(self, client):
+        with pytest.raises(Exception, match="not supported"):
+            client.encode_copy_row(
+                "c",
+                {
+                    "id": "a",
+                    "vector": [0.0] * (VECTOR_LENGTH + 1),
+                    "text": "",
+                    "metadata": {},
+                },
+            )
+
+    def test_copy_framing(self):
+        # Signature, flags and header extension length, then a -1 field count
+        assert COPY_HEADER == b"PGCOPY\n\xff\r\n\x00" + b"\x00" * 8
+        assert COPY_TRAILER == b"\xff\xff"
@@ -37,7 +37,8 @@ from open_webui.models.functions import Functions
 from open_webui.models.models import Models
 
 
-from open_webui.utils.plugin import load_function_module_by_id
+from open_webui.utils.filter import FILTER_PIPELINES
+from open_webui.utils.plugin import get_function_module
 from open_webui.utils.models import get_all_models, check_model_access
 from open_webui.utils.payload import convert_payload_openai_to_ollama
 from open_webui.utils.response import (
@@ -70,7 +71,9 @@ async def generate_chat_completion(
 
     # Process the form_data through the pipeline
     try:
-        form_data = process_pipeline_inlet_filter(request, form_data, user, models)
+        form_data = await process_pipeline_inlet_filter(
+            request, form_data, user, models
+        )
     except Exception as e:
         raise e
 
@@ -173,7 +176,7 @@ async def chat_completed(request: Request, form_data: dict, user: Any):
     model = models[model_id]
 
     try:
-        data = process_pipeline_outlet_filter(request, data, user, models)
+        data = await process_pipeline_outlet_filter(request, data, user, models)
     except Exception as e:
         return Exception(f"Error: {e}")
 
@@ -195,59 +198,17 @@ async def chat_completed(request: Request, form_data: dict, user: Any):
         }
     )
 
-    def get_priority(function_id):
-        function = Functions.get_function_by_id(function_id)
-        if function is not None and hasattr(function, "valves"):
-            # TODO: Fix FunctionModel to include vavles
-            return (function.valves if function.valves else {}).get("priority", 0)
-        return 0
-
-    filter_ids = [function.id for function in Functions.get_global_filter_functions()]
-    if "info" in model and "meta" in model["info"]:
-        filter_ids.extend(model["info"]["meta"].get("filterIds", []))
-        filter_ids = list(set(filter_ids))
-
-    enabled_filter_ids = [
-        function.id
-        for function in Functions.get_functions_by_type("filter", active_only=True)
-    ]
-    filter_ids = [
-        filter_id for filter_id in filter_ids if filter_id in enabled_filter_ids
-    ]
-
-    # Sort filter_ids by priority, using the get_priority function
-    filter_ids.sort(key=get_priority)
-
-    for filter_id in filter_ids:
-        filter = Functions.get_function_by_id(filter_id)
-        if not filter:
-            continue
-
-        if filter_id in request.app.state.FUNCTIONS:
-            function_module = request.app.state.FUNCTIONS[filter_id]
-        else:
-            function_module, _, _ = load_function_module_by_id(filter_id)
-            request.app.state.FUNCTIONS[filter_id] = function_module
-
-        if hasattr(function_module, "valves") and hasattr(function_module, "Valves"):
-            valves = Functions.get_function_valves_by_id(filter_id)
-            function_module.valves = function_module.Valves(
-                **(valves if valves else {})
-            )
-
-        if not hasattr(function_module, "outlet"):
+    for filter in FILTER_PIPELINES.get(model):
+        if not filter.outlet:
             continue
         try:
-            outlet = function_module.outlet
-
-            # Get the signature of the function
-            sig = inspect.signature(outlet)
+            outlet = filter.outlet
             params = {"body": data}
 
             # Extra parameters to be passed to the function
             extra_params = {
                 "__model__": model,
-                "__id__": filter_id,
+                "__id__": filter.id,
                 "__event_emitter__": __event_emitter__,
                 "__event_call__": __event_call__,
                 "__request__": request,
@@ -255,10 +216,10 @@ async def chat_completed(request: Request, form_data: dict, user: Any):
 
             # Add extra params in contained in function signature
             for key, value in extra_params.items():
-                if key in sig.parameters:
+                if key in filter.outlet_params:
                     params[key] = value
 
-            if "__user__" in sig.parameters:
+            if "__user__" in filter.outlet_params:
                 __user__ = {
                     "id": user.id,
                     "email": user.email,
@@ -267,12 +228,8 @@ async def chat_completed(request: Request, form_data: dict, user: Any):
                 }
 
                 try:
-                    if hasattr(function_module, "UserValves"):
-                        __user__["valves"] = function_module.UserValves(
-                            **Functions.get_user_valves_by_id_and_user_id(
-                                filter_id, user.id
-                            )
-                        )
+                    if hasattr(filter.module, "UserValves"):
+                        __user__["valves"] = filter.get_user_valves(user)
                 except Exception as e:
                     print(e)
 
@@ -327,11 +284,7 @@ async def chat_action(request: Request, action_id: str, form_data: dict, user: A
         }
     )
 
-    if action_id in request.app.state.FUNCTIONS:
-        function_module = request.app.state.FUNCTIONS[action_id]
-    else:
-        function_module, _, _ = load_function_module_by_id(action_id)
-        request.app.state.FUNCTIONS[action_id] = function_module
+    function_module = get_function_module(action_id)
 
     if hasattr(function_module, "valves") and hasattr(function_module, "Valves"):
         valves = Functions.get_function_valves_by_id(action_id)
@@ -0,0 +1,118 @@
+import inspect
+import logging
+import threading
+from typing import Optional
+
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.models.functions import Functions
+from open_webui.models.users import UserModel
+from open_webui.utils.plugin import PLUGIN_MODULES, get_function_module
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class Filter:
+    """
+    A filter function resolved for a pipeline: its module with the valves
+    applied and the parameters its inlet and outlet accept.
+    """
+
+    def __init__(self, id: str, module):
+        self.id = id
+        self.module = module
+
+        # Check if the function has a file_handler variable
+        self.file_handler = getattr(module, "file_handler", None)
+
+        self.inlet = getattr(module, "inlet", None)
+        self.inlet_params = (
+            set(inspect.signature(self.inlet).parameters) if self.inlet else set()
+        )
+        self.outlet = getattr(module, "outlet", None)
+        self.outlet_params = (
+            set(inspect.signature(self.outlet).parameters) if self.outlet else set()
+        )
+
+    def get_user_valves(self, user: UserModel):
+        # Read from the settings of the user loaded for the request
+        if not hasattr(self.module, "UserValves"):
+            return None
+
+        settings = user.settings.model_dump() if user.settings else {}
+        valves = settings.get("functions", {}).get("valves", {}).get(self.id, {})
+        return self.module.UserValves(**valves)
+
+
+class FilterPipelineCache:
+    """
+    Ordered filter functions of each model, so a chat request runs its inlet and
+    outlet filters without querying the functions.
+
+    Pipelines are keyed by model id and the model's filter ids, so editing a
+    model's filters builds a new one. Every pipeline is dropped when a function,
+    its valves or its state changes (see FunctionsVersion).
+    """
+
+    def __init__(self):
+        self.pipelines: dict[tuple, list[Filter]] = {}
+        self.version: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def get(self, model: dict) -> list[Filter]:
+        model_filter_ids = model.get("info", {}).get("meta", {}).get("filterIds", [])
+        key = (model["id"], tuple(model_filter_ids))
+
+        version = Functions.version.get()
+        with self.lock:
+            if version != self.version:
+                self.pipelines = {}
+                self.version = version
+
+            pipeline = self.pipelines.get(key)
+        # A module reloaded since the pipeline was built is picked up
+        if pipeline is not None and all(
+            PLUGIN_MODULES.functions.get(filter.id) is filter.module
+            for filter in pipeline
+        ):
+            return pipeline
+
+        pipeline = self.build(model_filter_ids)
+        with self.lock:
+            if version == self.version:
+                self.pipelines[key] = pipeline
+        return pipeline
+
+    def build(self, model_filter_ids: list[str]) -> list[Filter]:
+        functions = Functions.get_functions_by_type("filter", active_only=True)
+
+        filter_ids = [function.id for function in functions if function.is_global]
+        enabled_filter_ids = {function.id for function in functions}
+        for filter_id in model_filter_ids:
+            if filter_id in enabled_filter_ids and filter_id not in filter_ids:
+                filter_ids.append(filter_id)
+
+        valves = {
+            filter_id: Functions.get_function_valves_by_id(filter_id) or {}
+            for filter_id in filter_ids
+        }
+        # Sort filter_ids by priority, keeping global filters first on ties
+        filter_ids.sort(key=lambda filter_id: valves[filter_id].get("priority", 0))
+
+        pipeline = []
+        for filter_id in filter_ids:
+            function_module = get_function_module(filter_id)
+
+            # Apply valves to the function
+            if hasattr(function_module, "valves") and hasattr(
+                function_module, "Valves"
+            ):
+                function_module.valves = function_module.Valves(**valves[filter_id])
+
+            pipeline.append(Filter(filter_id, function_module))
+
+        log.debug(f"Built filter pipeline: {filter_ids}")
+        return pipeline
+
+
+FILTER_PIPELINES = FilterPipelineCache()
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+from open_webui.env import (
+    AIOHTTP_CLIENT_POOL_LIMIT,
+    AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST,
+    AIOHTTP_CLIENT_DNS_CACHE_TTL,
+    AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT,
+    AIOHTTP_CLIENT_DRAIN_TIMEOUT,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+def get_upstream_key(url: str) -> str:
+    parsed_url = urlparse(url)
+    return f"{parsed_url.scheme}://{parsed_url.netloc}"
+
+
+class UpstreamClientRegistry:
+    """
+    One long-lived aiohttp session (and connection pool) per upstream host.
+
+    Sessions are created on first use and reused for every request to that host,
+    so requests to the same backend share keep-alive connections and the DNS cache
+    instead of paying a new TCP/TLS handshake each time.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        limit_per_host: int,
+        dns_cache_ttl: int,
+        keepalive_timeout: float,
+        drain_timeout: float,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.drain_timeout = drain_timeout
+
+        self.sessions: dict[str, aiohttp.ClientSession] = {}
+
+    def get_session(self, url: str, trust_env: bool = True) -> aiohttp.ClientSession:
+        # Sessions that ignore the proxy environment are pooled separately
+        key = get_upstream_key(url)
+        if not trust_env:
+            key = f"{key} (direct)"
+
+        session = self.sessions.get(key)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            # Shared by every user of the host, so upstream cookies are not kept
+            session = aiohttp.ClientSession(
+                connector=connector,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                trust_env=trust_env,
+            )
+            self.sessions[key] = session
+
+        return session
+
+    def get_pool_stats(self, session: aiohttp.ClientSession) -> dict:
+        connector = session.connector
+        if connector is None:
+            return {}
+
+        acquired = len(getattr(connector, "_acquired", []))
+        idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+        waiting = sum(
+            len(waiters) for waiters in getattr(connector, "_waiters", {}).values()
+        )
+
+        return {
+            "open": acquired + idle,
+            "active": acquired,
+            "idle": idle,
+            "waiting": waiting,
+            "limit": connector.limit,
+            "limit_per_host": connector.limit_per_host,
+            "closed": session.closed,
+        }
+
+    def get_stats(self) -> dict:
+        return {
+            key: self.get_pool_stats(session) for key, session in self.sessions.items()
+        }
+
+    async def close(self):
+        # Let in-flight requests (e.g. streamed completions) finish before closing
+        deadline = time.monotonic() + self.drain_timeout
+        while time.monotonic() < deadline and any(
+            self.get_pool_stats(session).get("active", 0)
+            for session in self.sessions.values()
+        ):
+            await asyncio.sleep(0.1)
+
+        sessions = list(self.sessions.values())
+        self.sessions = {}
+        for session in sessions:
+            try:
+                await session.close()
+            except Exception as e:
+                log.debug(f"Error closing upstream session: {e}")
+
+
+async def cleanup_response(response: Optional[aiohttp.ClientResponse]):
+    # Return the connection to the pool (or close it if the body was not consumed)
+    if response:
+        response.release()
+
+
+async def stream_response_content(
+    response: aiohttp.ClientResponse, on_close: Optional[Callable[[], None]] = None
+):
+    # Body of a StreamingResponse; cleanup runs however the stream ends, including
+    # upstream errors and client disconnects (which skip background tasks)
+    try:
+        async for chunk in response.content:
+            yield chunk
+    finally:
+        await cleanup_response(response)
+        if on_close:
+            on_close()
+
+
+UPSTREAM_CLIENTS = UpstreamClientRegistry(
+    limit=AIOHTTP_CLIENT_POOL_LIMIT,
+    limit_per_host=AIOHTTP_CLIENT_POOL_LIMIT_PER_HOST,
+    dns_cache_ttl=AIOHTTP_CLIENT_DNS_CACHE_TTL,
+    keepalive_timeout=AIOHTTP_CLIENT_KEEPALIVE_TIMEOUT,
+    drain_timeout=AIOHTTP_CLIENT_DRAIN_TIMEOUT,
+)
@@ -0,0 +1,217 @@
+import logging
+import random
+import time
+from typing import Optional
+
+from open_webui.env import (
+    LOAD_BALANCER_EJECT_FAILURES,
+    LOAD_BALANCER_EJECT_DURATION,
+    SRC_LOG_LEVELS,
+)
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+STRATEGIES = ["least_outstanding", "ewma", "weighted_round_robin", "random"]
+
+# Smoothing factor for the latency moving average
+EWMA_ALPHA = 0.3
+
+
+class BackendState:
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.ewma_latency: Optional[float] = None
+        self.total_latency = 0.0
+        self.successes = 0
+
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+        # Smooth weighted round-robin counter
+        self.current_weight = 0.0
+
+        self.loaded_models: set[str] = set()
+
+    def is_ejected(self, now: float) -> bool:
+        return self.ejected_until > now
+
+
+class LoadBalancer:
+    """
+    Picks a backend url for a request out of the urls that serve the model.
+
+    Backends are tracked by url: requests in flight (including open streams), an
+    exponentially weighted moving average of time to first byte, and consecutive
+    failures. A backend that fails `eject_failures` times in a row is skipped for
+    `eject_duration` seconds (unless every candidate is ejected); after that it is
+    tried again and a single further failure ejects it again.
+    """
+
+    def __init__(
+        self,
+        strategy: str = "least_outstanding",
+        prefer_loaded: bool = False,
+        eject_failures: int = LOAD_BALANCER_EJECT_FAILURES,
+        eject_duration: float = LOAD_BALANCER_EJECT_DURATION,
+        loaded_slack: int = 2,
+    ):
+        if strategy not in STRATEGIES:
+            log.warning(
+                f"Unknown load balancing strategy '{strategy}', using least_outstanding"
+            )
+            strategy = "least_outstanding"
+
+        self.strategy = strategy
+        self.prefer_loaded = prefer_loaded
+        self.eject_failures = eject_failures
+        self.eject_duration = eject_duration
+        # How many more in-flight requests a node with the model already loaded may
+        # have than the least busy node before it stops being preferred
+        self.loaded_slack = loaded_slack
+
+        self.backends: dict[str, BackendState] = {}
+        self.loaded_models_updated_at = 0.0
+
+    def get_backend(self, url: str) -> BackendState:
+        if url not in self.backends:
+            self.backends[url] = BackendState()
+        return self.backends[url]
+
+    def select(
+        self,
+        urls: list[str],
+        model: Optional[str] = None,
+        weights: Optional[dict[str, float]] = None,
+    ) -> str:
+        if not urls:
+            raise ValueError("No backend urls to select from")
+        if len(urls) == 1:
+            return urls[0]
+
+        weights = weights or {}
+        now = time.monotonic()
+
+        candidates = [url for url in urls if not self.get_backend(url).is_ejected(now)]
+        if not candidates:
+            # Every backend is ejected; fail open rather than refusing the request
+            candidates = list(urls)
+
+        if self.prefer_loaded and model:
+            loaded = [
+                url
+                for url in candidates
+                if model in self.get_backend(url).loaded_models
+            ]
+            if loaded and min(
+                self.get_backend(url).in_flight for url in loaded
+            ) <= self.loaded_slack + min(
+                self.get_backend(url).in_flight for url in candidates
+            ):
+                candidates = loaded
+
+        if len(candidates) == 1:
+            return candidates[0]
+
+        def get_weight(url):
+            return max(float(weights.get(url, 1) or 1), 0.01)
+
+        if self.strategy == "random":
+            return random.choices(
+                candidates, weights=[get_weight(url) for url in candidates]
+            )[0]
+
+        if self.strategy == "weighted_round_robin":
+            total = 0.0
+            best = None
+            for url in candidates:
+                backend = self.get_backend(url)
+                backend.current_weight += get_weight(url)
+                total += get_weight(url)
+                if best is None or backend.current_weight > best[1].current_weight:
+                    best = (url, backend)
+            best[1].current_weight -= total
+            return best[0]
+
+        if self.strategy == "ewma":
+            # Untried backends have no latency yet and are picked first
+            def score(url):
+                backend = self.get_backend(url)
+                latency = backend.ewma_latency or 0.0
+                return latency * (backend.in_flight + 1) / get_weight(url)
+
+        else:
+
+            def score(url):
+                return (self.get_backend(url).in_flight + 1) / get_weight(url)
+
+        scores = {url: score(url) for url in candidates}
+        lowest = min(scores.values())
+        return random.choice([url for url in candidates if scores[url] == lowest])
+
+    def acquire(self, url: str) -> float:
+        backend = self.get_backend(url)
+        backend.in_flight += 1
+        backend.requests += 1
+        return time.monotonic()
+
+    def release(self, url: str):
+        backend = self.get_backend(url)
+        backend.in_flight = max(backend.in_flight - 1, 0)
+
+    def record_success(self, url: str, latency: Optional[float] = None):
+        backend = self.get_backend(url)
+        backend.consecutive_failures = 0
+        backend.successes += 1
+        if latency is not None:
+            backend.total_latency += latency
+            if backend.ewma_latency is None:
+                backend.ewma_latency = latency
+            else:
+                backend.ewma_latency = (
+                    EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * backend.ewma_latency
+                )
+
+    def record_failure(self, url: str):
+        backend = self.get_backend(url)
+        backend.errors += 1
+        backend.consecutive_failures += 1
+
+        if self.eject_failures and backend.consecutive_failures >= self.eject_failures:
+            if not backend.is_ejected(time.monotonic()):
+                log.warning(
+                    f"Ejecting backend {url} for {self.eject_duration}s after "
+                    f"{backend.consecutive_failures} consecutive failures"
+                )
+            backend.ejected_until = time.monotonic() + self.eject_duration
+
+    def set_loaded_models(self, url: str, models: list[str]):
+        self.get_backend(url).loaded_models = set(models)
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "strategy": self.strategy,
+            "prefer_loaded": self.prefer_loaded,
+            "backends": {
+                url: {
+                    "in_flight": backend.in_flight,
+                    "requests": backend.requests,
+                    "errors": backend.errors,
+                    "ewma_latency": backend.ewma_latency,
+                    "avg_latency": (
+                        backend.total_latency / backend.successes
+                        if backend.successes
+                        else None
+                    ),
+                    "consecutive_failures": backend.consecutive_failures,
+                    "ejected": backend.is_ejected(now),
+                    "ejected_for": max(backend.ejected_until - now, 0.0),
+                    "loaded_models": sorted(backend.loaded_models),
+                }
+                for url, backend in self.backends.items()
+            },
+        }
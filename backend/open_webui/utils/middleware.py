@@ -20,6 +20,8 @@ from starlette.responses import Response, StreamingResponse
 
 from open_webui.models.chats import Chats
 from open_webui.models.users import Users
+from open_webui.models.files import Files
+from open_webui.socket.buffer import CHAT_MESSAGE_BUFFER
 from open_webui.socket.main import (
     get_event_call,
     get_event_emitter,
@@ -35,15 +37,17 @@ from open_webui.utils.webhook import post_webhook
 
 
 from open_webui.models.users import UserModel
-from open_webui.models.functions import Functions
 from open_webui.models.models import Models
 
+from open_webui.retrieval.ingestion import INGESTION_JOBS
+from open_webui.retrieval.query_cache import RETRIEVAL_QUERY_CACHE, normalize_messages
 from open_webui.retrieval.utils import get_sources_from_files
 
 
 from open_webui.utils.chat import generate_chat_completion
 from open_webui.utils.task import (
     get_task_model_id,
+    query_generation_template,
     rag_template,
     tools_function_calling_generation_template,
 )
@@ -54,13 +58,20 @@ from open_webui.utils.misc import (
     get_last_assistant_message,
     prepend_to_first_user_message_content,
 )
-from open_webui.utils.tools import get_tools
-from open_webui.utils.plugin import load_function_module_by_id
+from open_webui.utils.tools import get_tools, has_file_handler
+from open_webui.utils.filter import FILTER_PIPELINES
 
 
 from open_webui.tasks import create_task
 
-from open_webui.config import DEFAULT_TOOLS_FUNCTION_CALLING_PROMPT_TEMPLATE
+from open_webui.config import (
+    DEFAULT_QUERY_GENERATION_PROMPT_TEMPLATE,
+    DEFAULT_TOOLS_FUNCTION_CALLING_PROMPT_TEMPLATE,
+    INGESTION_JOB_WAIT_TIMEOUT,
+    RETRIEVAL_QUERY_SKIP_FIRST_MESSAGE,
+    RETRIEVAL_QUERY_SKIP_MAX_WORDS,
+    RETRIEVAL_QUERY_SKIP_WITHOUT_KNOWLEDGE,
+)
 from open_webui.env import (
     SRC_LOG_LEVELS,
     GLOBAL_LOG_LEVEL,
@@ -75,62 +86,18 @@ log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MAIN"])
 
 
-async def chat_completion_filter_functions_handler(request, body, model, extra_params):
+async def chat_completion_filter_functions_handler(
+    request, body, model, extra_params, user
+):
     skip_files = None
 
-    def get_filter_function_ids(model):
-        def get_priority(function_id):
-            function = Functions.get_function_by_id(function_id)
-            if function is not None and hasattr(function, "valves"):
-                # TODO: Fix FunctionModel
-                return (function.valves if function.valves else {}).get("priority", 0)
-            return 0
-
-        filter_ids = [
-            function.id for function in Functions.get_global_filter_functions()
-        ]
-        if "info" in model and "meta" in model["info"]:
-            filter_ids.extend(model["info"]["meta"].get("filterIds", []))
-            filter_ids = list(set(filter_ids))
-
-        enabled_filter_ids = [
-            function.id
-            for function in Functions.get_functions_by_type("filter", active_only=True)
-        ]
-
-        filter_ids = [
-            filter_id for filter_id in filter_ids if filter_id in enabled_filter_ids
-        ]
+    for filter in FILTER_PIPELINES.get(model):
+        if filter.file_handler:
+            skip_files = filter.file_handler
 
-        filter_ids.sort(key=get_priority)
-        return filter_ids
-
-    filter_ids = get_filter_function_ids(model)
-    for filter_id in filter_ids:
-        filter = Functions.get_function_by_id(filter_id)
-        if not filter:
-            continue
-
-        if filter_id in request.app.state.FUNCTIONS:
-            function_module = request.app.state.FUNCTIONS[filter_id]
-        else:
-            function_module, _, _ = load_function_module_by_id(filter_id)
-            request.app.state.FUNCTIONS[filter_id] = function_module
-
-        # Check if the function has a file_handler variable
-        if hasattr(function_module, "file_handler"):
-            skip_files = function_module.file_handler
-
-        # Apply valves to the function
-        if hasattr(function_module, "valves") and hasattr(function_module, "Valves"):
-            valves = Functions.get_function_valves_by_id(filter_id)
-            function_module.valves = function_module.Valves(
-                **(valves if valves else {})
-            )
-
-        if hasattr(function_module, "inlet"):
+        if filter.inlet:
             try:
-                inlet = function_module.inlet
+                inlet = filter.inlet
 
                 # Create a dictionary of parameters to be passed to the function
                 params = {"body": body} | {
@@ -138,18 +105,14 @@ async def chat_completion_filter_functions_handler(request, body, model, extra_p
                     for k, v in {
                         **extra_params,
                         "__model__": model,
-                        "__id__": filter_id,
+                        "__id__": filter.id,
                     }.items()
-                    if k in inspect.signature(inlet).parameters
+                    if k in filter.inlet_params
                 }
 
-                if "__user__" in params and hasattr(function_module, "UserValves"):
+                if "__user__" in params and hasattr(filter.module, "UserValves"):
                     try:
-                        params["__user__"]["valves"] = function_module.UserValves(
-                            **Functions.get_user_valves_by_id_and_user_id(
-                                filter_id, params["__user__"]["id"]
-                            )
-                        )
+                        params["__user__"]["valves"] = filter.get_user_valves(user)
                     except Exception as e:
                         print(e)
 
@@ -333,7 +296,7 @@ async def chat_completion_tools_handler(
     if skip_files and "files" in body.get("metadata", {}):
         del body["metadata"]["files"]
 
-    return body, {"sources": sources}
+    return body, {"sources": sources, "skip_files": skip_files}
 
 
 async def chat_web_search_handler(
@@ -486,47 +449,154 @@ async def chat_web_search_handler(
     return form_data
 
 
-async def chat_completion_files_handler(
+def get_retrieval_query_skip_reason(body: dict) -> Optional[str]:
+    messages = body["messages"]
+
+    if RETRIEVAL_QUERY_SKIP_MAX_WORDS > 0:
+        user_message = get_last_user_message(messages) or ""
+        if len(user_message.split()) <= RETRIEVAL_QUERY_SKIP_MAX_WORDS:
+            return "short_message"
+
+    if RETRIEVAL_QUERY_SKIP_FIRST_MESSAGE:
+        if sum(1 for message in messages if message.get("role") == "user") <= 1:
+            return "first_message"
+
+    if RETRIEVAL_QUERY_SKIP_WITHOUT_KNOWLEDGE:
+        files = body.get("metadata", {}).get("files", None) or []
+        if not any(
+            file.get("type") == "collection" or file.get("collection_names")
+            for file in files
+        ):
+            return "without_knowledge"
+
+    return None
+
+
+async def get_retrieval_queries(
     request: Request, body: dict, user: UserModel
-) -> tuple[dict, dict[str, list]]:
-    sources = []
+) -> list[str]:
+    config = request.app.state.config
+    user_message = get_last_user_message(body["messages"])
+
+    # generate_queries would refuse, don't wait for it
+    if not config.ENABLE_RETRIEVAL_QUERY_GENERATION:
+        return [user_message]
+
+    if reason := get_retrieval_query_skip_reason(body):
+        log.debug(f"Skipping retrieval query generation: {reason}")
+        RETRIEVAL_QUERY_CACHE.record_skip(reason)
+        return [user_message]
+
+    key = None
+    if RETRIEVAL_QUERY_CACHE.enabled and body["model"] in request.app.state.MODELS:
+        task_model_id = get_task_model_id(
+            body["model"],
+            config.TASK_MODEL,
+            config.TASK_MODEL_EXTERNAL,
+            request.app.state.MODELS,
+        )
+        template = config.QUERY_GENERATION_PROMPT_TEMPLATE
+        if template.strip() == "":
+            template = DEFAULT_QUERY_GENERATION_PROMPT_TEMPLATE
+
+        key = RETRIEVAL_QUERY_CACHE.get_key(
+            task_model_id,
+            query_generation_template(
+                template, normalize_messages(body["messages"]), {"name": user.name}
+            ),
+        )
+        if (queries := RETRIEVAL_QUERY_CACHE.get(key)) is not None:
+            log.debug(f"Using cached retrieval queries: {queries}")
+            return queries
+
+    try:
+        start = time.perf_counter()
+        queries_response = await generate_queries(
+            request,
+            {
+                "model": body["model"],
+                "messages": body["messages"],
+                "type": "retrieval",
+            },
+            user,
+        )
+        queries_response = queries_response["choices"][0]["message"]["content"]
+        RETRIEVAL_QUERY_CACHE.record_generation(time.perf_counter() - start)
 
-    if files := body.get("metadata", {}).get("files", None):
         try:
-            queries_response = await generate_queries(
-                request,
-                {
-                    "model": body["model"],
-                    "messages": body["messages"],
-                    "type": "retrieval",
-                },
-                user,
-            )
-            queries_response = queries_response["choices"][0]["message"]["content"]
+            bracket_start = queries_response.find("{")
+            bracket_end = queries_response.rfind("}") + 1
 
-            try:
-                bracket_start = queries_response.find("{")
-                bracket_end = queries_response.rfind("}") + 1
+            if bracket_start == -1 or bracket_end == -1:
+                raise Exception("No JSON object found in the response")
 
-                if bracket_start == -1 or bracket_end == -1:
-                    raise Exception("No JSON object found in the response")
+            queries_response = queries_response[bracket_start:bracket_end]
+            queries_response = json.loads(queries_response)
+        except Exception as e:
+            queries_response = {"queries": [queries_response]}
 
-                queries_response = queries_response[bracket_start:bracket_end]
-                queries_response = json.loads(queries_response)
-            except Exception as e:
-                queries_response = {"queries": [queries_response]}
+        queries = queries_response.get("queries", [])
+        if key and queries:
+            RETRIEVAL_QUERY_CACHE.set(key, queries)
+    except Exception as e:
+        queries = []
+
+    if len(queries) == 0:
+        queries = [user_message]
+    return queries
 
-            queries = queries_response.get("queries", [])
-        except Exception as e:
-            queries = []
 
-        if len(queries) == 0:
-            queries = [get_last_user_message(body["messages"])]
+async def chat_completion_files_handler(
+    request: Request,
+    body: dict,
+    user: UserModel,
+    queries: Optional[list[str]] = None,
+) -> tuple[dict, dict[str, list]]:
+    sources = []
+    unprocessed_files = []
 
-        sources = get_sources_from_files(
+    if files := body.get("metadata", {}).get("files", None):
+        if queries is None:
+            queries = await get_retrieval_queries(request, body, user)
+
+        # Files uploaded right before sending the message may still be processing
+        file_ids = [
+            file["id"]
+            for file in files
+            if file.get("type") == "file" and file.get("id")
+        ]
+        if file_ids:
+            unprocessed = await INGESTION_JOBS.await_files(
+                file_ids, INGESTION_JOB_WAIT_TIMEOUT
+            )
+            if unprocessed:
+                log.warning(f"Skipping files that were not processed: {unprocessed}")
+
+            # The payload holds the upload response, which has no content when
+            # the file was processed in the background
+            file_items = {
+                file.id: file
+                for file in await asyncio.to_thread(Files.get_files_by_ids, file_ids)
+            }
+            files = [
+                (
+                    {**file, "file": file_items[file["id"]].model_dump()}
+                    if file.get("type") == "file" and file.get("id") in file_items
+                    else file
+                )
+                for file in files
+                if not (file.get("type") == "file" and file.get("id") in unprocessed)
+            ]
+            unprocessed_files = [
+                file.get("name") or file.get("id")
+                for file in body["metadata"]["files"]
+                if file.get("type") == "file" and file.get("id") in unprocessed
+            ]
+
+        sources = await get_sources_from_files(
             files=files,
             queries=queries,
-            embedding_function=request.app.state.EMBEDDING_FUNCTION,
+            embedding_function=request.app.state.ASYNC_EMBEDDING_FUNCTION,
             k=request.app.state.config.TOP_K,
             reranking_function=request.app.state.rf,
             r=request.app.state.config.RELEVANCE_THRESHOLD,
@@ -534,7 +604,52 @@ async def chat_completion_files_handler(
         )
 
         log.debug(f"rag_contexts:sources: {sources}")
-    return body, {"sources": sources}
+    return body, {"sources": sources, "unprocessed_files": unprocessed_files}
+
+
+class PayloadStages:
+    """
+    Runs the stages that prepare a chat payload before the completion request.
+
+    A stage starts as soon as the stages it depends on are done, so independent
+    stages (e.g. web search and retrieval query generation, each waiting for
+    the task model) run concurrently. A stage whose dependency failed fails with
+    the same error. The start and duration of every stage are recorded.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.tasks: dict[str, asyncio.Task] = {}
+        self.timings: dict[str, dict] = {}
+
+    def add(self, name: str, fn, after: Optional[list[str]] = None) -> asyncio.Task:
+        dependencies = [self.tasks[dependency] for dependency in after or []]
+
+        async def run():
+            for dependency in dependencies:
+                await dependency
+
+            started_at = time.perf_counter()
+            try:
+                return await fn()
+            finally:
+                self.timings[name] = {
+                    "start": round((started_at - self.started_at) * 1000),
+                    "duration": round((time.perf_counter() - started_at) * 1000),
+                }
+
+        self.tasks[name] = asyncio.create_task(run())
+        return self.tasks[name]
+
+    async def wait(self):
+        # Every task is awaited so none is left running or with an unread error
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    def get_timings(self) -> dict:
+        return {
+            "total": round((time.perf_counter() - self.started_at) * 1000),
+            "stages": self.timings,
+        }
 
 
 def apply_params_to_form_data(form_data, model):
@@ -633,46 +748,115 @@ async def process_chat_payload(request, form_data, metadata, user, model):
         files.extend(knowledge_files)
         form_data["files"] = files
 
+    # Stages run as web_search -> filters -> tools and
+    # retrieval_queries -> retrieval, tool selection and retrieval only depend
+    # on the filtered payload unless a tool may handle the files itself
+    stages = PayloadStages()
+
     features = form_data.pop("features", None)
-    if features:
-        if "web_search" in features and features["web_search"]:
-            form_data = await chat_web_search_handler(
-                request, form_data, extra_params, user
+    if features and "web_search" in features and features["web_search"]:
+        stages.add(
+            "web_search",
+            lambda: chat_web_search_handler(request, form_data, extra_params, user),
+        )
+
+    async def filters():
+        # The web search handler adds its results to form_data
+        payload = form_data
+        try:
+            payload, _ = await chat_completion_filter_functions_handler(
+                request, payload, model, extra_params, user
             )
+        except Exception as e:
+            raise Exception(f"Error: {e}")
+
+        tool_ids = payload.pop("tool_ids", None)
+        files = payload.pop("files", None)
+        # Remove files duplicates
+        if files:
+            files = list({json.dumps(f, sort_keys=True): f for f in files}.values())
+
+        payload["metadata"] = {
+            **metadata,
+            "tool_ids": tool_ids,
+            "files": files,
+        }
+        return payload
 
-    try:
-        form_data, flags = await chat_completion_filter_functions_handler(
-            request, form_data, model, extra_params
-        )
-    except Exception as e:
-        raise Exception(f"Error: {e}")
-
-    tool_ids = form_data.pop("tool_ids", None)
-    files = form_data.pop("files", None)
-    # Remove files duplicates
-    if files:
-        files = list({json.dumps(f, sort_keys=True): f for f in files}.values())
-
-    metadata = {
-        **metadata,
-        "tool_ids": tool_ids,
-        "files": files,
-    }
-    form_data["metadata"] = metadata
+    filters_task = stages.add("filters", filters, after=list(stages.tasks))
 
-    try:
-        form_data, flags = await chat_completion_tools_handler(
-            request, form_data, user, models, extra_params
-        )
+    async def tools():
+        payload = await filters_task
+        try:
+            return await chat_completion_tools_handler(
+                request, payload, user, models, extra_params
+            )
+        except Exception as e:
+            log.exception(e)
+            return None
+
+    async def retrieval_queries():
+        payload = await filters_task
+        if not payload["metadata"].get("files"):
+            return None
+
+        # Don't generate queries that are thrown away when the selected tool
+        # skips the files
+        if has_file_handler(payload["metadata"].get("tool_ids")):
+            result = await tools_task
+            if result is not None and result[1].get("skip_files"):
+                return None
+        return await get_retrieval_queries(request, payload, user)
+
+    async def retrieval():
+        payload = await filters_task
+        queries = await queries_task
+        if queries is None:
+            return None
+
+        try:
+            return await chat_completion_files_handler(
+                request, payload, user, queries=queries
+            )
+        except Exception as e:
+            log.exception(e)
+            return None
+
+    tools_task = stages.add("tools", tools, after=["filters"])
+    queries_task = stages.add("retrieval_queries", retrieval_queries, after=["filters"])
+    retrieval_task = stages.add("retrieval", retrieval, after=["retrieval_queries"])
+
+    await stages.wait()
+    form_data = await filters_task
+
+    skip_files = False
+    if (result := await tools_task) is not None:
+        form_data, flags = result
         sources.extend(flags.get("sources", []))
-    except Exception as e:
-        log.exception(e)
+        skip_files = flags.get("skip_files", False)
 
-    try:
-        form_data, flags = await chat_completion_files_handler(request, form_data, user)
+    # Dropped when a selected tool handles the files itself
+    if (result := await retrieval_task) is not None and not skip_files:
+        _, flags = result
         sources.extend(flags.get("sources", []))
-    except Exception as e:
-        log.exception(e)
+
+        if unprocessed_files := flags.get("unprocessed_files"):
+            await event_emitter(
+                {
+                    "type": "status",
+                    "data": {
+                        "action": "file_processing",
+                        "description": f"Some files could not be processed: {', '.join(unprocessed_files)}",
+                        "files": unprocessed_files,
+                        "done": True,
+                    },
+                }
+            )
+
+    timings = stages.get_timings()
+    log.debug(f"chat payload stages: {timings}")
+    # Its own event type; a status would replace the last one shown to the user
+    await event_emitter({"type": "chat:stages", "data": timings})
 
     # If context is not empty, insert it into the messages
     if len(sources) > 0:
@@ -866,6 +1050,9 @@ async def process_chat_response(
                 content = response["choices"][0]["message"]["content"]
 
                 if content:
+                    await CHAT_MESSAGE_BUFFER.flush(
+                        metadata["chat_id"], metadata["message_id"]
+                    )
 
                     await event_emitter(
                         {
@@ -895,6 +1082,7 @@ async def process_chat_response(
                             "content": content,
                         },
                     )
+                    Chats.materialize_chat_messages_by_id(metadata["chat_id"])
 
                     # Send a webhook notification if the user is not active
                     if get_active_status_by_user_id(user.id) is None:
@@ -929,6 +1117,7 @@ async def process_chat_response(
 
         # Handle as a background task
         async def post_response_handler(response, events):
+            await CHAT_MESSAGE_BUFFER.flush(metadata["chat_id"], metadata["message_id"])
             message = Chats.get_message_by_id_and_message_id(
                 metadata["chat_id"], metadata["message_id"]
             )
@@ -990,13 +1179,11 @@ async def process_chat_response(
                                 content = f"{content}{value}"
 
                                 if ENABLE_REALTIME_CHAT_SAVE:
-                                    # Save message in the database
-                                    Chats.upsert_message_to_chat_by_id_and_message_id(
+                                    # Save message in the database (coalesced)
+                                    CHAT_MESSAGE_BUFFER.set_content(
                                         metadata["chat_id"],
                                         metadata["message_id"],
-                                        {
-                                            "content": content,
-                                        },
+                                        content,
                                     )
                                 else:
                                     data = {
@@ -1021,6 +1208,10 @@ async def process_chat_response(
                 title = Chats.get_chat_title_by_id(metadata["chat_id"])
                 data = {"done": True, "content": content, "title": title}
 
+                await CHAT_MESSAGE_BUFFER.flush(
+                    metadata["chat_id"], metadata["message_id"]
+                )
+
                 if not ENABLE_REALTIME_CHAT_SAVE:
                     # Save message in the database
                     Chats.upsert_message_to_chat_by_id_and_message_id(
@@ -1031,6 +1222,9 @@ async def process_chat_response(
                         },
                     )
 
+                # Fold the streamed message writes back into the chat
+                Chats.materialize_chat_messages_by_id(metadata["chat_id"])
+
                 # Send a webhook notification if the user is not active
                 if get_active_status_by_user_id(user.id) is None:
                     webhook_url = Users.get_user_webhook_url_by_id(user.id)
@@ -1058,6 +1252,10 @@ async def process_chat_response(
                 print("Task was cancelled!")
                 await event_emitter({"type": "task-cancelled"})
 
+                await CHAT_MESSAGE_BUFFER.flush(
+                    metadata["chat_id"], metadata["message_id"]
+                )
+
                 if not ENABLE_REALTIME_CHAT_SAVE:
                     # Save message in the database
                     Chats.upsert_message_to_chat_by_id_and_message_id(
@@ -1068,6 +1266,9 @@ async def process_chat_response(
                         },
                     )
 
+                # Fold the streamed message writes back into the chat
+                Chats.materialize_chat_messages_by_id(metadata["chat_id"])
+
             if response.background is not None:
                 await response.background()
 
@@ -1,6 +1,9 @@
+import hashlib
+import json
 import time
 import logging
 import sys
+from typing import Optional
 
 from aiocache import cached
 from fastapi import Request
@@ -9,11 +12,11 @@ from open_webui.routers import openai, ollama
 from open_webui.functions import get_function_models
 
 
-from open_webui.models.functions import Functions
-from open_webui.models.models import Models
+from open_webui.models.functions import Functions, FunctionModel
+from open_webui.models.models import Models, ModelModel
 
 
-from open_webui.utils.plugin import load_function_module_by_id
+from open_webui.utils.plugin import get_function_module
 from open_webui.utils.access_control import has_access
 
 
@@ -58,113 +61,182 @@ async def get_all_base_models(request: Request):
     return models
 
 
+class ModelRegistry:
+    """
+    The merged model list served by /api/models, indexed by id.
+
+    It is rebuilt only when one of its inputs changes (upstream model lists, custom
+    models, action functions or arena settings), which is detected by hashing the
+    inputs. The hash is exposed as `version` so responses can carry an ETag.
+    """
+
+    def __init__(self):
+        self.models: list[dict] = []
+        self.models_by_id: dict[str, dict] = {}
+        self.version: Optional[str] = None
+
+    def get_fingerprint(self, *inputs) -> str:
+        return hashlib.sha256(
+            json.dumps(inputs, sort_keys=True, default=str).encode()
+        ).hexdigest()[:16]
+
+    def set_models(self, models: list[dict], version: str):
+        self.models = models
+        self.models_by_id = {model["id"]: model for model in models}
+        self.version = version
+
+
+MODEL_REGISTRY = ModelRegistry()
+
+
+def get_arena_models(request: Request) -> list[dict]:
+    if len(request.app.state.config.EVALUATION_ARENA_MODELS) > 0:
+        return [
+            {
+                "id": model["id"],
+                "name": model["name"],
+                "info": {
+                    "meta": model["meta"],
+                },
+                "object": "model",
+                "created": int(time.time()),
+                "owned_by": "arena",
+                "arena": True,
+            }
+            for model in request.app.state.config.EVALUATION_ARENA_MODELS
+        ]
+    else:
+        # Add default arena model
+        return [
+            {
+                "id": DEFAULT_ARENA_MODEL["id"],
+                "name": DEFAULT_ARENA_MODEL["name"],
+                "info": {
+                    "meta": DEFAULT_ARENA_MODEL["meta"],
+                },
+                "object": "model",
+                "created": int(time.time()),
+                "owned_by": "arena",
+                "arena": True,
+            }
+        ]
+
+
 async def get_all_models(request):
-    models = await get_all_base_models(request)
+    base_models = await get_all_base_models(request)
 
     # If there are no models, return an empty list
-    if len(models) == 0:
+    if len(base_models) == 0:
         return []
 
+    custom_models = Models.get_all_models()
+    action_functions = Functions.get_functions_by_type("action")
+
+    version = MODEL_REGISTRY.get_fingerprint(
+        # "created" is set to the current time for some upstream models
+        [
+            {key: value for key, value in model.items() if key != "created"}
+            for model in base_models
+        ],
+        [model.model_dump() for model in custom_models],
+        [
+            (function.id, function.updated_at, function.is_active, function.is_global)
+            for function in action_functions
+        ],
+        request.app.state.config.ENABLE_EVALUATION_ARENA_MODELS,
+        request.app.state.config.EVALUATION_ARENA_MODELS,
+    )
+
+    if version != MODEL_REGISTRY.version:
+        models = build_models(request, base_models, custom_models, action_functions)
+        MODEL_REGISTRY.set_models(models, version)
+        log.debug(f"get_all_models() rebuilt {len(models)} models ({version})")
+
+    request.app.state.MODELS = MODEL_REGISTRY.models_by_id
+    return MODEL_REGISTRY.models
+
+
+def build_models(
+    request: Request,
+    base_models: list[dict],
+    custom_models: list[ModelModel],
+    action_functions: list[FunctionModel],
+) -> list[dict]:
+    # Copy the upstream entries, which are shared with the upstream list caches
+    models = [{**model} for model in base_models]
+
     # Add arena models
     if request.app.state.config.ENABLE_EVALUATION_ARENA_MODELS:
-        arena_models = []
-        if len(request.app.state.config.EVALUATION_ARENA_MODELS) > 0:
-            arena_models = [
-                {
-                    "id": model["id"],
-                    "name": model["name"],
-                    "info": {
-                        "meta": model["meta"],
-                    },
-                    "object": "model",
-                    "created": int(time.time()),
-                    "owned_by": "arena",
-                    "arena": True,
-                }
-                for model in request.app.state.config.EVALUATION_ARENA_MODELS
-            ]
-        else:
-            # Add default arena model
-            arena_models = [
-                {
-                    "id": DEFAULT_ARENA_MODEL["id"],
-                    "name": DEFAULT_ARENA_MODEL["name"],
-                    "info": {
-                        "meta": DEFAULT_ARENA_MODEL["meta"],
-                    },
-                    "object": "model",
-                    "created": int(time.time()),
-                    "owned_by": "arena",
-                    "arena": True,
-                }
-            ]
-        models = models + arena_models
+        models = models + get_arena_models(request)
 
-    global_action_ids = [
-        function.id for function in Functions.get_global_action_functions()
-    ]
-    enabled_action_ids = [
-        function.id
-        for function in Functions.get_functions_by_type("action", active_only=True)
-    ]
+    # Index by id and by id without the ":tag" suffix, so custom models find their
+    # base models without scanning the list
+    models_by_id = {}
+    models_by_prefix = {}
+    for model in models:
+        models_by_id.setdefault(model["id"], model)
+        models_by_prefix.setdefault(model["id"].split(":")[0], []).append(model)
+
+    removed_ids = set()
+    preset_models = []
 
-    custom_models = Models.get_all_models()
     for custom_model in custom_models:
         if custom_model.base_model_id is None:
-            for model in models:
-                if (
-                    custom_model.id == model["id"]
-                    or custom_model.id == model["id"].split(":")[0]
-                ):
-                    if custom_model.is_active:
-                        model["name"] = custom_model.name
-                        model["info"] = custom_model.model_dump()
-
-                        action_ids = []
-                        if "info" in model and "meta" in model["info"]:
-                            action_ids.extend(
-                                model["info"]["meta"].get("actionIds", [])
-                            )
-
-                        model["action_ids"] = action_ids
-                    else:
-                        models.remove(model)
-
-        elif custom_model.is_active and (
-            custom_model.id not in [model["id"] for model in models]
-        ):
+            matching_models = models_by_prefix.get(custom_model.id, [])
+            if custom_model.id in models_by_id and (
+                models_by_id[custom_model.id] not in matching_models
+            ):
+                matching_models = [models_by_id[custom_model.id], *matching_models]
+
+            for model in matching_models:
+                if custom_model.is_active:
+                    model["name"] = custom_model.name
+                    model["info"] = custom_model.model_dump()
+
+                    action_ids = []
+                    if "info" in model and "meta" in model["info"]:
+                        action_ids.extend(model["info"]["meta"].get("actionIds", []))
+
+                    model["action_ids"] = action_ids
+                else:
+                    removed_ids.add(id(model))
+
+        elif custom_model.is_active and (custom_model.id not in models_by_id):
             owned_by = "openai"
             pipe = None
             action_ids = []
 
-            for model in models:
-                if (
-                    custom_model.base_model_id == model["id"]
-                    or custom_model.base_model_id == model["id"].split(":")[0]
-                ):
-                    owned_by = model["owned_by"]
-                    if "pipe" in model:
-                        pipe = model["pipe"]
-                    break
+            base_model = models_by_id.get(custom_model.base_model_id)
+            if base_model is None:
+                base_model = next(
+                    iter(models_by_prefix.get(custom_model.base_model_id, [])), None
+                )
+
+            if base_model is not None:
+                owned_by = base_model["owned_by"]
+                if "pipe" in base_model:
+                    pipe = base_model["pipe"]
 
             if custom_model.meta:
                 meta = custom_model.meta.model_dump()
                 if "actionIds" in meta:
                     action_ids.extend(meta["actionIds"])
 
-            models.append(
-                {
-                    "id": f"{custom_model.id}",
-                    "name": custom_model.name,
-                    "object": "model",
-                    "created": custom_model.created_at,
-                    "owned_by": owned_by,
-                    "info": custom_model.model_dump(),
-                    "preset": True,
-                    **({"pipe": pipe} if pipe is not None else {}),
-                    "action_ids": action_ids,
-                }
-            )
+            model = {
+                "id": f"{custom_model.id}",
+                "name": custom_model.name,
+                "object": "model",
+                "created": custom_model.created_at,
+                "owned_by": owned_by,
+                "info": custom_model.model_dump(),
+                "preset": True,
+                **({"pipe": pipe} if pipe is not None else {}),
+                "action_ids": action_ids,
+            }
+            models_by_id[model["id"]] = model
+            preset_models.append(model)
+
+    models = [model for model in models if id(model) not in removed_ids] + preset_models
 
     # Process action_ids to get the actions
     def get_action_items_from_module(function, module):
@@ -192,33 +264,37 @@ async def get_all_models(request):
                 }
             ]
 
-    def get_function_module_by_id(function_id):
-        if function_id in request.app.state.FUNCTIONS:
-            function_module = request.app.state.FUNCTIONS[function_id]
-        else:
-            function_module, _, _ = load_function_module_by_id(function_id)
-            request.app.state.FUNCTIONS[function_id] = function_module
+    enabled_action_functions = {
+        function.id: function for function in action_functions if function.is_active
+    }
+    global_action_ids = [
+        function.id
+        for function in enabled_action_functions.values()
+        if function.is_global
+    ]
+
+    # Each action's items are built once and shared by every model that uses it
+    action_items = {}
 
     for model in models:
         action_ids = [
             action_id
             for action_id in list(set(model.pop("action_ids", []) + global_action_ids))
-            if action_id in enabled_action_ids
+            if action_id in enabled_action_functions
         ]
 
         model["actions"] = []
         for action_id in action_ids:
-            action_function = Functions.get_function_by_id(action_id)
-            if action_function is None:
-                raise Exception(f"Action not found: {action_id}")
-
-            function_module = get_function_module_by_id(action_id)
-            model["actions"].extend(
-                get_action_items_from_module(action_function, function_module)
-            )
+            if action_id not in action_items:
+                action_function = enabled_action_functions[action_id]
+                function_module = get_function_module(action_id)
+                action_items[action_id] = get_action_items_from_module(
+                    action_function, function_module
+                )
+
+            model["actions"].extend(action_items[action_id])
     log.debug(f"get_all_models() returned {len(models)} models")
 
-    request.app.state.MODELS = {model["id"]: model for model in models}
     return models
 
 
@@ -1,13 +1,18 @@
+import hashlib
 import os
 import re
 import subprocess
 import sys
+import threading
+import uuid
 from importlib import util
+from pathlib import Path
+from typing import Optional
 import types
-import tempfile
 import logging
 
-from open_webui.env import SRC_LOG_LEVELS
+from open_webui.env import SRC_LOG_LEVELS, WEBSOCKET_MANAGER, WEBSOCKET_REDIS_URL
+from open_webui.config import CACHE_DIR
 from open_webui.models.functions import Functions
 from open_webui.models.tools import Tools
 
@@ -68,39 +73,195 @@ def replace_imports(content):
     return content
 
 
-def load_tools_module_by_id(toolkit_id, content=None):
+####################
+# Module Cache
+####################
+
+
+class PluginModuleCache:
+    """
+    Loaded function and tool modules, shared by every request of the worker.
+
+    Sources are compiled once per content hash and the code objects reused, so
+    reloading a module whose content did not change only executes it. Each
+    source is written to the cache directory under its hash and used as the
+    module's `__file__`.
+
+    Creating, updating or deleting a function or tool drops its module. When
+    Redis is configured the invalidation is published so every worker drops it
+    as well and loads the new content on next use.
+    """
+
+    CHANNEL = "open-webui:plugin_modules"
+
+    def __init__(self, cache_dir: str, redis_url: Optional[str] = None):
+        self.cache_dir = Path(cache_dir)
+        self.redis_url = redis_url
+
+        # Shared with app.state.FUNCTIONS and app.state.TOOLS
+        self.functions: dict[str, object] = {}
+        self.tools: dict[str, object] = {}
+
+        self.code: dict[str, types.CodeType] = {}
+        # Content hash of each loaded module, by "function:<id>" or "tool:<id>"
+        self.hashes: dict[str, str] = {}
+
+        self.lock = threading.Lock()
+        # Bumped on every invalidation, so a load that raced with an update does
+        # not store the old module
+        self.generation = 0
+
+        # Invalidations published by this worker are ignored when received
+        self.worker_id = str(uuid.uuid4())
+        self.redis = None
+        self.pubsub_thread = None
+
+    def start_listener(self):
+        if not self.redis_url or self.pubsub_thread is not None:
+            return
+
+        try:
+            import redis
+
+            self.redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.CHANNEL: self.on_message})
+            self.pubsub_thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+        except Exception as e:
+            log.warning(f"Plugin module invalidation via Redis disabled: {e}")
+            self.redis_url = None
+
+    def on_message(self, message: dict):
+        worker_id, key = message["data"].split(" ", 1)
+        if worker_id != self.worker_id:
+            self.drop(key)
+
+    def get_code(self, content: str) -> tuple[types.CodeType, str]:
+        content_hash = hashlib.sha256(content.encode()).hexdigest()
+        path = self.cache_dir / f"{content_hash}.py"
+
+        code = self.code.get(content_hash)
+        if code is None:
+            if not path.exists():
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                temp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+                temp_path.write_text(content, encoding="utf-8")
+                os.replace(temp_path, path)
+
+            code = compile(content, str(path), "exec")
+            with self.lock:
+                self.code[content_hash] = code
+        return code, str(path)
+
+    def get(self, key: str) -> tuple[int, Optional[object]]:
+        self.start_listener()
+
+        kind, id = key.split(":", 1)
+        modules = self.functions if kind == "function" else self.tools
+        with self.lock:
+            return self.generation, modules.get(id)
+
+    def set(
+        self,
+        key: str,
+        module: object,
+        content: str,
+        generation: Optional[int] = None,
+    ):
+        kind, id = key.split(":", 1)
+        modules = self.functions if kind == "function" else self.tools
+        with self.lock:
+            if generation is None or generation == self.generation:
+                modules[id] = module
+                self.hashes[key] = hashlib.sha256(content.encode()).hexdigest()
+
+    def drop(self, key: str):
+        kind, id = key.split(":", 1)
+        modules = self.functions if kind == "function" else self.tools
+        with self.lock:
+            modules.pop(id, None)
+            self.generation += 1
+
+            # Forget the code object once no loaded module uses it
+            content_hash = self.hashes.pop(key, None)
+            if content_hash and content_hash not in self.hashes.values():
+                self.code.pop(content_hash, None)
+
+    def invalidate(
+        self, key: str, module: Optional[object] = None, content: Optional[str] = None
+    ):
+        # Drops the module, or replaces it with the one loaded from the new content
+        self.drop(key)
+        if module is not None:
+            self.set(key, module, content)
+
+        if self.redis is not None:
+            try:
+                self.redis.publish(self.CHANNEL, f"{self.worker_id} {key}")
+            except Exception as e:
+                log.warning(f"Failed to publish plugin module invalidation: {e}")
+
+    def warm(self):
+        # Loads the active functions and all tools ahead of their first use
+        self.start_listener()
+
+        for function in Functions.get_functions(active_only=True):
+            try:
+                get_function_module(function.id)
+            except Exception as e:
+                log.warning(f"Could not load function {function.id}: {e}")
+
+        for tool in Tools.get_tools():
+            try:
+                get_tools_module(tool.id)
+            except Exception as e:
+                log.warning(f"Could not load tool {tool.id}: {e}")
+
+        log.info(f"Loaded {len(self.functions)} functions and {len(self.tools)} tools")
+
+
+PLUGIN_MODULES = PluginModuleCache(
+    cache_dir=f"{CACHE_DIR}/plugins",
+    redis_url=WEBSOCKET_REDIS_URL if WEBSOCKET_MANAGER == "redis" else None,
+)
+
+
+def load_module(module_name: str, content: str) -> types.ModuleType:
+    code, path = PLUGIN_MODULES.get_code(content)
+
+    module = types.ModuleType(module_name)
+    module.__dict__["__file__"] = path
+    sys.modules[module_name] = module
+    try:
+        exec(code, module.__dict__)
+    except Exception:
+        del sys.modules[module_name]  # Clean up
+        raise
+
+    log.info(f"Loaded module: {module.__name__}")
+    return module
 
+
+def load_tools_module_by_id(toolkit_id, content=None):
     if content is None:
         tool = Tools.get_tool_by_id(toolkit_id)
         if not tool:
             raise Exception(f"Toolkit not found: {toolkit_id}")
 
-        content = tool.content
-
-        content = replace_imports(content)
-        Tools.update_tool_by_id(toolkit_id, {"content": content})
+        # Older tools are stored with the old import paths
+        content = replace_imports(tool.content)
     else:
         frontmatter = extract_frontmatter(content)
         # Install required packages found within the frontmatter
         install_frontmatter_requirements(frontmatter.get("requirements", ""))
 
-    module_name = f"tool_{toolkit_id}"
-    module = types.ModuleType(module_name)
-    sys.modules[module_name] = module
+    return create_tools_module(toolkit_id, content)
 
-    # Create a temporary file and use it to define `__file__` so
-    # that it works as expected from the module's perspective.
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
-    temp_file.close()
-    try:
-        with open(temp_file.name, "w", encoding="utf-8") as f:
-            f.write(content)
-        module.__dict__["__file__"] = temp_file.name
 
-        # Executing the modified content in the created module's namespace
-        exec(content, module.__dict__)
+def create_tools_module(toolkit_id, content):
+    try:
+        module = load_module(f"tool_{toolkit_id}", content)
         frontmatter = extract_frontmatter(content)
-        log.info(f"Loaded module: {module.__name__}")
 
         # Create and return the object if the class 'Tools' is found in the module
         if hasattr(module, "Tools"):
@@ -109,10 +270,8 @@ def load_tools_module_by_id(toolkit_id, content=None):
             raise Exception("No Tools class found in the module")
     except Exception as e:
         log.error(f"Error loading module: {toolkit_id}: {e}")
-        del sys.modules[module_name]  # Clean up
+        sys.modules.pop(f"tool_{toolkit_id}", None)
         raise e
-    finally:
-        os.unlink(temp_file.name)
 
 
 def load_function_module_by_id(function_id, content=None):
@@ -120,31 +279,20 @@ def load_function_module_by_id(function_id, content=None):
         function = Functions.get_function_by_id(function_id)
         if not function:
             raise Exception(f"Function not found: {function_id}")
-        content = function.content
 
-        content = replace_imports(content)
-        Functions.update_function_by_id(function_id, {"content": content})
+        # Older functions are stored with the old import paths
+        content = replace_imports(function.content)
     else:
         frontmatter = extract_frontmatter(content)
         install_frontmatter_requirements(frontmatter.get("requirements", ""))
 
-    module_name = f"function_{function_id}"
-    module = types.ModuleType(module_name)
-    sys.modules[module_name] = module
+    return create_function_module(function_id, content)
 
-    # Create a temporary file and use it to define `__file__` so
-    # that it works as expected from the module's perspective.
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
-    temp_file.close()
-    try:
-        with open(temp_file.name, "w", encoding="utf-8") as f:
-            f.write(content)
-        module.__dict__["__file__"] = temp_file.name
 
-        # Execute the modified content in the created module's namespace
-        exec(content, module.__dict__)
+def create_function_module(function_id, content):
+    try:
+        module = load_module(f"function_{function_id}", content)
         frontmatter = extract_frontmatter(content)
-        log.info(f"Loaded module: {module.__name__}")
 
         # Create appropriate object based on available class type in the module
         if hasattr(module, "Pipe"):
@@ -157,12 +305,39 @@ def load_function_module_by_id(function_id, content=None):
             raise Exception("No Function class found in the module")
     except Exception as e:
         log.error(f"Error loading module: {function_id}: {e}")
-        del sys.modules[module_name]  # Cleanup by removing the module in case of error
+        # Cleanup by removing the module in case of error
+        sys.modules.pop(f"function_{function_id}", None)
 
         Functions.update_function_by_id(function_id, {"is_active": False})
         raise e
-    finally:
-        os.unlink(temp_file.name)
+
+
+def get_function_module(function_id: str):
+    generation, function_module = PLUGIN_MODULES.get(f"function:{function_id}")
+    if function_module is None:
+        function = Functions.get_function_by_id(function_id)
+        if not function:
+            raise Exception(f"Function not found: {function_id}")
+
+        content = replace_imports(function.content)
+        function_module, _, _ = create_function_module(function_id, content)
+        PLUGIN_MODULES.set(
+            f"function:{function_id}", function_module, content, generation
+        )
+    return function_module
+
+
+def get_tools_module(tool_id: str):
+    generation, tools_module = PLUGIN_MODULES.get(f"tool:{tool_id}")
+    if tools_module is None:
+        tool = Tools.get_tool_by_id(tool_id)
+        if not tool:
+            raise Exception(f"Toolkit not found: {tool_id}")
+
+        content = replace_imports(tool.content)
+        tools_module, _ = create_tools_module(tool_id, content)
+        PLUGIN_MODULES.set(f"tool:{tool_id}", tools_module, content, generation)
+    return tools_module
 
 
 def install_frontmatter_requirements(requirements):
@@ -12,7 +12,7 @@ from langchain_core.utils.function_calling import convert_to_openai_function
 
 from open_webui.models.tools import Tools
 from open_webui.models.users import UserModel
-from open_webui.utils.plugin import load_tools_module_by_id
+from open_webui.utils.plugin import get_tools_module
 
 log = logging.getLogger(__name__)
 
@@ -34,6 +34,19 @@ def apply_extra_params_to_tool_function(
     return new_function
 
 
+def has_file_handler(tool_ids: list[str]) -> bool:
+    # Whether a tool may handle the chat files itself if it is selected
+    for tool_id in tool_ids or []:
+        try:
+            module = get_tools_module(tool_id)
+        except Exception:
+            continue
+
+        if getattr(module, "file_handler", False):
+            return True
+    return False
+
+
 # Mutation on extra_params
 def get_tools(
     request: Request, tool_ids: list[str], user: UserModel, extra_params: dict
@@ -45,10 +58,7 @@ def get_tools(
         if tools is None:
             continue
 
-        module = request.app.state.TOOLS.get(tool_id, None)
-        if module is None:
-            module, _ = load_tools_module_by_id(tool_id)
-            request.app.state.TOOLS[tool_id] = module
+        module = get_tools_module(tool_id)
 
         extra_params["__id__"] = tool_id
         if hasattr(module, "valves") and hasattr(module, "Valves"):
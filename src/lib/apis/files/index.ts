@@ -1,3 +1,5 @@
+import type { Socket } from 'socket.io-client';
+
 import { WEBUI_API_BASE_URL } from '$lib/constants';
 
 export const uploadFile = async (token: string, file: File) => {
@@ -30,6 +32,77 @@ export const uploadFile = async (token: string, file: File) => {
 	return res;
 };
 
+export const getFileProcessStatusById = async (token: string, id: string) => {
+	let error = null;
+
+	const res = await fetch(`${WEBUI_API_BASE_URL}/files/${id}/process/status`, {
+		method: 'GET',
+		headers: {
+			Accept: 'application/json',
+			'Content-Type': 'application/json',
+			authorization: `Bearer ${token}`
+		}
+	})
+		.then(async (res) => {
+			if (!res.ok) throw await res.json();
+			return res.json();
+		})
+		.catch((err) => {
+			error = err.detail;
+			console.log(err);
+			return null;
+		});
+
+	if (error) {
+		throw error;
+	}
+
+	return res;
+};
+
+// Files uploaded with a processing job have no content until the job completes.
+// Follows the job through its `file:job` events and resolves with the processed
+// file; the status is polled as well, in case an event is missed (e.g. while the
+// socket reconnects).
+export const waitForFileProcessing = (token: string, socket: Socket | null, id: string) => {
+	return new Promise((resolve, reject) => {
+		let finished = false;
+		let interval = null;
+
+		const finish = (job) => {
+			if (finished || !['completed', 'failed'].includes(job?.status)) {
+				return;
+			}
+
+			finished = true;
+			socket?.off('chat-events', eventHandler);
+			clearInterval(interval);
+
+			if (job.status === 'failed') {
+				reject(job.error ?? 'Failed to process file');
+			} else {
+				getFileById(token, id).then(resolve).catch(reject);
+			}
+		};
+
+		const eventHandler = (event) => {
+			if (event?.data?.type === 'file:job' && event.data.data?.file_id === id) {
+				finish(event.data.data);
+			}
+		};
+
+		const poll = () => {
+			getFileProcessStatusById(token, id)
+				.then(finish)
+				.catch(() => {});
+		};
+
+		socket?.on('chat-events', eventHandler);
+		interval = setInterval(poll, 5000);
+		poll();
+	});
+};
+
 export const uploadDir = async (token: string) => {
 	let error = null;
 